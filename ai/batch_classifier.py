@@ -0,0 +1,208 @@
+"""
+AWSNoc IA IA - Classificador em Lote
+Acumula eventos de log por alguns milissegundos (ou até um orçamento de tokens)
+e os classifica em um único prompt do Claude-3 Haiku, devolvendo a cada
+chamador a sua classificação
+"""
+
+import json
+import time
+import asyncio
+import weakref
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Set
+
+import structlog
+
+try:
+    from config.aws_config import AWSConfig
+except ImportError:
+    class AWSConfig:
+        BEDROCK_CLASSIFICATION = {'batch_window_ms': 250, 'max_batch_events': 20,
+                                  'token_budget': 3000, 'max_message_chars': 2000,
+                                  'output_tokens_per_event': 120}
+
+        @classmethod
+        def get_classification_setting(cls, setting, default=None):
+            return cls.BEDROCK_CLASSIFICATION.get(setting, default)
+
+logger = structlog.get_logger(__name__)
+
+# Aproximação de tokens por caractere para o orçamento do lote
+CHARS_PER_TOKEN = 4
+
+BATCH_PROMPT = """
+Analise rapidamente estes logs AWS e classifique cada um.
+
+{events}
+
+Responda apenas com um array JSON válido, um objeto por log, usando o índice do log:
+[
+    {{
+        "index": 0,
+        "severity": "CRITICAL|HIGH|MEDIUM|LOW",
+        "confidence": 0.95,
+        "category": "network|database|compute|storage|application",
+        "needs_detailed_analysis": true,
+        "summary": "resumo em uma linha"
+    }}
+]
+"""
+
+
+def extract_json(text: str) -> Any:
+    """JSON da resposta do modelo (com ou sem bloco ```json)"""
+    if '```json' in text:
+        start = text.find('```json') + 7
+        end = text.find('```', start)
+        text = text[start:end].strip()
+    else:
+        # Texto antes/depois do JSON: recortar do primeiro [ ou { até o último ] ou }
+        starts = [pos for pos in (text.find('['), text.find('{')) if pos >= 0]
+        if starts:
+            start = min(starts)
+            end = max(text.rfind(']'), text.rfind('}'))
+            text = text[start:end + 1]
+    return json.loads(text)
+
+
+class _PendingBatch:
+    def __init__(self):
+        self.items: List[tuple] = []
+        self.tokens = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class BatchClassifier:
+    """
+    Micro-batching da classificação rápida
+
+    ``invoke(prompt, max_tokens)`` chama o modelo e devolve o texto; ``classify_single``
+    é o caminho de um evento só, usado para lotes de um evento e como fallback
+    quando a resposta do lote não pode ser interpretada.
+    """
+
+    def __init__(self, invoke: Callable[[str, int], Awaitable[str]],
+                 classify_single: Callable[[Any], Awaitable[Dict[str, Any]]]):
+        self.invoke = invoke
+        self.classify_single = classify_single
+        self.window = AWSConfig.get_classification_setting('batch_window_ms', 250) / 1000.0
+        self.max_batch_events = AWSConfig.get_classification_setting('max_batch_events', 20)
+        self.token_budget = AWSConfig.get_classification_setting('token_budget', 3000)
+        self.max_message_chars = AWSConfig.get_classification_setting('max_message_chars', 2000)
+        self.output_tokens_per_event = AWSConfig.get_classification_setting('output_tokens_per_event', 120)
+        # Lote em formação por event loop (futures são ligadas ao loop)
+        self._pending: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _PendingBatch]' = weakref.WeakKeyDictionary()
+        # Referências fortes às tasks de lote (o asyncio só guarda referências fracas)
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats = {
+            'events': 0,
+            'batches': 0,
+            'batched_events': 0,
+            'single_calls': 0,
+            'fallback_events': 0,
+            'parse_failures': 0
+        }
+
+    def _describe(self, index: int, log_event) -> str:
+        message = str(log_event.message)[:self.max_message_chars]
+        return f"[{index}] Serviço: {log_event.service_name} | Timestamp: {log_event.timestamp}\nLog: {message}"
+
+    async def classify(self, log_event) -> Dict[str, Any]:
+        """Classificar um evento (aguarda o lote em que ele for incluído)"""
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(loop)
+        if batch is None:
+            batch = _PendingBatch()
+            self._pending[loop] = batch
+
+        future = loop.create_future()
+        tokens = len(self._describe(0, log_event)) // CHARS_PER_TOKEN + 1
+        batch.items.append((log_event, future))
+        batch.tokens += tokens
+        self._stats['events'] += 1
+
+        if len(batch.items) >= self.max_batch_events or batch.tokens >= self.token_budget:
+            self._dispatch(loop)
+        elif batch.timer is None:
+            batch.timer = loop.call_later(self.window, self._dispatch, loop)
+        return await future
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Fechar o lote atual e processá-lo em uma task"""
+        batch = self._pending.pop(loop, None)
+        if batch is None or not batch.items:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = loop.create_task(self._run(batch.items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items: List[tuple]) -> None:
+        # Chamadores que desistiram (ex.: wait_for com timeout) saem do lote
+        items = [(event, future) for event, future in items if not future.done()]
+        if not items:
+            return
+
+        if len(items) == 1:
+            self._stats['single_calls'] += 1
+            await self._resolve_single(items)
+            return
+
+        self._stats['batches'] += 1
+        self._stats['batched_events'] += len(items)
+        started = time.perf_counter()
+        results: Dict[int, Dict[str, Any]] = {}
+        try:
+            prompt = BATCH_PROMPT.format(
+                events='\n\n'.join(self._describe(index, event) for index, (event, _) in enumerate(items))
+            )
+            text = await self.invoke(prompt, self.output_tokens_per_event * len(items) + 100)
+            parsed = extract_json(text)
+            if isinstance(parsed, dict):
+                parsed = parsed.get('results', [parsed])
+            for entry in parsed:
+                if isinstance(entry, dict) and isinstance(entry.get('index'), int):
+                    results[entry.pop('index')] = entry
+        except Exception as e:
+            self._stats['parse_failures'] += 1
+            logger.warning("Classificação em lote falhou, usando chamadas individuais",
+                           events=len(items), error=str(e))
+
+        missing = []
+        for index, (event, future) in enumerate(items):
+            result = results.get(index)
+            if result is not None and 'severity' in result:
+                if not future.done():
+                    future.set_result(result)
+            else:
+                missing.append((event, future))
+
+        logger.debug("Lote de classificação processado", events=len(items), resolved=len(items) - len(missing),
+                     duration_ms=round((time.perf_counter() - started) * 1000, 1))
+        if missing:
+            self._stats['fallback_events'] += len(missing)
+            await self._resolve_single(missing)
+
+    async def _resolve_single(self, items: List[tuple]) -> None:
+        results = await asyncio.gather(
+            *[self.classify_single(event) for event, _ in items], return_exceptions=True
+        )
+        for (_, future), result in zip(items, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do classificador em lote"""
+        batches = self._stats['batches'] or 1
+        return dict(
+            self._stats,
+            avg_batch_size=round(self._stats['batched_events'] / batches, 2),
+            batch_window_ms=int(self.window * 1000),
+            max_batch_events=self.max_batch_events,
+            token_budget=self.token_budget
+        )
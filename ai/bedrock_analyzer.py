@@ -8,12 +8,20 @@ import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 
-import boto3
 from botocore.exceptions import ClientError
 import structlog
 
+from services.aws_clients import aws_clients
+from services.analysis_cache import analysis_cache
+from services.bedrock_client import bedrock_async
+from ai.batch_classifier import BatchClassifier, extract_json
+from ai.rule_classifier import rule_classifier
+
 logger = structlog.get_logger(__name__)
 
+# Versão dos prompts de classificação/análise (alterar invalida o cache de análises)
+PROMPT_VERSION = "v1"
+
 
 class BedrockAnalyzer:
     """
@@ -22,10 +30,7 @@ class BedrockAnalyzer:
     
     def __init__(self, region: str = "us-east-1"):
         self.region = region
-        self.bedrock_client = boto3.client('bedrock-runtime', region_name=region)
-        
-        # Cache para análises
-        self._cache = {}
+        self.bedrock_client = aws_clients.default_client('bedrock-runtime', region)
         
         # Modelos disponíveis
         self.models = {
@@ -34,15 +39,26 @@ class BedrockAnalyzer:
             "titan_text": "amazon.titan-text-premier-v1:0"
         }
         
+        # Classificação rápida em micro-lotes (um prompt para vários eventos)
+        self.batch_classifier = BatchClassifier(self._invoke_haiku, self._classify_single)
+        
     async def analyze_log(self, log_event) -> Dict[str, Any]:
         """
         Análise principal de um evento de log
         """
-        # Cache key
-        cache_key = f"{log_event.service_name}:{hash(log_event.message)}"
+        # Padrões conhecidos são classificados localmente, sem chamar o modelo
+        local_analysis = rule_classifier.classify(log_event.message)
+        if local_analysis is not None:
+            return local_analysis
         
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+        # Cache compartilhado, endereçado pelo conteúdo do log
+        cache_key = analysis_cache.key(
+            self.models["claude_haiku"], "bedrock_log_analysis", PROMPT_VERSION,
+            service=log_event.service_name, message=log_event.message
+        )
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         try:
             # Análise rápida primeiro
@@ -53,8 +69,9 @@ class BedrockAnalyzer:
                 detailed_analysis = await self._detailed_analysis(log_event)
                 quick_analysis['detailed_analysis'] = detailed_analysis
             
-            # Cache resultado
-            self._cache[cache_key] = quick_analysis
+            # Cache resultado (classificações de fallback não são guardadas)
+            if 'error' not in quick_analysis and 'error' not in quick_analysis.get('detailed_analysis', {}):
+                analysis_cache.set(cache_key, quick_analysis)
             
             return quick_analysis
             
@@ -64,7 +81,20 @@ class BedrockAnalyzer:
     
     async def _quick_classification(self, log_event) -> Dict[str, Any]:
         """
-        Classificação rápida usando Claude-3 Haiku
+        Classificação rápida usando Claude-3 Haiku (agrupada em lotes)
+        """
+        return await self.batch_classifier.classify(log_event)
+    
+    async def _invoke_haiku(self, prompt: str, max_tokens: int) -> str:
+        """Chamar o Claude-3 Haiku (cliente compartilhado) e devolver o texto da resposta"""
+        return await bedrock_async.invoke_text(
+            self.models["claude_haiku"], prompt, max_tokens=max_tokens, temperature=0.05,
+            client=self.bedrock_client
+        )
+    
+    async def _classify_single(self, log_event) -> Dict[str, Any]:
+        """
+        Classificação de um único evento (lotes de um evento e fallback do lote)
         """
         prompt = f"""
         Analise rapidamente este log AWS e classifique:
@@ -84,26 +114,10 @@ class BedrockAnalyzer:
         """
         
         try:
-            response = self.bedrock_client.invoke_model(
-                modelId=self.models["claude_haiku"],
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 500,
-                    "temperature": 0.05
-                })
-            )
-            
-            result = json.loads(response['body'].read())
-            analysis_text = result['content'][0]['text']
+            analysis_text = await self._invoke_haiku(prompt, 500)
             
             # Extrair JSON da resposta
-            if '```json' in analysis_text:
-                json_start = analysis_text.find('```json') + 7
-                json_end = analysis_text.find('```', json_start)
-                analysis_text = analysis_text[json_start:json_end].strip()
-            
-            return json.loads(analysis_text)
+            return extract_json(analysis_text)
             
         except Exception as e:
             logger.error("Erro na classificação rápida", error=str(e))
@@ -159,19 +173,11 @@ class BedrockAnalyzer:
         """
         
         try:
-            response = self.bedrock_client.invoke_model(
-                modelId=self.models["claude_sonnet"],
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 2000,
-                    "temperature": 0.1
-                })
+            analysis_text = await bedrock_async.invoke_text(
+                self.models["claude_sonnet"], prompt, max_tokens=2000, temperature=0.1,
+                client=self.bedrock_client
             )
             
-            result = json.loads(response['body'].read())
-            analysis_text = result['content'][0]['text']
-            
             # Extrair JSON da resposta
             if '```json' in analysis_text:
                 json_start = analysis_text.find('```json') + 7
@@ -0,0 +1,180 @@
+"""
+AWSNoc IA IA - Pré-classificador por Regras
+Classifica localmente padrões de log conhecidos (OOM, health checks do ECS,
+timeouts de conexão...) no mesmo formato da classificação rápida do Bedrock,
+evitando a chamada ao modelo quando a regra é confiável
+"""
+
+import re
+import threading
+from typing import Dict, Any, List, Optional
+
+import structlog
+
+try:
+    from config.aws_config import AWSConfig
+except ImportError:
+    class AWSConfig:
+        BEDROCK_CLASSIFICATION = {'local_rules_enabled': True, 'local_rules_min_confidence': 0.85}
+
+        @classmethod
+        def get_classification_setting(cls, setting, default=None):
+            return cls.BEDROCK_CLASSIFICATION.get(setting, default)
+
+logger = structlog.get_logger(__name__)
+
+# Regras em ordem de prioridade (a primeira que casar vence)
+RULES: List[Dict[str, Any]] = [
+    {
+        'name': 'oom_killed',
+        'pattern': r'out ?of ?memory|OOMKilled|oom-kill|Killed process \d+|OutOfMemoryError|Cannot allocate memory',
+        'severity': 'CRITICAL', 'category': 'compute', 'confidence': 0.95,
+        'summary': 'Processo encerrado por falta de memória (OOM)'
+    },
+    {
+        'name': 'disk_full',
+        'pattern': r'No space left on device|ENOSPC|disk (is )?full',
+        'severity': 'CRITICAL', 'category': 'storage', 'confidence': 0.95,
+        'summary': 'Disco sem espaço livre'
+    },
+    {
+        'name': 'db_connections_exhausted',
+        'pattern': r'too many connections|too many clients|remaining connection slots are reserved|connection pool exhausted',
+        'severity': 'CRITICAL', 'category': 'database', 'confidence': 0.9,
+        'summary': 'Conexões com o banco de dados esgotadas'
+    },
+    {
+        'name': 'ecs_health_check_failed',
+        'pattern': r'failed (ELB|container) health checks?|health checks? failed|unhealthy in target-group',
+        'severity': 'HIGH', 'category': 'compute', 'confidence': 0.9,
+        'summary': 'Task ECS reprovada no health check'
+    },
+    {
+        'name': 'ecs_essential_container_exited',
+        'pattern': r'Essential container in task exited',
+        'severity': 'HIGH', 'category': 'compute', 'confidence': 0.9,
+        'summary': 'Container essencial da task ECS encerrou'
+    },
+    {
+        'name': 'lambda_timeout',
+        'pattern': r'Task timed out after [\d.]+ seconds',
+        'severity': 'HIGH', 'category': 'compute', 'confidence': 0.95,
+        'summary': 'Função Lambda excedeu o tempo limite'
+    },
+    {
+        'name': 'connection_timeout',
+        'pattern': r'connect(ion)? timed? ?out|ETIMEDOUT|Read timed out|timeout (after|exceeded|expired)',
+        'severity': 'HIGH', 'category': 'network', 'confidence': 0.85,
+        'summary': 'Timeout de conexão com dependência'
+    },
+    {
+        'name': 'connection_refused',
+        'pattern': r'connection refused|ECONNREFUSED',
+        'severity': 'HIGH', 'category': 'network', 'confidence': 0.9,
+        'summary': 'Conexão recusada pela dependência'
+    },
+    {
+        'name': 'dns_resolution_failed',
+        'pattern': r'Name or service not known|ENOTFOUND|NXDOMAIN|Temporary failure in name resolution',
+        'severity': 'HIGH', 'category': 'network', 'confidence': 0.9,
+        'summary': 'Falha de resolução DNS'
+    },
+    {
+        'name': 'tls_certificate',
+        'pattern': r'certificate (has )?expired|CERTIFICATE_VERIFY_FAILED|SSL handshake failed',
+        'severity': 'HIGH', 'category': 'network', 'confidence': 0.85,
+        'summary': 'Falha de certificado/TLS'
+    },
+    {
+        'name': 'aws_access_denied',
+        'pattern': r'AccessDenied(Exception)?|is not authorized to perform|UnauthorizedOperation',
+        'severity': 'HIGH', 'category': 'application', 'confidence': 0.9,
+        'summary': 'Permissão IAM negada para a operação'
+    },
+    {
+        'name': 'aws_throttling',
+        'pattern': r'ThrottlingException|Rate exceeded|TooManyRequestsException|RequestLimitExceeded',
+        'severity': 'MEDIUM', 'category': 'application', 'confidence': 0.9,
+        'summary': 'Chamadas à API AWS sendo limitadas (throttling)'
+    },
+    {
+        'name': 'http_5xx',
+        'pattern': r'\b(HTTP/\d(\.\d)?"? |status(_code)?[=: ]+)5\d\d\b',
+        'severity': 'HIGH', 'category': 'application', 'confidence': 0.6,
+        'summary': 'Respostas HTTP 5xx'
+    },
+]
+
+
+class RuleClassifier:
+    """
+    Classificador local por tabela de regras
+
+    Todas as regras são compiladas em uma única expressão (uma varredura por
+    mensagem); só as mensagens que casam são testadas regra a regra para
+    respeitar a prioridade. Regras abaixo de ``min_confidence`` não evitam a
+    chamada ao modelo, mas também são contabilizadas.
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None, min_confidence: Optional[float] = None):
+        self.rules = rules or RULES
+        self.enabled = AWSConfig.get_classification_setting('local_rules_enabled', True)
+        self.min_confidence = min_confidence or AWSConfig.get_classification_setting('local_rules_min_confidence', 0.85)
+        self._compiled = [re.compile(rule['pattern'], re.IGNORECASE) for rule in self.rules]
+        self._combined = re.compile('|'.join(f"(?:{rule['pattern']})" for rule in self.rules), re.IGNORECASE)
+        self._lock = threading.Lock()
+        self._hits = {rule['name']: 0 for rule in self.rules}
+        self._stats = {'checked': 0, 'matched': 0, 'model_calls_skipped': 0, 'low_confidence': 0}
+
+    def match(self, message: str) -> Optional[Dict[str, Any]]:
+        """Regra de maior prioridade que casa com a mensagem"""
+        if not message or not self._combined.search(message):
+            return None
+        for rule, compiled in zip(self.rules, self._compiled):
+            if compiled.search(message):
+                return rule
+        return None
+
+    def classify(self, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Classificação no formato de _quick_classification, ou None quando o modelo deve ser chamado
+        """
+        if not self.enabled:
+            return None
+        rule = self.match(message)
+        with self._lock:
+            self._stats['checked'] += 1
+            if rule is None:
+                return None
+            self._stats['matched'] += 1
+            self._hits[rule['name']] += 1
+            if rule['confidence'] < self.min_confidence:
+                self._stats['low_confidence'] += 1
+                return None
+            self._stats['model_calls_skipped'] += 1
+
+        return {
+            'severity': rule['severity'],
+            'confidence': rule['confidence'],
+            'category': rule['category'],
+            'needs_detailed_analysis': False,
+            'summary': rule['summary'],
+            'classified_by': 'local_rule',
+            'rule': rule['name']
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do pré-classificador (acertos por regra)"""
+        with self._lock:
+            checked = self._stats['checked'] or 1
+            return dict(
+                self._stats,
+                enabled=self.enabled,
+                min_confidence=self.min_confidence,
+                skip_rate=round(self._stats['model_calls_skipped'] / checked, 3),
+                rule_hits=dict(self._hits)
+            )
+
+
+# Instância global do pré-classificador
+rule_classifier = RuleClassifier()
@@ -1,16 +1,22 @@
-import boto3
 import json
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 import re
 
+from services.aws_clients import aws_clients
+from services.analysis_cache import analysis_cache
+from services.bedrock_client import bedrock_async
+
 class AIAnalysisService:
+    # Bump when prompt templates change so cached analyses are not reused
+    PROMPT_VERSION = "v1"
+    
     def __init__(self, region: str = 'us-east-2'):
         self.region = region
-        self.bedrock_client = boto3.client('bedrock-runtime', region_name=region)
+        self.bedrock_client = aws_clients.default_client('bedrock-runtime', region)
         self.model_id = "us.anthropic.claude-3-haiku-20240307-v1:0"
     
-    def analyze_resource_health(self, resource: Dict, logs: List[Dict] = None) -> Dict:
+    async def analyze_resource_health(self, resource: Dict, logs: List[Dict] = None) -> Dict:
         """Analyze resource health and provide recommendations"""
         try:
             # Prepare context for AI analysis
@@ -20,7 +26,7 @@ class AIAnalysisService:
             prompt = self._create_health_analysis_prompt(context)
             
             # Get AI analysis
-            ai_response = self._call_bedrock(prompt)
+            ai_response = await self._call_bedrock(prompt)
             
             # Parse and structure the response
             analysis = self._parse_ai_response(ai_response, resource)
@@ -31,7 +37,7 @@ class AIAnalysisService:
             print(f"Error in AI analysis: {e}")
             return self._fallback_analysis(resource)
     
-    def analyze_logs(self, logs: List[Dict], service_type: str = "general") -> Dict:
+    async def analyze_logs(self, logs: List[Dict], service_type: str = "general") -> Dict:
         """Analyze logs for patterns and anomalies"""
         try:
             if not logs:
@@ -44,7 +50,7 @@ class AIAnalysisService:
             prompt = self._create_log_analysis_prompt(log_context, service_type)
             
             # Get AI analysis
-            ai_response = self._call_bedrock(prompt)
+            ai_response = await self._call_bedrock(prompt)
             
             # Parse log analysis response
             analysis = self._parse_log_analysis_response(ai_response, logs)
@@ -55,14 +61,14 @@ class AIAnalysisService:
             print(f"Error in log analysis: {e}")
             return self._fallback_log_analysis(logs)
     
-    def generate_alert_recommendations(self, resource: Dict, issue_type: str, metadata: Dict = None) -> Dict:
+    async def generate_alert_recommendations(self, resource: Dict, issue_type: str, metadata: Dict = None) -> Dict:
         """Generate recommendations for resolving specific issues"""
         try:
             # Create recommendation prompt
             prompt = self._create_recommendation_prompt(resource, issue_type, metadata)
             
             # Get AI recommendations
-            ai_response = self._call_bedrock(prompt)
+            ai_response = await self._call_bedrock(prompt)
             
             # Parse recommendations
             recommendations = self._parse_recommendations_response(ai_response, resource, issue_type)
@@ -277,26 +283,19 @@ Provide AWS-specific, practical guidance that considers:
 4. Minimal service disruption
 5. Long-term reliability"""
     
-    def _call_bedrock(self, prompt: str) -> str:
-        """Call Amazon Bedrock for AI analysis"""
+    async def _call_bedrock(self, prompt: str) -> str:
+        """Call Amazon Bedrock for AI analysis (responses cached by model + prompt, rate-limited with retries)"""
+        cache_key = analysis_cache.key(self.model_id, "ai_analysis", self.PROMPT_VERSION, prompt=prompt)
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached['text']
+        
         try:
-            response = self.bedrock_client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "max_tokens": 4000,
-                    "temperature": 0.1
-                })
+            text = await bedrock_async.invoke_text(
+                self.model_id, prompt, max_tokens=4000, temperature=0.1, client=self.bedrock_client
             )
-            
-            result = json.loads(response['body'].read())
-            return result['content'][0]['text']
+            analysis_cache.set(cache_key, {'text': text})
+            return text
             
         except Exception as e:
             print(f"Error calling Bedrock: {e}")
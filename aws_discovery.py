@@ -1,54 +1,90 @@
-import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from datetime import datetime
+import time
 import json
 
+from config.aws_config import AWSConfig
+from services.metric_query import MetricQuery, metric_engine
+from services.aws_clients import aws_clients
+from services.target_health import target_health_scanner
+
 class AWSResourceDiscovery:
-    def __init__(self, access_key: str, secret_key: str, region: str):
+    def __init__(self, access_key: str, secret_key: str, region: str, account_id=None):
         self.access_key = access_key
         self.secret_key = secret_key
         self.region = region
+        self.account_id = account_id
         self.session = None
+        self.service_timings: Dict[str, float] = {}
+        self.service_errors: Dict[str, str] = {}
         
     def create_session(self):
         """Create AWS session with credentials"""
         try:
-            self.session = boto3.Session(
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=self.region
-            )
+            self.session = aws_clients.session(self.access_key, self.secret_key, self.region, self.account_id)
             return True
         except Exception as e:
             print(f"Error creating AWS session: {e}")
             return False
     
+    # Serviços descobertos por discover_all_resources (ordem do resultado)
+    DISCOVERY_METHODS = [
+        'discover_ec2_resources',
+        'discover_rds_resources',
+        'discover_s3_resources',
+        'discover_alb_resources',
+        'discover_target_groups',
+        'discover_ecs_resources',
+        'discover_lambda_resources',
+        'discover_cloudwatch_alarms',
+        'discover_vpc_resources',
+        'discover_iam_resources',
+        'discover_route53_resources',
+        'discover_elasticache_resources',
+        'discover_elasticsearch_resources',
+        'discover_sqs_resources',
+        'discover_sns_resources',
+        'discover_api_gateway_resources'
+    ]
+    
+    def _client(self, service_name: str):
+        """Client boto3 shared across discovery threads and requests (cached per account)"""
+        return self.session.client(service_name)
+    
+    def _timed_discover(self, method_name: str) -> List[Dict]:
+        started = time.perf_counter()
+        try:
+            return getattr(self, method_name)()
+        except Exception as e:
+            self.service_errors[method_name] = str(e)
+            print(f"Error in {method_name}: {e}")
+            return []
+        finally:
+            self.service_timings[method_name] = round(time.perf_counter() - started, 3)
+    
     def discover_all_resources(self) -> List[Dict]:
-        """Discover all AWS resources across services"""
+        """Discover all AWS resources across services (services run concurrently)"""
         if not self.session:
             if not self.create_session():
                 return []
         
-        all_resources = []
+        self.service_timings = {}
+        self.service_errors = {}
+        max_workers = min(
+            AWSConfig.get_discovery_setting('service_concurrency', 8),
+            len(self.DISCOVERY_METHODS)
+        )
         
-        # Discover resources from different services
-        all_resources.extend(self.discover_ec2_resources())
-        all_resources.extend(self.discover_rds_resources())
-        all_resources.extend(self.discover_s3_resources())
-        all_resources.extend(self.discover_alb_resources())
-        all_resources.extend(self.discover_target_groups())
-        all_resources.extend(self.discover_ecs_resources())
-        all_resources.extend(self.discover_lambda_resources())
-        all_resources.extend(self.discover_cloudwatch_alarms())
-        all_resources.extend(self.discover_vpc_resources())
-        all_resources.extend(self.discover_iam_resources())
-        all_resources.extend(self.discover_route53_resources())
-        all_resources.extend(self.discover_elasticache_resources())
-        all_resources.extend(self.discover_elasticsearch_resources())
-        all_resources.extend(self.discover_sqs_resources())
-        all_resources.extend(self.discover_sns_resources())
-        all_resources.extend(self.discover_api_gateway_resources())
+        # Serviços independentes: a conta leva o tempo do serviço mais lento, não a soma
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='discover') as executor:
+            futures = [executor.submit(self._timed_discover, name) for name in self.DISCOVERY_METHODS]
+            results = [future.result() for future in futures]
+        
+        all_resources = []
+        for resources in results:
+            all_resources.extend(resources)
         
         return all_resources
     
@@ -57,7 +93,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            ec2 = self.session.client('ec2')
+            ec2 = self._client('ec2')
             
             # EC2 Instances
             response = ec2.describe_instances()
@@ -135,7 +171,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            rds = self.session.client('rds')
+            rds = self._client('rds')
             
             # RDS DB Instances
             response = rds.describe_db_instances()
@@ -201,7 +237,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            s3 = self.session.client('s3')
+            s3 = self._client('s3')
             
             response = s3.list_buckets()
             for bucket in response['Buckets']:
@@ -212,25 +248,6 @@ class AWSResourceDiscovery:
                 except ClientError:
                     bucket_region = 'unknown'
                 
-                # Get bucket size (approximate)
-                try:
-                    cloudwatch = self.session.client('cloudwatch')
-                    metrics = cloudwatch.get_metric_statistics(
-                        Namespace='AWS/S3',
-                        MetricName='BucketSizeBytes',
-                        Dimensions=[
-                            {'Name': 'BucketName', 'Value': bucket['Name']},
-                            {'Name': 'StorageType', 'Value': 'StandardStorage'}
-                        ],
-                        StartTime=datetime.now() - timedelta(days=2),
-                        EndTime=datetime.now(),
-                        Period=86400,
-                        Statistics=['Average']
-                    )
-                    bucket_size = metrics['Datapoints'][-1]['Average'] if metrics['Datapoints'] else 0
-                except:
-                    bucket_size = 0
-                
                 resources.append({
                     'resource_type': 'S3_Bucket',
                     'resource_id': bucket['Name'],
@@ -240,10 +257,26 @@ class AWSResourceDiscovery:
                     'created_at': bucket['CreationDate'].isoformat() if isinstance(bucket['CreationDate'], datetime) else str(bucket['CreationDate']),
                     'metadata': {
                         'region': bucket_region,
-                        'size_bytes': bucket_size,
+                        'size_bytes': 0,
                         'health_status': 'healthy'
                     }
                 })
+            
+            # Get bucket sizes (approximate) for all buckets in bulk
+            try:
+                sizes = self._bulk_metric_values(
+                    [MetricQuery('AWS/S3', 'BucketSizeBytes',
+                                 {'BucketName': resource['resource_id'], 'StorageType': 'StandardStorage'},
+                                 stat='Average', period=86400)
+                     for resource in resources],
+                    datetime.now() - timedelta(days=2),
+                    datetime.now()
+                )
+                for resource, values in zip(resources, sizes):
+                    if values:
+                        resource['metadata']['size_bytes'] = values[0]
+            except Exception as e:
+                print(f"Error getting S3 bucket sizes: {e}")
                 
         except ClientError as e:
             print(f"Error discovering S3 resources: {e}")
@@ -255,7 +288,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            elbv2 = self.session.client('elbv2')
+            elbv2 = self._client('elbv2')
             
             response = elbv2.describe_load_balancers()
             for lb in response['LoadBalancers']:
@@ -290,18 +323,16 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            elbv2 = self.session.client('elbv2')
-            
-            response = elbv2.describe_target_groups()
-            for tg in response['TargetGroups']:
+            # All target groups (paginated) with health fetched by a bounded thread pool;
+            # this runs in a discovery worker thread, so it stays synchronous
+            for tg, targets in target_health_scanner.scan_sync(self._client('elbv2')):
                 # Get target health
-                try:
-                    health_response = elbv2.describe_target_health(TargetGroupArn=tg['TargetGroupArn'])
-                    healthy_targets = sum(1 for target in health_response['TargetHealthDescriptions'] 
+                if not isinstance(targets, Exception):
+                    healthy_targets = sum(1 for target in targets 
                                         if target['TargetHealth']['State'] == 'healthy')
-                    total_targets = len(health_response['TargetHealthDescriptions'])
+                    total_targets = len(targets)
                     health_status = "healthy" if healthy_targets == total_targets and total_targets > 0 else "unhealthy"
-                except ClientError:
+                else:
                     healthy_targets = 0
                     total_targets = 0
                     health_status = "unknown"
@@ -336,7 +367,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            ecs = self.session.client('ecs')
+            ecs = self._client('ecs')
             
             # ECS Clusters
             response = ecs.list_clusters()
@@ -361,13 +392,16 @@ class AWSResourceDiscovery:
                         }
                     })
                     
-                    # ECS Services in this cluster
+                    # ECS Services in this cluster (describe_services accepts up to 10 per call)
                     try:
-                        services_response = ecs.list_services(cluster=cluster_arn)
-                        if services_response['serviceArns']:
+                        service_arns = []
+                        for page in ecs.get_paginator('list_services').paginate(cluster=cluster_arn):
+                            service_arns.extend(page['serviceArns'])
+                        
+                        for i in range(0, len(service_arns), 10):
                             service_details = ecs.describe_services(
                                 cluster=cluster_arn,
-                                services=services_response['serviceArns']
+                                services=service_arns[i:i+10]
                             )
                             
                             for service in service_details['services']:
@@ -382,7 +416,12 @@ class AWSResourceDiscovery:
                                     'created_at': service.get('createdAt', datetime.now()).isoformat() if isinstance(service.get('createdAt'), datetime) else str(service.get('createdAt')),
                                     'metadata': {
                                         'cluster_name': cluster['clusterName'],
+                                        'cluster_arn': cluster['clusterArn'],
                                         'task_definition': service.get('taskDefinition'),
+                                        'target_group_arns': [
+                                            lb['targetGroupArn'] for lb in service.get('loadBalancers', [])
+                                            if lb.get('targetGroupArn')
+                                        ],
                                         'desired_count': service.get('desiredCount', 0),
                                         'running_count': service.get('runningCount', 0),
                                         'pending_count': service.get('pendingCount', 0),
@@ -403,34 +442,11 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            lambda_client = self.session.client('lambda')
+            lambda_client = self._client('lambda')
             
             paginator = lambda_client.get_paginator('list_functions')
             for page in paginator.paginate():
                 for func in page['Functions']:
-                    # Check if function has recent errors
-                    health_status = "healthy"
-                    try:
-                        # Get function metrics from CloudWatch
-                        cloudwatch = self.session.client('cloudwatch')
-                        end_time = datetime.now()
-                        start_time = end_time - timedelta(hours=1)
-                        
-                        error_metrics = cloudwatch.get_metric_statistics(
-                            Namespace='AWS/Lambda',
-                            MetricName='Errors',
-                            Dimensions=[{'Name': 'FunctionName', 'Value': func['FunctionName']}],
-                            StartTime=start_time,
-                            EndTime=end_time,
-                            Period=300,
-                            Statistics=['Sum']
-                        )
-                        
-                        if error_metrics['Datapoints'] and any(dp['Sum'] > 0 for dp in error_metrics['Datapoints']):
-                            health_status = "unhealthy"
-                    except:
-                        pass
-                    
                     resources.append({
                         'resource_type': 'Lambda_Function',
                         'resource_id': func['FunctionArn'],
@@ -445,9 +461,25 @@ class AWSResourceDiscovery:
                             'timeout': func.get('Timeout'),
                             'memory_size': func.get('MemorySize'),
                             'version': func.get('Version'),
-                            'health_status': health_status
+                            'health_status': 'healthy'
                         }
                     })
+            
+            # Check recent errors for all functions in bulk
+            try:
+                end_time = datetime.now()
+                errors = self._bulk_metric_values(
+                    [MetricQuery('AWS/Lambda', 'Errors', {'FunctionName': resource['name']},
+                                 stat='Sum', period=300)
+                     for resource in resources],
+                    end_time - timedelta(hours=1),
+                    end_time
+                )
+                for resource, values in zip(resources, errors):
+                    if any(value > 0 for value in values):
+                        resource['metadata']['health_status'] = 'unhealthy'
+            except Exception as e:
+                print(f"Error getting Lambda error metrics: {e}")
                     
         except ClientError as e:
             print(f"Error discovering Lambda resources: {e}")
@@ -459,7 +491,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            cloudwatch = self.session.client('cloudwatch')
+            cloudwatch = self._client('cloudwatch')
             
             paginator = cloudwatch.get_paginator('describe_alarms')
             for page in paginator.paginate():
@@ -494,7 +526,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            ec2 = self.session.client('ec2')
+            ec2 = self._client('ec2')
             
             # VPCs
             response = ec2.describe_vpcs()
@@ -547,7 +579,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            iam = self.session.client('iam')
+            iam = self._client('iam')
             
             # IAM Roles
             paginator = iam.get_paginator('list_roles')
@@ -577,7 +609,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            route53 = self.session.client('route53')
+            route53 = self._client('route53')
             
             paginator = route53.get_paginator('list_hosted_zones')
             for page in paginator.paginate():
@@ -606,7 +638,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            elasticache = self.session.client('elasticache')
+            elasticache = self._client('elasticache')
             
             # Redis clusters
             try:
@@ -642,7 +674,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            es = self.session.client('es')
+            es = self._client('es')
             
             response = es.list_domain_names()
             if response['DomainNames']:
@@ -677,7 +709,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            sqs = self.session.client('sqs')
+            sqs = self._client('sqs')
             
             response = sqs.list_queues()
             for queue_url in response.get('QueueUrls', []):
@@ -725,7 +757,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            sns = self.session.client('sns')
+            sns = self._client('sns')
             
             paginator = sns.get_paginator('list_topics')
             for page in paginator.paginate():
@@ -763,7 +795,7 @@ class AWSResourceDiscovery:
         resources = []
         
         try:
-            apigateway = self.session.client('apigateway')
+            apigateway = self._client('apigateway')
             
             response = apigateway.get_rest_apis()
             for api in response['items']:
@@ -786,6 +818,31 @@ class AWSResourceDiscovery:
         
         return resources
     
+    def _bulk_metric_values(self, queries: List[MetricQuery], start_time: datetime,
+                            end_time: datetime) -> List[List[float]]:
+        """Fetch many metrics with batched GetMetricData calls (newest value first per metric)"""
+        cloudwatch = self._client('cloudwatch')
+        batch_size = metric_engine.batch_size
+        results = [[] for _ in queries]
+        
+        for offset in range(0, len(queries), batch_size):
+            batch = queries[offset:offset + batch_size]
+            request = {
+                'MetricDataQueries': [query.to_query(f"m{position}") for position, query in enumerate(batch)],
+                'StartTime': start_time,
+                'EndTime': end_time,
+                'ScanBy': 'TimestampDescending'
+            }
+            while True:
+                response = cloudwatch.get_metric_data(**request)
+                for result in response.get('MetricDataResults', []):
+                    results[offset + int(result['Id'][1:])].extend(result.get('Values', []))
+                if not response.get('NextToken'):
+                    break
+                request['NextToken'] = response['NextToken']
+        
+        return results
+    
     def _get_tag_value(self, tags: List[Dict], key: str, default: str = '') -> str:
         """Get tag value by key"""
         for tag in tags:
@@ -800,7 +857,7 @@ class AWSResourceDiscovery:
                 if not self.create_session():
                     return False
             
-            sts = self.session.client('sts')
+            sts = self._client('sts')
             sts.get_caller_identity()
             return True
         except (ClientError, NoCredentialsError):
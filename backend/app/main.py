@@ -6,6 +6,7 @@ Sistema SaaS básico para monitoramento AWS
 """
 
 import json
+import asyncio
 import psycopg2
 import psycopg2.extras
 from fastapi import FastAPI, HTTPException
@@ -14,8 +15,21 @@ from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import uvicorn
+import sys
+from pathlib import Path
 from datetime import datetime
 
+# Adicionar o diretório raiz ao PYTHONPATH (o serviço executa backend/app/main.py diretamente)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from services.db_pool import get_pool, close_all_pools
+from discovery_runner import DiscoveryRunner
+from services.aws_async import aws_async
+from services.aws_clients import aws_clients
+from services.request_coalescing import request_coalescer
+from services.bedrock_client import bedrock_async
+from services.target_group_index import TargetGroupServiceIndex
+
 # Configuração do banco
 DB_CONFIG = {
     "host": "awsnoc-ia-dev-database.cjeqe6pc2viw.us-east-2.rds.amazonaws.com",
@@ -50,12 +64,38 @@ class AWSAccount(BaseModel):
     services: List[str] = []
     status: str = "active"
 
+# Pool de conexões compartilhado (aberto no startup, fechado no shutdown)
+db_pool = get_pool(DB_CONFIG)
+tg_index = TargetGroupServiceIndex(DB_CONFIG)
+discovery_runner = DiscoveryRunner(DB_CONFIG, tg_index=tg_index)
+
+@app.on_event("startup")
+async def open_db_pool():
+    try:
+        db_pool.open()
+    except Exception as e:
+        print(f"Erro abrindo pool de conexões: {e}")
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    close_all_pools()
+
+@app.on_event("shutdown")
+async def shutdown_discovery_runner():
+    discovery_runner.shutdown()
+
 def get_db_connection():
-    """Conecta ao banco de dados"""
+    """Empresta uma conexão do pool (conn.close() devolve ao pool)"""
+    try:
+        return db_pool.getconn(autocommit=True)
+    except Exception as e:
+        print(f"Erro de conexão: {e}")
+        return None
+
+async def get_db_connection_async():
+    """Empresta uma conexão do pool sem bloquear o event loop (para handlers async)"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        conn.autocommit = True
-        return conn
+        return await db_pool.agetconn(autocommit=True)
     except Exception as e:
         print(f"Erro de conexão: {e}")
         return None
@@ -85,6 +125,11 @@ async def root():
 async def health():
     return {"status": "healthy", "service": "AWSNoc IA IA"}
 
+@app.get("/api/v1/stats/db-pool")
+async def get_db_pool_stats():
+    """Estatísticas do pool de conexões PostgreSQL"""
+    return db_pool.get_stats()
+
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard():
     """Dashboard principal"""
@@ -291,7 +336,7 @@ async def dashboard():
 @app.get("/api/v1/accounts")
 async def get_accounts():
     """Lista todas as contas AWS"""
-    conn = get_db_connection()
+    conn = await get_db_connection_async()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com banco")
     
@@ -319,7 +364,7 @@ async def get_accounts():
 @app.get("/api/v1/accounts/{account_id}")
 async def get_account(account_id: int):
     """Busca uma conta específica"""
-    conn = get_db_connection()
+    conn = await get_db_connection_async()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com banco")
     
@@ -346,8 +391,15 @@ async def get_account(account_id: int):
         raise HTTPException(status_code=500, detail=f"Erro: {str(e)}")
 
 @app.get("/api/v1/accounts/{account_id}/resources")
+@request_coalescer.coalesce("account_resources")
 async def get_account_resources(account_id: int):
     """Lista recursos de uma conta"""
+    # Consulta fora do event loop: requisições simultâneas aguardam a mesma execução
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, load_account_resources, account_id)
+
+def load_account_resources(account_id: int):
+    """Carregar recursos de uma conta do banco"""
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com banco")
@@ -372,13 +424,9 @@ async def get_account_resources(account_id: int):
 
 @app.get("/api/v1/alerts")
 async def get_alerts():
-    """Lista todos os alertas REAIS (executa health check primeiro)"""
+    """Lista todos os alertas REAIS (resultado do último health check em background)"""
     try:
-        # Executar verificação de saúde primeiro para obter alertas reais
-        if health_checker_available:
-            await run_health_check(DB_CONFIG)
-        
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -409,7 +457,7 @@ async def get_alerts():
         
         cursor.close()
         conn.close()
-        return {"alerts": alerts}
+        return {"alerts": alerts, "last_check": health_last_check()}
         
     except Exception as e:
         print(f"Erro ao buscar alertas: {e}")
@@ -418,7 +466,7 @@ async def get_alerts():
 @app.post("/api/v1/accounts")
 async def create_account(account: AWSAccount):
     """Cria uma nova conta AWS"""
-    conn = get_db_connection()
+    conn = await get_db_connection_async()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com banco")
     
@@ -501,109 +549,26 @@ async def redirect_root():
 # === NOVOS ENDPOINTS PARA DESCOBERTA REAL DE RECURSOS AWS ===
 
 @app.post("/api/v1/discovery/trigger")
-async def trigger_discovery():
-    """Trigger manual para descoberta de recursos AWS"""
+async def trigger_discovery(wait: bool = True):
+    """Trigger manual para descoberta de recursos AWS (contas em paralelo)"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Erro de conexão com banco")
+        if not wait:
+            # Rodar em background; acompanhar por /api/v1/discovery/status
+            started = discovery_runner.start()
+            status = discovery_runner.get_status()
+            status["message"] = "Descoberta iniciada" if started else "Descoberta já em andamento"
+            return status
         
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("SELECT * FROM aws_accounts WHERE status = 'active'")
-        accounts = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        summary = await discovery_runner.wait()
         
-        if not accounts:
+        if not summary["accounts_total"]:
             return {"message": "Nenhuma conta ativa encontrada", "resources_found": 0, "alerts_generated": 0}
         
-        total_resources = 0
-        total_alerts = 0
-        
-        for account in accounts:
-            try:
-                # Importar sistema de descoberta
-                from aws_discovery import AWSResourceDiscovery
-                from ai_analysis import AIAnalysisService
-                
-                ai_service = AIAnalysisService()
-                
-                # Descobrir recursos reais da AWS
-                discovery = AWSResourceDiscovery(
-                    account['access_key'],
-                    account['secret_key'],
-                    account['region']
-                )
-                
-                resources = discovery.discover_all_resources()
-                total_resources += len(resources)
-                
-                # Salvar recursos no banco
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                
-                # Limpar recursos antigos desta conta
-                cursor.execute("DELETE FROM aws_resources WHERE account_id = %s", (account['id'],))
-                
-                # Inserir novos recursos
-                for resource in resources:
-                    cursor.execute("""
-                        INSERT INTO aws_resources 
-                        (account_id, resource_type, resource_id, name, status, region, metadata, created_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        account['id'],
-                        resource['resource_type'],
-                        resource['resource_id'],
-                        resource.get('name'),
-                        resource.get('status'),
-                        resource.get('region'),
-                        json.dumps(resource.get('metadata', {})),
-                        resource.get('created_at', datetime.now())
-                    ))
-                
-                # Analisar recursos para gerar alertas
-                for resource in resources:
-                    try:
-                        analysis = ai_service.analyze_resource_health(resource)
-                        
-                        if analysis.get('health_status') in ['warning', 'critical']:
-                            issues = analysis.get('issues', [])
-                            
-                            for issue in issues:
-                                if issue.get('severity') in ['high', 'critical']:
-                                    # Criar alerta
-                                    cursor.execute("""
-                                        INSERT INTO alerts 
-                                        (account_id, resource_id, resource_type, alert_type, severity, title, description, ai_analysis)
-                                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                                    """, (
-                                        account['id'],
-                                        resource['resource_id'],
-                                        resource['resource_type'],
-                                        issue.get('type', 'unknown'),
-                                        issue.get('severity'),
-                                        f"{issue.get('type', 'Issue').title()} - {resource.get('name', 'Unknown Resource')}",
-                                        issue.get('description', 'No description available'),
-                                        json.dumps(analysis)
-                                    ))
-                                    total_alerts += 1
-                    except Exception as e:
-                        print(f"Erro ao analisar recurso {resource.get('resource_id')}: {e}")
-                        continue
-                
-                conn.commit()
-                cursor.close()
-                conn.close()
-                
-            except Exception as e:
-                print(f"Erro ao descobrir recursos da conta {account['name']}: {e}")
-                continue
-        
         return {
-            "message": f"Descoberta executada para {len(accounts)} contas",
-            "resources_found": total_resources,
-            "alerts_generated": total_alerts,
+            "message": f"Descoberta executada para {summary['accounts_total']} contas",
+            "resources_found": summary["resources_found"],
+            "alerts_generated": summary["alerts_generated"],
+            "accounts": summary["accounts"],
             "status": "success"
         }
         
@@ -611,11 +576,16 @@ async def trigger_discovery():
         print(f"Erro na descoberta: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/discovery/status")
+async def get_discovery_status():
+    """Progresso da descoberta: resultado de cada conta assim que ela termina"""
+    return discovery_runner.get_status()
+
 @app.get("/api/v1/resources/discovered")
 async def get_discovered_resources():
     """Lista recursos descobertos pelo sistema real"""
     try:
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -653,7 +623,7 @@ async def get_discovered_resources():
 async def get_real_alerts():
     """Lista alertas reais gerados pelo sistema de descoberta"""
     try:
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -764,6 +734,7 @@ async def get_real_cloudwatch_alarms():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/alarms/cloudwatch/{account_id}")
+@request_coalescer.coalesce("cloudwatch_alarms")
 async def get_real_cloudwatch_alarms_by_account(account_id: int):
     """Buscar alarmes reais do CloudWatch para uma conta específica"""
     if not real_alarms_service:
@@ -1012,12 +983,35 @@ async def get_alarms_dashboard():
 
 # Importar health checker
 try:
-    from health_checker import run_health_check
+    from health_checker import HealthCheckScheduler
+    health_scheduler = HealthCheckScheduler(DB_CONFIG)
     health_checker_available = True
 except ImportError as e:
     print(f"Aviso: Health checker não disponível: {e}")
+    health_scheduler = None
     health_checker_available = False
 
+def health_last_check():
+    """Horário do último health check concluído em background"""
+    return health_scheduler.last_checked_at() if health_scheduler else None
+
+@app.on_event("startup")
+async def start_health_scheduler():
+    if health_scheduler:
+        health_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_health_scheduler():
+    if health_scheduler:
+        await health_scheduler.stop()
+
+@app.get("/api/v1/health/status")
+async def get_health_check_status():
+    """Estado do health check em background (intervalos e última execução)"""
+    if not health_checker_available:
+        raise HTTPException(status_code=503, detail="Health checker não disponível")
+    return health_scheduler.get_status()
+
 @app.post("/api/v1/health/check")
 async def run_health_check_endpoint():
     """Executar verificação de saúde em tempo real"""
@@ -1025,7 +1019,7 @@ async def run_health_check_endpoint():
         raise HTTPException(status_code=503, detail="Health checker não disponível")
     
     try:
-        alerts = await run_health_check(DB_CONFIG)
+        alerts = await health_scheduler.run_now()
         return {
             "alerts_found": len(alerts),
             "alerts": alerts,
@@ -1038,14 +1032,10 @@ async def run_health_check_endpoint():
 
 @app.get("/api/v1/alerts/live")
 async def get_live_alerts():
-    """Buscar alertas em tempo real (executa health check primeiro)"""
+    """Buscar alertas em tempo real (resultado do último health check em background)"""
     try:
-        # Executar verificação de saúde primeiro
-        if health_checker_available:
-            await run_health_check(DB_CONFIG)
-        
-        # Buscar alertas atualizados
-        conn = get_db_connection()
+        # Buscar alertas persistidos pelo scheduler
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1081,7 +1071,7 @@ async def get_live_alerts():
             "alerts": alerts,
             "total": len(alerts),
             "status": "success",
-            "last_check": datetime.now().isoformat()
+            "last_check": health_last_check()
         }
         
     except Exception as e:
@@ -1091,13 +1081,9 @@ async def get_live_alerts():
 # Atualizar endpoint de alertas para usar dados reais
 @app.get("/api/v1/alerts/dashboard")
 async def get_alerts_for_dashboard():
-    """Buscar alertas para dashboard (dados reais)"""
+    """Buscar alertas para dashboard (dados reais do último health check)"""
     try:
-        # Executar verificação de saúde se disponível
-        if health_checker_available:
-            await run_health_check(DB_CONFIG)
-        
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1138,7 +1124,8 @@ async def get_alerts_for_dashboard():
         
         return {
             "alerts": alerts,
-            "status": "success"
+            "status": "success",
+            "last_check": health_last_check()
         }
         
     except Exception as e:
@@ -1148,13 +1135,9 @@ async def get_alerts_for_dashboard():
 
 @app.get("/api/v1/accounts/{account_id}/alerts")
 async def get_account_alerts(account_id: int):
-    """Buscar alertas REAIS para uma conta específica"""
+    """Buscar alertas REAIS para uma conta específica (último health check)"""
     try:
-        # Executar verificação de saúde primeiro
-        if health_checker_available:
-            await run_health_check(DB_CONFIG)
-        
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1185,7 +1168,7 @@ async def get_account_alerts(account_id: int):
         
         cursor.close()
         conn.close()
-        return {"alerts": alerts}
+        return {"alerts": alerts, "last_check": health_last_check()}
         
     except Exception as e:
         print(f"Erro ao buscar alertas da conta {account_id}: {e}")
@@ -1196,22 +1179,13 @@ async def get_account_alerts(account_id: int):
 async def force_refresh_alerts():
     """FORÇA refresh dos alertas (sem cache)"""
     try:
-        # LIMPAR todos os alertas antigos primeiro
-        conn = get_db_connection()
-        if conn:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM alerts")
-            conn.commit()
-            conn.close()
-            print("🗑️ Alertas antigos removidos")
-        
-        # Executar verificação de saúde FORÇADA
+        # Executar verificação de saúde FORÇADA (a reconciliação resolve os alertas que sumiram)
         if health_checker_available:
-            alerts = await run_health_check(DB_CONFIG)
+            alerts = await health_scheduler.run_now()
             print(f"✅ {len(alerts)} novos alertas reais detectados")
         
         # Buscar alertas atualizados
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1259,7 +1233,7 @@ async def force_refresh_alerts():
 async def debug_alerts_raw():
     """DEBUG: Ver alertas direto do banco sem health check"""
     try:
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1289,7 +1263,7 @@ async def debug_alerts_raw():
 async def get_alert_details(alert_id: int):
     """Busca detalhes de um alerta específico"""
     try:
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1334,7 +1308,7 @@ async def get_alert_details(alert_id: int):
 async def analyze_alert_with_ai(alert_id: int):
     """Análise inteligente de alerta usando AWS Bedrock + CloudWatch Logs"""
     try:
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1357,14 +1331,8 @@ async def analyze_alert_with_ai(alert_id: int):
         if not account:
             raise HTTPException(status_code=404, detail="Conta AWS não encontrada")
         
-        # Inicializar cliente AWS
-        import boto3
-        
-        session = boto3.Session(
-            aws_access_key_id=account['access_key'],
-            aws_secret_access_key=account['secret_key'],
-            region_name=account['region']
-        )
+        # Sessão AWS compartilhada da conta (clientes reutilizados)
+        session = aws_clients.for_account(account)
         
         # Análise específica por tipo de recurso
         analysis_result = {}
@@ -1381,7 +1349,7 @@ async def analyze_alert_with_ai(alert_id: int):
             analysis_result = await analyze_generic_with_ai(session, alert, account)
         
         # Salvar análise no banco
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         cursor = conn.cursor()
         
         cursor.execute(
@@ -1549,23 +1517,11 @@ async def analyze_ecs_service_with_ai(session, alert, account):
         """
         
         try:
-            response = bedrock.invoke_model(
-                modelId='us.anthropic.claude-3-5-haiku-20241022-v1:0',
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 2000,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ]
-                })
+            ai_analysis = await bedrock_async.invoke_text(
+                'us.anthropic.claude-3-5-haiku-20241022-v1:0', prompt, max_tokens=2000,
+                client=bedrock, account_key=account['id']
             )
             
-            response_body = json.loads(response['body'].read())
-            ai_analysis = response_body['content'][0]['text']
-            
         except Exception as bedrock_error:
             ai_analysis = f"Erro ao conectar com Bedrock: {str(bedrock_error)}"
         
@@ -1629,41 +1585,30 @@ async def analyze_target_group_with_ai(session, alert, account):
         print("🔍 Buscando ECS Services...")
         # 3.1 BUSCAR ECS SERVICES configurados para este Target Group
         try:
-            clusters = ecs.list_clusters()
+            # Serviços configurados para o TG: uma consulta no índice reverso
+            tg_services = await tg_index.resolve(
+                aws_async.wrap(ecs, account['id']), account['id'], tg_arn, target_group.get('TargetType')
+            )
             
-            for cluster_arn in clusters['clusterArns']:
-                cluster_name = cluster_arn.split('/')[-1]
-                services = ecs.list_services(cluster=cluster_name)
-                
-                for service_arn in services['serviceArns']:
-                    service_name = service_arn.split('/')[-1]
+            for cluster_name, service in tg_services:
+                service_name = service['serviceName']
+                for lb in service.get('loadBalancers', []):
+                    if lb.get('targetGroupArn') == tg_arn:
+                        print(f"✅ ENCONTRADO! ECS Service {service_name} configurado para TG {tg_name}")
                     
-                    service_details = ecs.describe_services(
-                        cluster=cluster_name,
-                        services=[service_name]
-                    )
+                        # Analisar o serviço em detalhes
+                        ecs_analysis = await analyze_ecs_for_target_group(
+                            ecs, logs, cluster_name, service_name, service, lb
+                        )
+                    
+                        discovered_services.append({
+                            'type': 'ECS_Service',
+                            'name': service_name,
+                            'cluster': cluster_name,
+                            'configured_for_tg': True,
+                            'analysis': ecs_analysis
+                        })
                     
-                    for service in service_details['services']:
-                        load_balancers = service.get('loadBalancers', [])
-                        
-                        # Verificar se este serviço está configurado para usar nosso TG
-                        for lb in load_balancers:
-                            if lb.get('targetGroupArn') == tg_arn:
-                                print(f"✅ ENCONTRADO! ECS Service {service_name} configurado para TG {tg_name}")
-                                
-                                # Analisar o serviço em detalhes
-                                ecs_analysis = await analyze_ecs_for_target_group(
-                                    ecs, logs, cluster_name, service_name, service, lb
-                                )
-                                
-                                discovered_services.append({
-                                    'type': 'ECS_Service',
-                                    'name': service_name,
-                                    'cluster': cluster_name,
-                                    'configured_for_tg': True,
-                                    'analysis': ecs_analysis
-                                })
-                                
         except Exception as ecs_error:
             discovered_services.append({
                 'type': 'ECS_SEARCH_ERROR',
@@ -1820,23 +1765,11 @@ async def analyze_target_group_with_ai(session, alert, account):
         """
         
         try:
-            response = bedrock.invoke_model(
-                modelId='us.anthropic.claude-3-5-haiku-20241022-v1:0',
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 3000,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ]
-                })
+            ai_analysis = await bedrock_async.invoke_text(
+                'us.anthropic.claude-3-5-haiku-20241022-v1:0', prompt, max_tokens=3000,
+                client=bedrock, account_key=account['id']
             )
             
-            response_body = json.loads(response['body'].read())
-            ai_analysis = response_body['content'][0]['text']
-            
         except Exception as bedrock_error:
             ai_analysis = f"Erro ao conectar com Bedrock: {str(bedrock_error)}"
         
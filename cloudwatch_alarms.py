@@ -3,7 +3,6 @@ AWSNoc IA IA - CloudWatch Alarms Discovery
 Módulo para descoberta e análise de alarmes reais do CloudWatch
 """
 
-import boto3
 import json
 import asyncio
 from typing import List, Dict, Any, Optional
@@ -11,6 +10,8 @@ from datetime import datetime, timedelta
 from botocore.exceptions import ClientError, NoCredentialsError
 import logging
 
+from services.aws_clients import aws_clients
+
 logger = logging.getLogger(__name__)
 
 class CloudWatchAlarmsDiscovery:
@@ -18,20 +19,17 @@ class CloudWatchAlarmsDiscovery:
     Descoberta e análise de alarmes do CloudWatch
     """
     
-    def __init__(self, access_key: str, secret_key: str, region: str):
+    def __init__(self, access_key: str, secret_key: str, region: str, account_id: Optional[int] = None):
         self.access_key = access_key
         self.secret_key = secret_key
         self.region = region
+        self.account_id = account_id
         self.session = None
         
     def create_session(self):
         """Criar sessão AWS com credenciais"""
         try:
-            self.session = boto3.Session(
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=self.region
-            )
+            self.session = aws_clients.session(self.access_key, self.secret_key, self.region, self.account_id)
             return True
         except Exception as e:
             logger.error("Erro criando sessão AWS", error=str(e))
@@ -3,9 +3,7 @@ AWSNoc IA IA - CloudWatch Alarms Discovery - Versão Otimizada
 Módulo otimizado para descoberta e análise de alarmes com cache e controle de custos
 """
 
-import boto3
 import json
-import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from botocore.exceptions import ClientError, NoCredentialsError
@@ -42,6 +40,11 @@ except ImportError:
     
     cache_manager = MockCacheManager()
 
+from services.aws_async import aws_async
+from services.aws_clients import aws_clients
+from services.alarm_enumerator import alarm_enumerator
+from services.alarm_refresh import alarm_refresh_tracker
+
 logger = logging.getLogger(__name__)
 
 class OptimizedCloudWatchAlarmsDiscovery:
@@ -49,36 +52,48 @@ class OptimizedCloudWatchAlarmsDiscovery:
     Descoberta otimizada de alarmes do CloudWatch com cache e controle de custos
     """
     
-    def __init__(self, access_key: str, secret_key: str, region: str):
+    def __init__(self, access_key: str, secret_key: str, region: str, account_id: Optional[int] = None,
+                 tag_cache=None):
         self.access_key = access_key
         self.secret_key = secret_key
         self.region = region
+        self.account_id = account_id
         self.session = None
+        # Mesma chave de concorrência do aws_async usada pelo restante do código (id da conta)
+        self.account_key = account_id if account_id is not None else access_key
+        # Escopo do estado incremental dos alarmes (sobrevive entre instâncias)
+        self.refresh_scope = (account_id or access_key, region)
+        # AlarmTagCache compartilhado (tags por ARN + versão da configuração)
+        self.tag_cache = tag_cache
         self.last_full_discovery = 0
         self.last_incremental_check = 0
+        # False quando a última enumeração parou no meio da paginação (lista truncada)
+        self.complete = True
         
     def create_session(self):
         """Criar sessão AWS com credenciais"""
         try:
-            self.session = boto3.Session(
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=self.region
-            )
+            self.session = aws_clients.session(self.access_key, self.secret_key, self.region, self.account_id)
             return True
         except Exception as e:
             logger.error("Erro criando sessão AWS", extra={'error': str(e)})
             return False
     
-    async def discover_all_alarms(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
+    async def discover_all_alarms(self, force_refresh: bool = False,
+                                  incremental: Optional[bool] = None) -> List[Dict[str, Any]]:
         """
         Descobrir alarmes com otimizações de cache e polling inteligente
+        
+        No modo incremental (padrão, exceto com force_refresh) só são enriquecidos
+        os alarmes que mudaram de estado ou cujo intervalo por estado venceu.
         """
         current_time = time.time()
+        if incremental is None:
+            incremental = not force_refresh and CloudWatchConfig.OPTIMIZATION.get('incremental_alarm_refresh', True)
         
         # Verificar cache primeiro se não for refresh forçado
         if not force_refresh and CloudWatchConfig.should_use_cache():
-            cached_alarms = cache_manager.get_cached_alarms()
+            cached_alarms = cache_manager.get_cached_alarms(self.account_id)
             if cached_alarms:
                 logger.info(f"Usando alarmes do cache: {len(cached_alarms)} alarmes")
                 return cached_alarms
@@ -88,23 +103,34 @@ class OptimizedCloudWatchAlarmsDiscovery:
         
         if current_time - self.last_incremental_check < polling_interval and not force_refresh:
             logger.debug("Polling interval não atingido, retornando cache")
-            return cache_manager.get_cached_alarms() or []
+            return cache_manager.get_cached_alarms(self.account_id) or []
         
         if not self.session:
             if not self.create_session():
                 return []
         
         try:
-            cloudwatch = self.session.client('cloudwatch')
-            all_alarms = []
-            
-            # Buscar alarmes métricos de forma otimizada
-            metric_alarms = await self._get_metric_alarms_optimized(cloudwatch)
-            all_alarms.extend(metric_alarms)
+            cloudwatch = aws_async.wrap(self.session.client('cloudwatch'), self.account_key)
+            
+            # Todas as páginas de alarmes métricos e compostos, enriquecidos em paralelo com a busca
+            on_page = None
+            if self.tag_cache is not None:
+                tagging = aws_async.wrap(self.session.client('resourcegroupstaggingapi'), self.account_key)
+                on_page = lambda page_alarms: self.tag_cache.prefetch(page_alarms, tagging, cloudwatch)
+            
+            all_alarms, self.complete = await alarm_enumerator.run(
+                cloudwatch,
+                lambda alarm_type, alarm: self._process_alarm(alarm_type, alarm, cloudwatch, incremental),
+                on_page=on_page
+            )
+            alarm_refresh_tracker.prune(self.refresh_scope)
             
-            # Buscar alarmes compostos
-            composite_alarms = await self._get_composite_alarms_optimized(cloudwatch)
-            all_alarms.extend(composite_alarms)
+            if not self.complete:
+                # Lista truncada: não vai para o cache nem conta como consulta, para a
+                # próxima chamada tentar a enumeração completa
+                logger.warning(f"Enumeração de alarmes incompleta na região {self.region}: "
+                               f"{len(all_alarms)} alarmes (paginação interrompida)")
+                return all_alarms
             
             # Atualizar timestamps
             self.last_incremental_check = current_time
@@ -114,76 +140,33 @@ class OptimizedCloudWatchAlarmsDiscovery:
             # Armazenar no cache
             if CloudWatchConfig.should_use_cache():
                 ttl = CloudWatchConfig.get_cache_ttl('alarms')
-                cache_manager.cache_alarms(all_alarms, ttl=ttl)
+                cache_manager.cache_alarms(all_alarms, self.account_id, ttl=ttl)
             
             logger.info(f"Descobertos {len(all_alarms)} alarmes na região {self.region}")
             return all_alarms
             
         except Exception as e:
+            self.complete = False
             logger.error("Erro na descoberta de alarmes", extra={'error': str(e)})
             return []
     
-    async def _get_metric_alarms_optimized(self, cloudwatch) -> List[Dict[str, Any]]:
-        """Buscar alarmes métricos de forma otimizada"""
-        alarms = []
+    async def _process_alarm(self, alarm_type: str, alarm: Dict, cloudwatch,
+                             incremental: bool = False) -> Optional[Dict[str, Any]]:
+        """Enriquecer um alarme conforme o tipo (usado pelos workers do enumerador)"""
+        if incremental:
+            previous, _ = alarm_refresh_tracker.check(self.refresh_scope, alarm)
+            if previous is not None:
+                # Sem mudança de estado e dentro do intervalo: sem chamadas de enriquecimento
+                return dict(previous, last_checked=datetime.now().isoformat())
         
-        try:
-            # Usar paginação mais eficiente
-            paginator = cloudwatch.get_paginator('describe_alarms')
-            page_iterator = paginator.paginate(
-                PaginationConfig={
-                    'MaxItems': 100,  # Limitar itens por página
-                    'PageSize': 50    # Tamanho da página
-                }
-            )
-            
-            for page in page_iterator:
-                # Processar alarmes em lote
-                batch_tasks = []
-                for alarm in page.get('MetricAlarms', []):
-                    task = self._process_metric_alarm_optimized(alarm, cloudwatch)
-                    batch_tasks.append(task)
-                
-                # Executar em lote com limite de concorrência
-                if batch_tasks:
-                    batch_results = await asyncio.gather(*batch_tasks, return_exceptions=True)
-                    for result in batch_results:
-                        if isinstance(result, dict):
-                            alarms.append(result)
-                        elif not isinstance(result, Exception):
-                            logger.error(f"Resultado inesperado: {result}")
-                
-                # Pequena pausa para não sobrecarregar a API
-                await asyncio.sleep(0.1)
-                        
-        except ClientError as e:
-            logger.error("Erro buscando alarmes métricos", extra={'error': str(e)})
-        
-        return alarms
-    
-    async def _get_composite_alarms_optimized(self, cloudwatch) -> List[Dict[str, Any]]:
-        """Buscar alarmes compostos de forma otimizada"""
-        alarms = []
-        
-        try:
-            paginator = cloudwatch.get_paginator('describe_alarms')
-            page_iterator = paginator.paginate(
-                AlarmTypes=['CompositeAlarm'],
-                PaginationConfig={'PageSize': 50}
-            )
-            
-            for page in page_iterator:
-                for alarm in page.get('CompositeAlarms', []):
-                    alarm_data = await self._process_composite_alarm_optimized(alarm, cloudwatch)
-                    if alarm_data:
-                        alarms.append(alarm_data)
-                
-                await asyncio.sleep(0.1)
-                        
-        except ClientError as e:
-            logger.error("Erro buscando alarmes compostos", extra={'error': str(e)})
+        if alarm_type == 'CompositeAlarm':
+            processed = await self._process_composite_alarm_optimized(alarm, cloudwatch)
+        else:
+            processed = await self._process_metric_alarm_optimized(alarm, cloudwatch)
         
-        return alarms
+        if processed is not None:
+            alarm_refresh_tracker.remember(self.refresh_scope, alarm, processed)
+        return processed
     
     async def _process_metric_alarm_optimized(self, alarm: Dict, cloudwatch) -> Optional[Dict[str, Any]]:
         """Processar alarme métrico de forma otimizada"""
@@ -210,7 +193,7 @@ class OptimizedCloudWatchAlarmsDiscovery:
             # Buscar tags apenas se necessário
             tags = []
             if alarm.get('AlarmArn'):
-                tags = await self._get_alarm_tags_cached(alarm['AlarmArn'], cloudwatch)
+                tags = await self._get_alarm_tags(alarm, cloudwatch)
             
             return {
                 'alarm_name': alarm_name,
@@ -264,7 +247,7 @@ class OptimizedCloudWatchAlarmsDiscovery:
             
             max_records = CloudWatchConfig.QUERY_LIMITS.get('max_alarm_history_records', 10)
             
-            response = cloudwatch.describe_alarm_history(
+            response = await cloudwatch.describe_alarm_history(
                 AlarmName=alarm_name,
                 StartDate=start_time,
                 EndDate=end_time,
@@ -312,7 +295,7 @@ class OptimizedCloudWatchAlarmsDiscovery:
                 'Statistics': [alarm.get('Statistic', 'Average')]
             }
             
-            response = cloudwatch.get_metric_statistics(**metric_params)
+            response = await cloudwatch.get_metric_statistics(**metric_params)
             
             datapoints = response.get('Datapoints', [])
             if datapoints:
@@ -334,10 +317,18 @@ class OptimizedCloudWatchAlarmsDiscovery:
             logger.error("Erro buscando estatísticas da métrica", extra={'error': str(e)})
             return None
     
+    async def _get_alarm_tags(self, alarm: Dict, cloudwatch) -> List[Dict]:
+        """Tags do cache (pré-carregadas por página); sem cache, uma chamada por alarme"""
+        if self.tag_cache is not None:
+            tags = self.tag_cache.lookup(alarm)
+            if tags is not None:
+                return tags
+        return await self._get_alarm_tags_cached(alarm['AlarmArn'], cloudwatch)
+    
     async def _get_alarm_tags_cached(self, alarm_arn: str, cloudwatch) -> List[Dict]:
         """Buscar tags do alarme com cache simples"""
         try:
-            response = cloudwatch.list_tags_for_resource(ResourceARN=alarm_arn)
+            response = await cloudwatch.list_tags_for_resource(ResourceARN=alarm_arn)
             return response.get('Tags', [])
         except ClientError:
             return []
@@ -409,7 +400,7 @@ class OptimizedCloudWatchAlarmsDiscovery:
             # Tags apenas se necessário
             tags = []
             if alarm.get('AlarmArn'):
-                tags = await self._get_alarm_tags_cached(alarm['AlarmArn'], cloudwatch)
+                tags = await self._get_alarm_tags(alarm, cloudwatch)
             
             return {
                 'alarm_name': alarm['AlarmName'],
@@ -6,6 +6,7 @@ Coleta dados do CloudWatch e integra diretamente com Bedrock para análise
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
@@ -14,8 +15,24 @@ import boto3
 from botocore.exceptions import ClientError
 import structlog
 
+from services.aws_async import aws_async
+from services.aws_clients import aws_clients
+from services.bedrock_client import bedrock_async
+from services.analysis_cache import analysis_cache
+from processors.log_template_miner import LogTemplateMiner
+from ai.rule_classifier import rule_classifier
+
 logger = structlog.get_logger(__name__)
 
+# Modelos e versão dos prompts (alterar a versão invalida o cache de análises)
+HAIKU_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
+SONNET_MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
+PROMPT_VERSION = "v1"
+
+# Validade da análise de um template de log (falhas são refeitas mais cedo)
+TEMPLATE_ANALYSIS_TTL = 3600
+TEMPLATE_ANALYSIS_RETRY = 60
+
 
 @dataclass
 class LogEvent:
@@ -43,14 +60,14 @@ class AWSCollector:
         # Inicializar clientes AWS
         self._init_aws_clients()
         
-        # Cliente Bedrock para análise imediata
-        self.bedrock_client = boto3.client(
-            'bedrock-runtime',
-            region_name=account_config.get("bedrock_region", "us-east-1")
+        # Cliente Bedrock para análise imediata (chamadas via bedrock_async)
+        self.bedrock_client = aws_clients.default_client(
+            'bedrock-runtime', account_config.get("bedrock_region", "us-east-1")
         )
         
-        # Cache para evitar análises duplicadas
-        self._analysis_cache = {}
+        # Templates de log: um representante por modo de falha vai para o Bedrock
+        self.template_miner = LogTemplateMiner()
+        self._template_stats = {'error_logs': 0, 'bedrock_analyses': 0, 'reused_analyses': 0}
         
     def _init_aws_clients(self):
         """Inicializa clientes AWS baseado no método de autenticação"""
@@ -90,11 +107,11 @@ class AWSCollector:
             session = boto3.Session()
         
         # Inicializar clientes específicos
-        self.cloudwatch_logs = session.client('logs', region_name=self.region)
-        self.cloudwatch_metrics = session.client('cloudwatch', region_name=self.region)
-        self.ecs_client = session.client('ecs', region_name=self.region)
-        self.elb_client = session.client('elbv2', region_name=self.region)
-        self.rds_client = session.client('rds', region_name=self.region)
+        self.cloudwatch_logs = aws_async.wrap(session.client('logs', region_name=self.region), self.account_id)
+        self.cloudwatch_metrics = aws_async.wrap(session.client('cloudwatch', region_name=self.region), self.account_id)
+        self.ecs_client = aws_async.wrap(session.client('ecs', region_name=self.region), self.account_id)
+        self.elb_client = aws_async.wrap(session.client('elbv2', region_name=self.region), self.account_id)
+        self.rds_client = aws_async.wrap(session.client('rds', region_name=self.region), self.account_id)
         
     async def collect_real_time_logs(self, log_groups: List[str]) -> List[LogEvent]:
         """
@@ -108,7 +125,7 @@ class AWSCollector:
                 end_time = datetime.utcnow()
                 start_time = end_time - timedelta(minutes=5)
                 
-                response = self.cloudwatch_logs.filter_log_events(
+                response = await self.cloudwatch_logs.filter_log_events(
                     logGroupName=log_group,
                     startTime=int(start_time.timestamp() * 1000),
                     endTime=int(end_time.timestamp() * 1000)
@@ -128,8 +145,7 @@ class AWSCollector:
                     
                     # Análise imediata com Bedrock se for um log de erro
                     if self._is_error_log(event['message']):
-                        analysis = await self._analyze_log_with_bedrock(log_event)
-                        log_event.metadata['ai_analysis'] = analysis
+                        await self._analyze_by_template(log_event)
                     
                     all_events.append(log_event)
                     
@@ -143,15 +159,55 @@ class AWSCollector:
         
         return all_events
     
+    async def _analyze_by_template(self, log_event: LogEvent) -> None:
+        """
+        Agrupar o log no seu template e analisar só o primeiro membro de cada template
+        
+        Os demais membros recebem a análise do representante enquanto ela for válida.
+        """
+        self._template_stats['error_logs'] += 1
+        cluster, _ = self.template_miner.add(log_event.message, group=log_event.service_name)
+        
+        if cluster.has_analysis():
+            self._template_stats['reused_analyses'] += 1
+            source = 'template'
+        else:
+            self._template_stats['bedrock_analyses'] += 1
+            analysis = await self._analyze_log_with_bedrock(log_event)
+            cluster.analysis = analysis
+            ttl = TEMPLATE_ANALYSIS_RETRY if 'error' in analysis else TEMPLATE_ANALYSIS_TTL
+            cluster.analysis_expires_at = time.time() + ttl
+            source = 'representative'
+        
+        log_event.metadata['ai_analysis'] = cluster.analysis
+        log_event.metadata['log_template'] = {
+            'template_id': cluster.cluster_id,
+            'template': cluster.template,
+            'occurrences': cluster.size,
+            'analysis_source': source
+        }
+    
+    def get_template_stats(self) -> Dict[str, Any]:
+        """Estatísticas de templates: logs de erro x análises enviadas ao Bedrock"""
+        return dict(self._template_stats, miner=self.template_miner.get_stats())
+    
     async def _analyze_log_with_bedrock(self, log_event: LogEvent) -> Dict[str, Any]:
         """
         Análise imediata do log usando Claude-3 Haiku para classificação rápida
         """
-        # Cache key para evitar análises duplicadas
-        cache_key = f"{log_event.service_name}:{hash(log_event.message)}"
+        # Padrões conhecidos (OOM, health check, timeout...) não vão para o Bedrock
+        local_analysis = rule_classifier.classify(log_event.message)
+        if local_analysis is not None:
+            return local_analysis
         
-        if cache_key in self._analysis_cache:
-            return self._analysis_cache[cache_key]
+        # Cache compartilhado para evitar análises duplicadas (estável entre processos)
+        cache_key = analysis_cache.key(
+            HAIKU_MODEL_ID, "collector_log_analysis", PROMPT_VERSION,
+            service=log_event.service_name, message=log_event.message
+        )
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         prompt = f"""
         Analise rapidamente este log AWS e classifique:
@@ -171,27 +227,21 @@ class AWSCollector:
         """
         
         try:
-            response = self.bedrock_client.invoke_model(
-                modelId="anthropic.claude-3-haiku-20240307-v1:0",
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 500,
-                    "temperature": 0.05
-                })
+            analysis_text = await bedrock_async.invoke_text(
+                HAIKU_MODEL_ID, prompt, max_tokens=500, temperature=0.05,
+                client=self.bedrock_client, account_key=self.account_id
             )
-            
-            result = json.loads(response['body'].read())
-            analysis = json.loads(result['content'][0]['text'])
-            
-            # Cache por 1 hora
-            self._analysis_cache[cache_key] = analysis
+            analysis = json.loads(analysis_text)
             
             # Se precisar de análise detalhada, fazer com Claude-3 Sonnet
             if analysis.get('needs_detailed_analysis'):
                 detailed_analysis = await self._detailed_analysis_with_sonnet(log_event)
                 analysis['detailed_analysis'] = detailed_analysis
             
+            # Cache por 1 hora (TTL do cache de análises); análises com erro não são guardadas
+            if 'error' not in analysis.get('detailed_analysis', {}):
+                analysis_cache.set(cache_key, analysis)
+            
             return analysis
             
         except Exception as e:
@@ -238,18 +288,11 @@ class AWSCollector:
         """
         
         try:
-            response = self.bedrock_client.invoke_model(
-                modelId="anthropic.claude-3-sonnet-20240229-v1:0",
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "messages": [{"role": "user", "content": prompt}],
-                    "max_tokens": 2000,
-                    "temperature": 0.1
-                })
+            analysis_text = await bedrock_async.invoke_text(
+                SONNET_MODEL_ID, prompt, max_tokens=2000, temperature=0.1,
+                client=self.bedrock_client, account_key=self.account_id
             )
-            
-            result = json.loads(response['body'].read())
-            return json.loads(result['content'][0]['text'])
+            return json.loads(analysis_text)
             
         except Exception as e:
             logger.error(
@@ -293,7 +336,7 @@ class AWSCollector:
             
             # Métricas básicas de CPU e Memory se for ECS
             if 'ecs' in service_name.lower():
-                response = self.cloudwatch_metrics.get_metric_statistics(
+                response = await self.cloudwatch_metrics.get_metric_statistics(
                     Namespace='AWS/ECS',
                     MetricName='CPUUtilization',
                     StartTime=start_time,
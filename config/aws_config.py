@@ -0,0 +1,138 @@
+"""
+AWSNoc IA IA - Configuração das chamadas AWS
+Limites de concorrência da camada assíncrona sobre o boto3, da descoberta e do diagnóstico SSM
+"""
+
+
+class AWSConfig:
+    """
+    Configurações das chamadas à API da AWS
+    """
+
+    # Execução assíncrona das chamadas boto3
+    ASYNC_CALLS = {
+        'max_workers': 32,              # Threads compartilhadas para chamadas boto3
+        'per_account_concurrency': 8    # Chamadas simultâneas por conta AWS
+    }
+
+    # Descoberta de recursos em múltiplas contas
+    DISCOVERY = {
+        'account_concurrency': 4,       # Contas descobertas ao mesmo tempo
+        'account_timeout': 300,         # Segundos máximos por conta
+        'service_concurrency': 8,       # Serviços (discover_*) simultâneos por conta
+        'analysis_concurrency': 2       # Análises de IA simultâneas por conta (fatia do token bucket do Bedrock)
+    }
+
+    # Diagnóstico de instâncias EC2 via SSM
+    SSM_DIAGNOSTICS = {
+        'deadline_seconds': 30,         # Prazo máximo aguardando os comandos
+        'initial_poll_interval': 1.0,   # Primeira consulta de status (s)
+        'max_poll_interval': 5.0,       # Intervalo máximo entre consultas (backoff)
+        'max_instances_per_command': 50 # Limite de instâncias por send_command
+    }
+
+    # Varredura de saúde dos target groups
+    TARGET_HEALTH = {
+        'max_concurrency': 16,          # describe_target_health simultâneos
+        'calls_per_second': 50          # Limite de chamadas por segundo por varredura
+    }
+
+    # Clientes boto3 compartilhados (timeouts e retries vêm de CloudWatchConfig.TIMEOUTS)
+    CLIENTS = {
+        'max_pool_connections': 32,     # Conexões HTTP por cliente (acompanha max_workers)
+        'retry_mode': 'adaptive',       # Retry com controle de taxa no cliente
+        'read_timeout_overrides': {     # Serviços com respostas mais lentas
+            'bedrock-runtime': 120
+        },
+        'retry_attempts_overrides': {   # Serviços com retry próprio (1 = sem retry do botocore)
+            'bedrock-runtime': 1
+        }
+    }
+
+    # Coalescência de GETs idênticos e simultâneos (single-flight)
+    REQUEST_COALESCING = {
+        'enabled': True,
+        'micro_ttl': {                  # Segundos reaproveitando o resultado (0 = só em andamento)
+            'ecs_services': 2,
+            'cloudwatch_alarms': 2,
+            'account_resources': 1
+        }
+    }
+
+    # Cache de análises do Bedrock (chave: modelo + template/versão + entrada normalizada)
+    ANALYSIS_CACHE = {
+        'backend': 'sqlite',            # sqlite (disco local), shared (backend do cache do CloudWatch) ou memory
+        'sqlite_path': '/tmp/awsnoc_analysis_cache.db',
+        'ttl_seconds': 3600,            # Validade de uma análise
+        'max_entries': 20000,           # Limite de entradas no backend persistente
+        'memory_entries': 2000,         # Limite do LRU em memória na frente do backend
+        'cleanup_every_sets': 500       # Aplicar TTL/limite no backend a cada N gravações
+    }
+
+    # Classificação rápida de logs em micro-lotes (BedrockAnalyzer)
+    BEDROCK_CLASSIFICATION = {
+        'batch_window_ms': 250,         # Tempo máximo acumulando eventos
+        'max_batch_events': 20,         # Eventos por prompt
+        'token_budget': 3000,           # Tokens (aprox.) de entrada por lote
+        'max_message_chars': 2000,      # Mensagem truncada no prompt do lote
+        'output_tokens_per_event': 120, # max_tokens da resposta por evento
+        'local_rules_enabled': True,    # Pré-classificar padrões conhecidos sem chamar o modelo
+        'local_rules_min_confidence': 0.85  # Confiança mínima da regra para dispensar o modelo
+    }
+
+    # Cliente assíncrono do Bedrock compartilhado pelos módulos de IA
+    BEDROCK_CLIENT = {
+        'region': 'us-east-2',          # Região do cliente padrão
+        'max_concurrency': 8,           # invoke_model simultâneos por event loop
+        'requests_per_second': 2.0,     # Token bucket por modelo
+        'burst': 5,                     # Capacidade do bucket
+        'model_rates': {},              # Taxa por modelo (model_id -> req/s)
+        'max_retries': 5,               # Novas tentativas em throttling
+        'base_backoff_seconds': 0.5,    # Backoff exponencial com jitter
+        'max_backoff_seconds': 20.0
+    }
+
+    @classmethod
+    def get_async_setting(cls, setting: str, default=None):
+        """Obter parâmetro da camada assíncrona"""
+        return cls.ASYNC_CALLS.get(setting, default)
+
+    @classmethod
+    def get_discovery_setting(cls, setting: str, default=None):
+        """Obter parâmetro da descoberta de recursos"""
+        return cls.DISCOVERY.get(setting, default)
+
+    @classmethod
+    def get_ssm_setting(cls, setting: str, default=None):
+        """Obter parâmetro do diagnóstico SSM"""
+        return cls.SSM_DIAGNOSTICS.get(setting, default)
+
+    @classmethod
+    def get_target_health_setting(cls, setting: str, default=None):
+        """Obter parâmetro da varredura de target groups"""
+        return cls.TARGET_HEALTH.get(setting, default)
+
+    @classmethod
+    def get_client_setting(cls, setting: str, default=None):
+        """Obter parâmetro dos clientes boto3"""
+        return cls.CLIENTS.get(setting, default)
+
+    @classmethod
+    def get_coalescing_setting(cls, setting: str, default=None):
+        """Obter parâmetro da coalescência de requisições"""
+        return cls.REQUEST_COALESCING.get(setting, default)
+
+    @classmethod
+    def get_analysis_cache_setting(cls, setting: str, default=None):
+        """Obter parâmetro do cache de análises de IA"""
+        return cls.ANALYSIS_CACHE.get(setting, default)
+
+    @classmethod
+    def get_classification_setting(cls, setting: str, default=None):
+        """Obter parâmetro da classificação em lote"""
+        return cls.BEDROCK_CLASSIFICATION.get(setting, default)
+
+    @classmethod
+    def get_bedrock_client_setting(cls, setting: str, default=None):
+        """Obter parâmetro do cliente Bedrock"""
+        return cls.BEDROCK_CLIENT.get(setting, default)
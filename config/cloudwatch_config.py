@@ -3,6 +3,7 @@ AWSNoc IA IA - Configuração de CloudWatch
 Configurações para otimizar custos de consultas do CloudWatch
 """
 
+import os
 from datetime import timedelta
 
 class CloudWatchConfig:
@@ -15,7 +16,11 @@ class CloudWatchConfig:
         'alarms': 30,           # Consultar alarmes a cada 30 segundos
         'metrics': 60,          # Consultar métricas a cada 60 segundos  
         'logs': 120,            # Consultar logs a cada 2 minutos
-        'discovery': 300        # Descoberta completa a cada 5 minutos
+        'discovery': 300,       # Descoberta completa a cada 5 minutos
+        'health_target_groups': 30,     # Health check de Target Groups a cada 30 segundos
+        'health_ecs_services': 30,      # Health check de serviços ECS a cada 30 segundos
+        'health_ec2_instances': 60,     # Health check de instâncias EC2 a cada 1 minuto
+        'health_rds_instances': 120     # Health check de instâncias RDS a cada 2 minutos
     }
     
     # Configurações de cache
@@ -26,12 +31,39 @@ class CloudWatchConfig:
         'discovery': 295        # Cache de descoberta por 295 segundos
     }
     
+    # Limites do cache em memória (LRU)
+    CACHE_LIMITS = {
+        'max_entries': 10000,               # Máximo de entradas no cache
+        'max_bytes': 64 * 1024 * 1024       # Máximo de bytes (tamanho estimado dos valores)
+    }
+    
+    # Backend do cache (memory, sqlite, kv ou local_kv); sqlite e kv são
+    # compartilhados entre workers do uvicorn, kv também entre hosts
+    CACHE_BACKEND = {
+        'type': os.getenv('AWSNOC_CACHE_BACKEND', 'memory'),
+        'sqlite_path': os.getenv('AWSNOC_CACHE_SQLITE_PATH', '/tmp/awsnoc_cloudwatch_cache.db'),
+        'kv_url': os.getenv('AWSNOC_CACHE_URL', 'redis://localhost:6379/0'),
+        'kv_prefix': 'awsnoc:cw:',          # Prefixo das chaves no servidor
+        'kv_socket_timeout': 1.0,           # Timeout (s) das operações no servidor
+        'compress_min_bytes': 1024          # Valores maiores são comprimidos com zlib
+    }
+    
     # Limites para consultas do CloudWatch
     QUERY_LIMITS = {
         'max_datapoints_per_query': 100,    # Máximo de pontos de dados por consulta
         'max_metrics_per_batch': 20,        # Máximo de métricas por lote
         'history_hours': 24,                # Horas de histórico para buscar
-        'max_alarm_history_records': 10     # Máximo de registros de histórico por alarme
+        'max_alarm_history_records': 10,    # Máximo de registros de histórico por alarme
+        'max_queries_per_get_metric_data': 500,  # Limite de consultas por chamada GetMetricData
+        'latest_period': 60,                # Período (s) das métricas de valor mais recente
+        'latest_window_minutes': 10         # Janela buscada para achar o datapoint mais recente
+    }
+    
+    # Enumeração de alarmes (describe_alarms em streaming + enriquecimento paralelo)
+    ALARM_ENUMERATION = {
+        'page_size': 100,                   # Registros por página (máximo da API)
+        'enrichment_workers': 16,           # Alarmes enriquecidos simultaneamente
+        'queue_size': 500                   # Alarmes aguardando enriquecimento (backpressure)
     }
     
     # Configurações de otimização
@@ -40,7 +72,8 @@ class CloudWatchConfig:
         'batch_metric_requests': True,       # Agrupar requisições de métricas
         'cache_enabled': True,               # Habilitar cache
         'compress_historical_data': True,    # Comprimir dados históricos
-        'lazy_load_details': True           # Carregar detalhes sob demanda
+        'lazy_load_details': True,          # Carregar detalhes sob demanda
+        'incremental_alarm_refresh': True   # Reenriquecer só alarmes alterados ou vencidos (ALARM_POLLING_BY_STATE)
     }
     
     # Configurações específicas por estado de alarme
@@ -0,0 +1,22 @@
+"""
+AWSNoc IA IA - Configuração do Banco de Dados
+Parâmetros do pool de conexões PostgreSQL compartilhado
+"""
+
+
+class DatabaseConfig:
+    """
+    Configurações do pool de conexões
+    """
+
+    # Tamanho do pool (por processo uvicorn)
+    POOL = {
+        'min_connections': 2,       # Conexões abertas na inicialização
+        'max_connections': 20,      # Limite de conexões simultâneas
+        'acquire_timeout': 10       # Segundos aguardando uma conexão livre
+    }
+
+    @classmethod
+    def get_pool_setting(cls, setting: str, default=None):
+        """Obter parâmetro do pool de conexões"""
+        return cls.POOL.get(setting, default)
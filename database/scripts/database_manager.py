@@ -4,6 +4,11 @@ from datetime import datetime
 from typing import List, Dict, Optional
 import json
 
+try:
+    from services.aws_clients import aws_clients
+except ImportError:
+    aws_clients = None
+
 class DatabaseManager:
     def __init__(self, host: str, port: int, database: str, username: str, password: str):
         self.host = host
@@ -199,6 +204,10 @@ class DatabaseManager:
             cursor.execute("DELETE FROM aws_accounts WHERE id = %s", (account_id,))
             
             cursor.close()
+            
+            # Descartar sessão e clientes AWS em cache da conta removida
+            if aws_clients is not None:
+                aws_clients.evict(account_id=account_id)
             return True
             
         except Exception as e:
@@ -4,6 +4,11 @@ from datetime import datetime
 from typing import List, Dict, Optional
 import json
 
+try:
+    from services.aws_clients import aws_clients
+except ImportError:
+    aws_clients = None
+
 class DatabaseManager:
     def __init__(self, host: str, port: int, database: str, username: str, password: str):
         self.host = host
@@ -73,6 +78,10 @@ class DatabaseManager:
                     created_at TIMESTAMP
                 )
             """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_aws_resources_account_resource
+                ON aws_resources (account_id, resource_type, resource_id)
+            """)
             
             # Alerts table
             cursor.execute("""
@@ -88,9 +97,16 @@ class DatabaseManager:
                     status VARCHAR(50) DEFAULT 'active',
                     ai_analysis JSONB DEFAULT '{}',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    resolved_at TIMESTAMP
+                    resolved_at TIMESTAMP,
+                    fingerprint VARCHAR(64),
+                    updated_at TIMESTAMP,
+                    check_metadata JSONB DEFAULT '{}'
                 )
             """)
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_active_fingerprint
+                ON alerts (fingerprint) WHERE status = 'active'
+            """)
             
             # Logs table
             cursor.execute("""
@@ -199,6 +215,10 @@ class DatabaseManager:
             cursor.execute("DELETE FROM aws_accounts WHERE id = %s", (account_id,))
             
             cursor.close()
+            
+            # Descartar sessão e clientes AWS em cache da conta removida
+            if aws_clients is not None:
+                aws_clients.evict(account_id=account_id)
             return True
             
         except Exception as e:
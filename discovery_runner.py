@@ -0,0 +1,290 @@
+"""
+AWSNoc IA IA - Discovery Runner
+Descoberta de recursos em todas as contas ativas, em paralelo e com limite de concorrência
+"""
+
+import json
+import asyncio
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import psycopg2
+import psycopg2.extras
+
+from services.db_pool import get_pool
+from services.resource_ingest import resource_ingestor
+from config.aws_config import AWSConfig
+
+
+class DiscoveryCancelled(Exception):
+    """Descoberta da conta abandonada (timeout) antes de gravar no banco"""
+
+
+class DiscoveryRunner:
+    """
+    Executa a descoberta das contas em paralelo, cada uma com seu timeout
+
+    O resultado de cada conta fica disponível em get_status() assim que ela termina.
+    """
+
+    def __init__(self, db_config: Dict[str, Any], concurrency: Optional[int] = None,
+                 account_timeout: Optional[float] = None, tg_index=None):
+        self.db_config = db_config
+        # Índice target group -> serviços ECS atualizado a cada descoberta
+        self.tg_index = tg_index
+        self.concurrency = concurrency or AWSConfig.get_discovery_setting('account_concurrency', 4)
+        self.account_timeout = account_timeout or AWSConfig.get_discovery_setting('account_timeout', 300)
+
+        self.accounts: Dict[int, Dict[str, Any]] = {}
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def get_db_connection(self, autocommit: bool = True):
+        """Obter conexão do pool compartilhado (close() devolve ao pool)"""
+        return get_pool(self.db_config).getconn(autocommit=autocommit)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Threads dedicadas: a descoberta de uma conta ocupa a thread por vários segundos
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.concurrency,
+                thread_name_prefix='discovery'
+            )
+        return self._executor
+
+    def _get_active_accounts(self) -> List[Dict[str, Any]]:
+        conn = self.get_db_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute("SELECT * FROM aws_accounts WHERE status = 'active'")
+            accounts = [dict(account) for account in cursor.fetchall()]
+            cursor.close()
+            return accounts
+        finally:
+            conn.close()
+
+    def start(self) -> bool:
+        """Iniciar a descoberta em background; False se já houver uma em andamento"""
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self.run())
+        return True
+
+    async def wait(self) -> Dict[str, Any]:
+        """Iniciar (se necessário) e aguardar a descoberta terminar"""
+        self.start()
+        return await asyncio.shield(self._task)
+
+    async def run(self) -> Dict[str, Any]:
+        """Descobrir todas as contas ativas e retornar o resumo"""
+        accounts = await asyncio.get_running_loop().run_in_executor(None, self._get_active_accounts)
+
+        self.started_at = datetime.now()
+        self.finished_at = None
+        self.accounts = {
+            account['id']: {
+                'account_id': account['id'],
+                'account_name': account['name'],
+                'status': 'pending',
+                'resources_found': 0,
+                'alerts_generated': 0
+            }
+            for account in accounts
+        }
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*[self._run_account(account, semaphore) for account in accounts])
+
+        self.finished_at = datetime.now()
+        return self.get_status()
+
+    async def _run_account(self, account: Dict[str, Any], semaphore: asyncio.Semaphore):
+        status = self.accounts[account['id']]
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            cancelled = threading.Event()
+            picked_up = loop.create_future()
+
+            def job():
+                # O prazo só começa quando uma thread do pool assume a conta
+                loop.call_soon_threadsafe(lambda: picked_up.done() or picked_up.set_result(None))
+                return self._discover_account(account, cancelled, time.monotonic() + self.account_timeout)
+
+            future = loop.run_in_executor(self._get_executor(), job)
+            # Exceções de uma thread abandonada (ex.: DiscoveryCancelled) não devem ficar sem leitura
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            started = time.monotonic()
+            try:
+                await asyncio.wait({picked_up, future}, return_when=asyncio.FIRST_COMPLETED)
+                status['status'] = 'running'
+                started = time.monotonic()
+                result = await asyncio.wait_for(asyncio.shield(future), timeout=self.account_timeout)
+                status.update(result)
+                status['status'] = 'success'
+            except asyncio.TimeoutError:
+                # A thread continua até o próximo ponto de verificação, mas não grava mais nada
+                cancelled.set()
+                status['status'] = 'timeout'
+                status['error'] = f"Descoberta excedeu {self.account_timeout}s"
+            except Exception as e:
+                status['status'] = 'error'
+                status['error'] = str(e)
+            finally:
+                status['duration_seconds'] = round(time.monotonic() - started, 2)
+                status['finished_at'] = datetime.now().isoformat()
+
+        print(f"Descoberta da conta {account['name']}: {status['status']} "
+              f"({status['resources_found']} recursos, {status['alerts_generated']} alertas, "
+              f"{status['duration_seconds']}s)")
+
+    @staticmethod
+    def _check_cancelled(cancelled: Optional[threading.Event], deadline: Optional[float]) -> None:
+        if (cancelled is not None and cancelled.is_set()) or (deadline is not None and time.monotonic() > deadline):
+            raise DiscoveryCancelled("Descoberta cancelada por timeout")
+
+    def _discover_account(self, account: Dict[str, Any], cancelled: Optional[threading.Event] = None,
+                          deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Descobrir, salvar e analisar os recursos de uma conta (executa em thread)
+
+        ``cancelled``/``deadline`` são verificados antes de cada escrita no banco:
+        uma conta que estourou o prazo não grava recursos nem alertas.
+        """
+        from aws_discovery import AWSResourceDiscovery
+        from ai_analysis import AIAnalysisService
+
+        ai_service = AIAnalysisService()
+
+        # Descobrir recursos reais da AWS
+        discovery = AWSResourceDiscovery(
+            account['access_key'],
+            account['secret_key'],
+            account['region'],
+            account['id']
+        )
+
+        resources = discovery.discover_all_resources()
+        self._check_cancelled(cancelled, deadline)
+
+        # Salvar recursos no banco (COPY + merge atômico, sem esvaziar a tabela); a conexão
+        # volta ao pool antes da análise, que pode levar até o prazo da conta
+        conn = self.get_db_connection(autocommit=False)
+        try:
+            resource_ingestor.ingest(conn, account['id'], resources)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if self.tg_index is not None:
+            self.tg_index.update_account(account['id'], resources)
+
+        # Analisar recursos para gerar alertas (chamadas ao Bedrock concorrentes,
+        # com taxa e retry controlados pelo cliente compartilhado)
+        remaining = max(deadline - time.monotonic(), 0.001) if deadline is not None else None
+        try:
+            analyses = asyncio.run(asyncio.wait_for(
+                self._analyze_resources(ai_service, resources), timeout=remaining
+            ))
+        except asyncio.TimeoutError:
+            raise DiscoveryCancelled("Análise dos recursos excedeu o prazo da conta")
+
+        alert_rows = []
+        for resource, analysis in zip(resources, analyses):
+            try:
+                if isinstance(analysis, Exception):
+                    raise analysis
+
+                if analysis.get('health_status') in ['warning', 'critical']:
+                    issues = analysis.get('issues', [])
+
+                    for issue in issues:
+                        if issue.get('severity') in ['high', 'critical']:
+                            alert_rows.append((
+                                account['id'],
+                                resource['resource_id'],
+                                resource['resource_type'],
+                                issue.get('type', 'unknown'),
+                                issue.get('severity'),
+                                f"{issue.get('type', 'Issue').title()} - {resource.get('name', 'Unknown Resource')}",
+                                issue.get('description', 'No description available'),
+                                json.dumps(analysis)
+                            ))
+            except Exception as e:
+                print(f"Erro ao analisar recurso {resource.get('resource_id')}: {e}")
+                continue
+
+        # Criar alertas com uma conexão nova, só pelo tempo dos INSERTs
+        self._check_cancelled(cancelled, deadline)
+        if alert_rows:
+            conn = self.get_db_connection(autocommit=False)
+            try:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    INSERT INTO alerts
+                    (account_id, resource_id, resource_type, alert_type, severity, title, description, ai_analysis)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, alert_rows)
+                self._check_cancelled(cancelled, deadline)
+                conn.commit()
+                cursor.close()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+        alerts_generated = len(alert_rows)
+
+        return {
+            'resources_found': len(resources),
+            'alerts_generated': alerts_generated,
+            'service_timings': discovery.service_timings,
+            'service_errors': discovery.service_errors
+        }
+
+    @staticmethod
+    async def _analyze_resources(ai_service, resources: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Analisar a saúde de todos os recursos (exceções vêm no lugar da análise)
+
+        Poucas análises simultâneas por conta: as demais contas e a API continuam
+        tendo vez no token bucket do modelo.
+        """
+        semaphore = asyncio.Semaphore(AWSConfig.get_discovery_setting('analysis_concurrency', 2))
+
+        async def analyze(resource):
+            async with semaphore:
+                return await ai_service.analyze_resource_health(resource)
+
+        return await asyncio.gather(*[analyze(resource) for resource in resources], return_exceptions=True)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Resumo da execução atual (ou da última) com o resultado de cada conta"""
+        accounts = list(self.accounts.values())
+        return {
+            'running': self.running,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'concurrency': self.concurrency,
+            'account_timeout': self.account_timeout,
+            'accounts_total': len(accounts),
+            'accounts_completed': sum(1 for a in accounts if a['status'] not in ('pending', 'running')),
+            'resources_found': sum(a['resources_found'] for a in accounts),
+            'alerts_generated': sum(a['alerts_generated'] for a in accounts),
+            'accounts': accounts
+        }
+
+    def shutdown(self):
+        """Encerrar as threads de descoberta (shutdown da aplicação)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
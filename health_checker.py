@@ -3,86 +3,120 @@ AWSNoc IA IA - Health Checker
 Sistema inteligente para detectar problemas reais em recursos AWS
 """
 
-import boto3
 import json
+import hashlib
 import asyncio
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import psycopg2
 import psycopg2.extras
 
+from services.db_pool import get_pool
+from services.aws_async import aws_async
+from services.aws_clients import aws_clients
+from services.target_health import target_health_scanner
+from config.cloudwatch_config import CloudWatchConfig
+
 class HealthChecker:
     """
     Verificador de saúde dos recursos AWS
     """
     
+    # Verificações disponíveis: nome -> (método, resource_type dos alertas gerados)
+    CHECKS = {
+        'target_groups': ('_check_target_groups_health', 'TargetGroup'),
+        'ecs_services': ('_check_ecs_services_health', 'ECS_Service'),
+        'ec2_instances': ('_check_ec2_instances_health', 'EC2_Instance'),
+        'rds_instances': ('_check_rds_instances_health', 'RDS_Instance')
+    }
+    
+    # Colunas de reconciliação já garantidas neste processo
+    _alert_schema_ready = False
+    
     def __init__(self, db_config: Dict[str, Any]):
         self.db_config = db_config
     
     def get_db_connection(self):
-        """Obter conexão com banco"""
-        return psycopg2.connect(**self.db_config)
+        """Obter conexão do pool compartilhado (close() devolve ao pool)"""
+        return get_pool(self.db_config).getconn(autocommit=False)
     
     async def check_all_resources_health(self) -> List[Dict[str, Any]]:
         """
         Verificar saúde de todos os recursos
         """
+        return await self.run_checks(list(self.CHECKS))
+    
+    async def run_checks(self, check_names: List[str]) -> List[Dict[str, Any]]:
+        """
+        Executar apenas as verificações indicadas e salvar seus alertas
+        """
         alerts = []
         
-        # Buscar todas as contas
-        accounts = self._get_all_accounts()
+        # Buscar todas as contas (consulta síncrona em thread, fora do event loop)
+        accounts = await asyncio.get_running_loop().run_in_executor(None, self._get_all_accounts)
+        if not accounts:
+            return alerts
         
-        for account in accounts:
-            try:
-                session = boto3.Session(
-                    aws_access_key_id=account['access_key'],
-                    aws_secret_access_key=account['secret_key'],
-                    region_name=account['region']
-                )
-                
-                # Verificar Target Groups
-                tg_alerts = await self._check_target_groups_health(session, account)
-                alerts.extend(tg_alerts)
-                
-                # Verificar ECS Services
-                ecs_alerts = await self._check_ecs_services_health(session, account)
-                alerts.extend(ecs_alerts)
-                
-                # Verificar EC2 Instances
-                ec2_alerts = await self._check_ec2_instances_health(session, account)
-                alerts.extend(ec2_alerts)
-                
-                # Verificar RDS Instances
-                rds_alerts = await self._check_rds_instances_health(session, account)
-                alerts.extend(rds_alerts)
-                
-            except Exception as e:
-                print(f"Erro verificando saúde da conta {account['name']}: {e}")
+        # Verificar contas em paralelo (limite de chamadas por conta na camada aws_async)
+        results = await asyncio.gather(
+            *[self._check_account_health(account, check_names) for account in accounts],
+            return_exceptions=True
+        )
+        
+        checked = []
+        for account, result in zip(accounts, results):
+            if isinstance(result, Exception):
+                print(f"Erro verificando saúde da conta {account['name']}: {result}")
                 continue
+            account_alerts, completed_types = result
+            alerts.extend(account_alerts)
+            checked.extend((account['id'], resource_type) for resource_type in completed_types)
         
-        # Salvar alertas no banco
-        await self._save_health_alerts(alerts)
+        # Reconciliar alertas no banco (resolução só para os pares conta/tipo verificados por completo)
+        await self._save_health_alerts(alerts, checked)
         
         return alerts
     
-    async def _check_target_groups_health(self, session, account) -> List[Dict[str, Any]]:
+    async def _check_account_health(self, account, check_names: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Executar as verificações de uma conta em paralelo
+        
+        Retorna os alertas e os resource_types verificados sem erro; um tipo com
+        falha (erro de AWS, credencial, throttling...) não tem seus alertas resolvidos.
+        """
+        session = aws_clients.for_account(account)
+        
+        results = await asyncio.gather(
+            *[getattr(self, self.CHECKS[name][0])(session, account) for name in check_names]
+        )
+        
+        alerts = []
+        completed_types = []
+        for name, (check_alerts, errors) in zip(check_names, results):
+            alerts.extend(check_alerts)
+            if errors:
+                print(f"Verificação {name} incompleta na conta {account['name']} "
+                      f"({len(errors)} erros); alertas desse tipo não serão resolvidos")
+            else:
+                completed_types.append(self.CHECKS[name][1])
+        
+        return alerts, completed_types
+    
+    async def _check_target_groups_health(self, session, account) -> Tuple[List[Dict[str, Any]], List[str]]:
         """Verificar saúde dos Target Groups"""
         alerts = []
+        errors = []
         
         try:
-            elbv2 = session.client('elbv2')
+            elbv2 = aws_async.wrap(session.client('elbv2'), account['id'])
             
-            # Buscar todos os Target Groups
-            response = elbv2.describe_target_groups()
-            
-            for tg in response['TargetGroups']:
+            # Buscar todos os Target Groups e a saúde dos targets (paginado e em paralelo)
+            for tg, targets in await target_health_scanner.scan(elbv2):
                 try:
-                    # Verificar saúde dos targets
-                    health_response = elbv2.describe_target_health(
-                        TargetGroupArn=tg['TargetGroupArn']
-                    )
+                    if isinstance(targets, Exception):
+                        raise targets
                     
-                    targets = health_response['TargetHealthDescriptions']
                     healthy_targets = [t for t in targets if t['TargetHealth']['State'] == 'healthy']
                     unhealthy_targets = [t for t in targets if t['TargetHealth']['State'] != 'healthy']
                     
@@ -140,33 +174,36 @@ class HealthChecker:
                 
                 except Exception as e:
                     print(f"Erro verificando Target Group {tg['TargetGroupName']}: {e}")
+                    errors.append(str(e))
                     continue
         
         except Exception as e:
             print(f"Erro listando Target Groups: {e}")
+            errors.append(str(e))
         
-        return alerts
+        return alerts, errors
     
-    async def _check_ecs_services_health(self, session, account) -> List[Dict[str, Any]]:
+    async def _check_ecs_services_health(self, session, account) -> Tuple[List[Dict[str, Any]], List[str]]:
         """Verificar saúde dos ECS Services"""
         alerts = []
+        errors = []
         
         try:
-            ecs = session.client('ecs')
+            ecs = aws_async.wrap(session.client('ecs'), account['id'])
             
             # Buscar todos os clusters
-            clusters_response = ecs.list_clusters()
+            clusters_response = await ecs.list_clusters()
             
             for cluster_arn in clusters_response['clusterArns']:
                 try:
                     # Buscar serviços do cluster
-                    services_response = ecs.list_services(cluster=cluster_arn)
+                    services_response = await ecs.list_services(cluster=cluster_arn)
                     
                     if not services_response['serviceArns']:
                         continue
                     
                     # Descrever serviços
-                    services_detail = ecs.describe_services(
+                    services_detail = await ecs.describe_services(
                         cluster=cluster_arn,
                         services=services_response['serviceArns']
                     )
@@ -205,22 +242,25 @@ class HealthChecker:
                 
                 except Exception as e:
                     print(f"Erro verificando serviços do cluster {cluster_arn}: {e}")
+                    errors.append(str(e))
                     continue
         
         except Exception as e:
             print(f"Erro listando clusters ECS: {e}")
+            errors.append(str(e))
         
-        return alerts
+        return alerts, errors
     
-    async def _check_ec2_instances_health(self, session, account) -> List[Dict[str, Any]]:
+    async def _check_ec2_instances_health(self, session, account) -> Tuple[List[Dict[str, Any]], List[str]]:
         """Verificar saúde das instâncias EC2"""
         alerts = []
+        errors = []
         
         try:
-            ec2 = session.client('ec2')
+            ec2 = aws_async.wrap(session.client('ec2'), account['id'])
             
             # Buscar todas as instâncias
-            response = ec2.describe_instances()
+            response = await ec2.describe_instances()
             
             for reservation in response['Reservations']:
                 for instance in reservation['Instances']:
@@ -261,18 +301,20 @@ class HealthChecker:
         
         except Exception as e:
             print(f"Erro verificando instâncias EC2: {e}")
+            errors.append(str(e))
         
-        return alerts
+        return alerts, errors
     
-    async def _check_rds_instances_health(self, session, account) -> List[Dict[str, Any]]:
+    async def _check_rds_instances_health(self, session, account) -> Tuple[List[Dict[str, Any]], List[str]]:
         """Verificar saúde das instâncias RDS"""
         alerts = []
+        errors = []
         
         try:
-            rds = session.client('rds')
+            rds = aws_async.wrap(session.client('rds'), account['id'])
             
             # Buscar todas as instâncias RDS
-            response = rds.describe_db_instances()
+            response = await rds.describe_db_instances()
             
             for db in response['DBInstances']:
                 status = db['DBInstanceStatus']
@@ -306,43 +348,124 @@ class HealthChecker:
         
         except Exception as e:
             print(f"Erro verificando instâncias RDS: {e}")
+            errors.append(str(e))
         
-        return alerts
+        return alerts, errors
+    
+    @staticmethod
+    def _alert_fingerprint(alert: Dict[str, Any]) -> str:
+        """Identidade estável do alerta: conta + recurso + tipo de verificação"""
+        key = '|'.join(str(alert.get(field) or '') for field in (
+            'account_id', 'resource_type', 'resource_id', 'alert_type'
+        ))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
     
-    async def _save_health_alerts(self, alerts: List[Dict[str, Any]]):
-        """Salvar alertas de saúde no banco"""
-        if not alerts:
+    def _ensure_alert_schema(self, cur):
+        """Garantir colunas e índice usados na reconciliação de alertas"""
+        if HealthChecker._alert_schema_ready:
             return
+        cur.execute("ALTER TABLE alerts ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64)")
+        cur.execute("ALTER TABLE alerts ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP")
+        cur.execute("ALTER TABLE alerts ADD COLUMN IF NOT EXISTS check_metadata JSONB DEFAULT '{}'")
+        cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_active_fingerprint
+            ON alerts (fingerprint) WHERE status = 'active'
+        """)
+        HealthChecker._alert_schema_ready = True
+    
+    async def _save_health_alerts(self, alerts: List[Dict[str, Any]],
+                                  checked: Optional[List[Tuple[int, str]]] = None):
+        """
+        Reconciliar alertas de saúde com o banco
+        
+        Insere apenas alertas novos, atualiza os que mudaram e marca como
+        resolvidos (resolved_at) os que não apareceram mais, tudo em um único
+        statement. A resolução fica restrita aos pares (conta, resource_type)
+        verificados sem erro (``checked``).
+        Os dados da verificação ficam em check_metadata; ai_analysis (análise do
+        Bedrock salva pela API) nunca é alterado aqui.
+        """
+        if not alerts and not checked:
+            return
+        
+        # Um alerta por fingerprint (o último vence)
+        incoming = {}
+        for alert in alerts:
+            incoming[self._alert_fingerprint(alert)] = alert
+        
+        if checked is None:
+            checked = sorted({(alert['account_id'], alert['resource_type']) for alert in alerts})
         
+        # Checkout do pool e statement síncronos: rodar em thread, fora do event loop
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._write_health_alerts, list(incoming.items()), checked
+        )
+    
+    def _write_health_alerts(self, rows: List[Tuple[str, Dict[str, Any]]], checked: List[Tuple[int, str]]):
+        """Executar a reconciliação no banco (chamado em thread por _save_health_alerts)"""
         try:
             conn = self.get_db_connection()
             cur = conn.cursor()
+            self._ensure_alert_schema(cur)
             
-            # Limpar alertas antigos de health_check
-            cur.execute("DELETE FROM alerts WHERE alert_type = 'health_check'")
-            
-            # Inserir novos alertas
-            for alert in alerts:
-                cur.execute("""
+            cur.execute("""
+                WITH incoming AS (
+                    SELECT * FROM unnest(
+                        %s::varchar[], %s::int[], %s::varchar[], %s::varchar[], %s::varchar[],
+                        %s::varchar[], %s::text[], %s::text[]
+                    ) AS t(fingerprint, account_id, resource_id, resource_type, severity,
+                           title, description, check_metadata)
+                ),
+                upserted AS (
                     INSERT INTO alerts (
-                        account_id, resource_id, resource_type, alert_type, 
-                        severity, title, description, status, ai_analysis, created_at
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    alert['account_id'],
-                    alert['resource_id'],
-                    alert['resource_type'],
-                    alert['alert_type'],
-                    alert['severity'],
-                    alert['title'],
-                    alert['description'],
-                    alert['status'],
-                    json.dumps(alert.get('metadata', {})),
-                    datetime.now()
-                ))
+                        fingerprint, account_id, resource_id, resource_type, alert_type,
+                        severity, title, description, status, check_metadata, created_at, updated_at
+                    )
+                    SELECT fingerprint, account_id, resource_id, resource_type, 'health_check',
+                           severity, title, description, 'active', check_metadata::jsonb, NOW(), NOW()
+                    FROM incoming
+                    ON CONFLICT (fingerprint) WHERE status = 'active' DO UPDATE SET
+                        severity = EXCLUDED.severity,
+                        title = EXCLUDED.title,
+                        description = EXCLUDED.description,
+                        check_metadata = EXCLUDED.check_metadata,
+                        updated_at = NOW()
+                    WHERE (alerts.severity, alerts.title, alerts.description, alerts.check_metadata)
+                          IS DISTINCT FROM
+                          (EXCLUDED.severity, EXCLUDED.title, EXCLUDED.description, EXCLUDED.check_metadata)
+                    RETURNING (xmax = 0) AS inserted
+                ),
+                resolved AS (
+                    UPDATE alerts SET status = 'resolved', resolved_at = NOW(), updated_at = NOW()
+                    WHERE alert_type = 'health_check'
+                      AND status = 'active'
+                      AND (account_id, resource_type) IN (
+                          SELECT * FROM unnest(%s::int[], %s::varchar[])
+                      )
+                      AND (fingerprint IS NULL OR fingerprint NOT IN (SELECT fingerprint FROM incoming))
+                    RETURNING id
+                )
+                SELECT
+                    (SELECT COUNT(*) FROM upserted WHERE inserted),
+                    (SELECT COUNT(*) FROM upserted WHERE NOT inserted),
+                    (SELECT COUNT(*) FROM resolved)
+            """, (
+                [fingerprint for fingerprint, _ in rows],
+                [alert['account_id'] for _, alert in rows],
+                [alert['resource_id'] for _, alert in rows],
+                [alert['resource_type'] for _, alert in rows],
+                [alert['severity'] for _, alert in rows],
+                [alert['title'] for _, alert in rows],
+                [alert['description'] for _, alert in rows],
+                [json.dumps(alert.get('metadata', {}), sort_keys=True, default=str) for _, alert in rows],
+                [account_id for account_id, _ in checked],
+                [resource_type for _, resource_type in checked]
+            ))
+            inserted, updated, resolved = cur.fetchone()
             
             conn.commit()
-            print(f"Salvos {len(alerts)} alertas de saúde no banco")
+            print(f"Alertas de saúde reconciliados: {inserted} novos, {updated} atualizados, "
+                  f"{resolved} resolvidos, {len(rows) - inserted - updated} inalterados")
             
         except Exception as e:
             print(f"Erro salvando alertas de saúde: {e}")
@@ -370,6 +493,101 @@ class HealthChecker:
             if 'conn' in locals():
                 conn.close()
 
+class HealthCheckScheduler:
+    """
+    Executa as verificações do HealthChecker em background, cada uma no seu intervalo
+    """
+    
+    def __init__(self, db_config: Dict[str, Any], intervals: Optional[Dict[str, int]] = None):
+        self.checker = HealthChecker(db_config)
+        self.intervals = intervals or {
+            name: CloudWatchConfig.get_polling_interval(f"health_{name}")
+            for name in HealthChecker.CHECKS
+        }
+        self.last_checked: Dict[str, datetime] = {}
+        self.last_errors: Dict[str, str] = {}
+        self._next_run: Dict[str, float] = {name: 0.0 for name in self.intervals}
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """Iniciar o loop de verificações (chamar de dentro do event loop)"""
+        if not self.running:
+            self._task = asyncio.create_task(self._run_forever())
+            print(f"Health check scheduler iniciado: {self.intervals}")
+    
+    async def stop(self):
+        """Parar o loop de verificações"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def run_now(self, check_names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Executar verificações imediatamente (sem esperar o intervalo)"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        names = check_names or list(self.intervals)
+        
+        async with self._lock:
+            started = time.monotonic()
+            try:
+                alerts = await self.checker.run_checks(names)
+            except Exception as e:
+                for name in names:
+                    self.last_errors[name] = str(e)
+                raise
+            finally:
+                for name in names:
+                    self._next_run[name] = started + self.intervals[name]
+            
+            finished = datetime.now()
+            for name in names:
+                self.last_checked[name] = finished
+                self.last_errors.pop(name, None)
+            return alerts
+    
+    async def _run_forever(self):
+        while True:
+            now = time.monotonic()
+            due = [name for name, next_run in self._next_run.items() if next_run <= now]
+            if due:
+                try:
+                    await self.run_now(due)
+                except Exception as e:
+                    print(f"Erro no health check agendado {due}: {e}")
+            
+            next_due = min(self._next_run.values())
+            await asyncio.sleep(max(1.0, next_due - time.monotonic()))
+    
+    def last_checked_at(self) -> Optional[str]:
+        """Horário da verificação mais recente (ISO) ou None se ainda não rodou"""
+        if not self.last_checked:
+            return None
+        return max(self.last_checked.values()).isoformat()
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Estado do scheduler por verificação"""
+        return {
+            "running": self.running,
+            "last_check": self.last_checked_at(),
+            "checks": {
+                name: {
+                    "interval_seconds": interval,
+                    "last_checked": self.last_checked[name].isoformat() if name in self.last_checked else None,
+                    "last_error": self.last_errors.get(name)
+                }
+                for name, interval in self.intervals.items()
+            }
+        }
+
 # Função utilitária para executar verificação
 async def run_health_check(db_config):
     """Executar verificação de saúde"""
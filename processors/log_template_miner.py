@@ -0,0 +1,141 @@
+"""
+AWSNoc IA IA - Minerador de Templates de Log
+Agrupa mensagens de log em templates com campos variáveis (algoritmo Drain),
+em streaming, para analisar um único representante por modo de falha
+"""
+
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+WILDCARD = '<*>'
+
+# Campos tipicamente variáveis, mascarados antes da tokenização
+MASKS = [
+    (re.compile(r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b'), WILDCARD),
+    (re.compile(r'\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?\b'), WILDCARD),
+    (re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b'), WILDCARD),
+    (re.compile(r'\b(?:0x)?[0-9a-fA-F]{16,}\b'), WILDCARD),
+    (re.compile(r'\b(?:i|eni|sg|subnet|vpc|vol|ami)-[0-9a-f]{8,17}\b'), WILDCARD),
+    (re.compile(r'(?<![A-Za-z])[-+]?\d+(?:\.\d+)?(?:ms|s|m|h|%|MB|KB|GB|B)?(?![A-Za-z])'), WILDCARD),
+]
+
+
+@dataclass
+class LogCluster:
+    """Template de log e seus membros"""
+    cluster_id: int
+    group: str
+    tokens: List[str]
+    size: int = 0
+    last_seen: float = 0.0
+    # Resultado da análise do representante, reaproveitado pelos demais membros
+    analysis: Optional[Dict[str, Any]] = None
+    analysis_expires_at: float = 0.0
+    # Folha da árvore que contém o cluster (para remoção na evicção)
+    leaf: Optional[List['LogCluster']] = field(default=None, repr=False, compare=False)
+
+    @property
+    def template(self) -> str:
+        return ' '.join(self.tokens)
+
+    def has_analysis(self) -> bool:
+        return self.analysis is not None and time.time() < self.analysis_expires_at
+
+
+class LogTemplateMiner:
+    """
+    Árvore de prefixos do Drain: (grupo, nº de tokens) → primeiros tokens → clusters
+
+    ``add`` devolve o cluster da mensagem e se ele acabou de ser criado. O grupo
+    (ex.: serviço) separa templates iguais de origens diferentes.
+    """
+
+    def __init__(self, depth: int = 4, similarity_threshold: float = 0.5,
+                 max_children: int = 100, max_clusters: int = 5000):
+        self.depth = max(depth, 3)
+        self.similarity_threshold = similarity_threshold
+        self.max_children = max_children
+        self.max_clusters = max_clusters
+        self._root: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._clusters: 'OrderedDict[int, LogCluster]' = OrderedDict()
+        self._next_id = 1
+        self._stats = {'messages': 0, 'clusters_created': 0, 'template_updates': 0, 'evictions': 0}
+
+    def _tokenize(self, message: str) -> List[str]:
+        for pattern, replacement in MASKS:
+            message = pattern.sub(replacement, message)
+        return message.strip().split()
+
+    def _leaf(self, group: str, tokens: List[str]) -> List[LogCluster]:
+        """Lista de clusters da folha da mensagem (criando os nós no caminho)"""
+        node = self._root.setdefault((group, len(tokens)), {})
+        for token in tokens[:self.depth - 2]:
+            # Tokens com dígitos são variáveis prováveis; nós cheios desviam para o curinga
+            key = WILDCARD if any(char.isdigit() for char in token) else token
+            if key not in node and len(node) >= self.max_children:
+                key = WILDCARD
+            node = node.setdefault(key, {})
+        return node.setdefault(None, [])
+
+    def _similarity(self, template: List[str], tokens: List[str]) -> Tuple[float, int]:
+        same = wildcards = 0
+        for template_token, token in zip(template, tokens):
+            if template_token == WILDCARD:
+                wildcards += 1
+            elif template_token == token:
+                same += 1
+        return (same / len(tokens) if tokens else 1.0), wildcards
+
+    def add(self, message: str, group: str = '') -> Tuple[LogCluster, bool]:
+        """Incluir uma mensagem; retorna (cluster, criado_agora)"""
+        self._stats['messages'] += 1
+        tokens = self._tokenize(message)
+        leaf = self._leaf(group, tokens)
+
+        best, best_score = None, (-1.0, -1)
+        for cluster in leaf:
+            score = self._similarity(cluster.tokens, tokens)
+            if score > best_score:
+                best, best_score = cluster, score
+
+        now = time.time()
+        if best is not None and best_score[0] >= self.similarity_threshold:
+            merged = [t if t == token else WILDCARD for t, token in zip(best.tokens, tokens)]
+            if merged != best.tokens:
+                best.tokens = merged
+                self._stats['template_updates'] += 1
+            best.size += 1
+            best.last_seen = now
+            self._clusters.move_to_end(best.cluster_id)
+            return best, False
+
+        cluster = LogCluster(self._next_id, group, tokens, size=1, last_seen=now, leaf=leaf)
+        self._next_id += 1
+        leaf.append(cluster)
+        self._clusters[cluster.cluster_id] = cluster
+        self._stats['clusters_created'] += 1
+        self._evict()
+        return cluster, True
+
+    def _evict(self) -> None:
+        while len(self._clusters) > self.max_clusters:
+            _, cluster = self._clusters.popitem(last=False)
+            if cluster.leaf is not None and cluster in cluster.leaf:
+                cluster.leaf.remove(cluster)
+            self._stats['evictions'] += 1
+
+    def clusters(self) -> List[LogCluster]:
+        """Clusters atuais, do mais recente ao mais antigo"""
+        return list(reversed(self._clusters.values()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do minerador"""
+        messages = self._stats['messages'] or 1
+        return dict(
+            self._stats,
+            clusters=len(self._clusters),
+            compression_ratio=round(len(self._clusters) / messages, 4)
+        )
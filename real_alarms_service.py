@@ -11,6 +11,7 @@ import psycopg2.extras
 from typing import List, Dict, Any
 from datetime import datetime
 from cloudwatch_alarms import CloudWatchAlarmsDiscovery
+from services.db_pool import get_pool
 from ai.bedrock_analyzer import BedrockAnalyzer
 
 class RealAlarmsService:
@@ -23,8 +24,8 @@ class RealAlarmsService:
         self.bedrock_analyzer = BedrockAnalyzer()
     
     def get_db_connection(self):
-        """Obter conexão com banco"""
-        return psycopg2.connect(**self.db_config)
+        """Obter conexão do pool compartilhado (close() devolve ao pool)"""
+        return get_pool(self.db_config).getconn(autocommit=False)
     
     async def discover_alarms_for_account(self, account_id: int) -> List[Dict[str, Any]]:
         """
@@ -40,7 +41,8 @@ class RealAlarmsService:
             alarm_discovery = CloudWatchAlarmsDiscovery(
                 access_key=account['access_key'],
                 secret_key=account['secret_key'],
-                region=account['region']
+                region=account['region'],
+                account_id=account_id
             )
             
             # Descobrir alarmes
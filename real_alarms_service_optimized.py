@@ -26,6 +26,10 @@ except ImportError:
         def get_cache_ttl(cls, component): return 25
 
 from ai.bedrock_analyzer import BedrockAnalyzer
+from services.db_pool import get_pool
+from services.alarm_enumerator import alarm_enumerator
+from services.alarm_refresh import alarm_refresh_tracker
+from services.alarm_tags import AlarmTagCache
 
 class OptimizedRealAlarmsService:
     """
@@ -35,12 +39,14 @@ class OptimizedRealAlarmsService:
     def __init__(self, db_config: Dict[str, Any]):
         self.db_config = db_config
         self.bedrock_analyzer = BedrockAnalyzer()
+        self.tag_cache = AlarmTagCache(db_config)
         self.last_discovery_time = {}  # Track por conta
+        self.incomplete_accounts = set()  # Contas cuja última enumeração de alarmes foi truncada
         self.polling_intervals = CloudWatchConfig.POLLING_INTERVALS if hasattr(CloudWatchConfig, 'POLLING_INTERVALS') else {'alarms': 30}
     
     def get_db_connection(self):
-        """Obter conexão com banco"""
-        return psycopg2.connect(**self.db_config)
+        """Obter conexão do pool compartilhado (close() devolve ao pool)"""
+        return get_pool(self.db_config).getconn(autocommit=False)
     
     async def discover_alarms_for_account(self, account_id: int, force_refresh: bool = False) -> List[Dict[str, Any]]:
         """
@@ -66,17 +72,27 @@ class OptimizedRealAlarmsService:
             alarm_discovery = OptimizedCloudWatchAlarmsDiscovery(
                 access_key=account['access_key'],
                 secret_key=account['secret_key'],
-                region=account['region']
+                region=account['region'],
+                account_id=account_id,
+                tag_cache=self.tag_cache
             )
             
             # Descobrir alarmes com otimizações
             print(f"Iniciando descoberta otimizada para conta {account_id} ({account['name']})")
             alarms = await alarm_discovery.discover_all_alarms(force_refresh=force_refresh)
+            complete = getattr(alarm_discovery, 'complete', True)
+            if complete:
+                self.incomplete_accounts.discard(account_id)
+            else:
+                self.incomplete_accounts.add(account_id)
+                print(f"⚠️ Enumeração de alarmes incompleta para conta {account['name']}")
             
             # Salvar alarmes no banco apenas se houver alterações
             if alarms:
                 await self._save_alarms_to_db_optimized(account_id, alarms)
-                self.last_discovery_time[account_id] = current_time
+                # Lista truncada não adia a próxima descoberta pelo intervalo de polling
+                if complete:
+                    self.last_discovery_time[account_id] = current_time
                 print(f"Descobertos e salvos {len(alarms)} alarmes para conta {account['name']}")
             else:
                 print(f"Nenhum alarme encontrado para conta {account['name']}")
@@ -174,6 +190,9 @@ class OptimizedRealAlarmsService:
                 "accounts_processed": processed_accounts,
                 "total_accounts": len(accounts),
                 "total_alarms_discovered": total_alarms,
+                "complete": not any(account['id'] in self.incomplete_accounts for account in accounts),
+                "incomplete_accounts": [account['id'] for account in accounts
+                                        if account['id'] in self.incomplete_accounts],
                 "discovery_time": datetime.now().isoformat(),
                 "polling_optimized": True
             }
@@ -518,8 +537,12 @@ Recursos: {', '.join(alarm.get('affected_resources', [])[:3])}
         """Obter estatísticas do serviço"""
         return {
             "last_discovery_times": self.last_discovery_time,
+            "incomplete_accounts": sorted(self.incomplete_accounts),
             "polling_intervals": self.polling_intervals,
             "cache_stats": getattr(cache_manager, 'get_stats', lambda: {})(),
+            "alarm_enumeration": alarm_enumerator.get_stats(),
+            "incremental_refresh": alarm_refresh_tracker.get_stats(),
+            "alarm_tags": self.tag_cache.get_stats(),
             "service_version": "optimized_v1.0"
         }
 
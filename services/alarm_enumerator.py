@@ -0,0 +1,142 @@
+"""
+AWSNoc IA IA - Enumerador de Alarmes do CloudWatch
+Percorre todas as páginas do describe_alarms em streaming e enriquece os alarmes
+(histórico, métricas, tags) em um pool limitado de workers, em paralelo com a busca
+"""
+
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+
+try:
+    from config.cloudwatch_config import CloudWatchConfig
+except ImportError:
+    class CloudWatchConfig:
+        ALARM_ENUMERATION = {'page_size': 100, 'enrichment_workers': 16, 'queue_size': 500}
+
+logger = logging.getLogger(__name__)
+
+# Tipos de alarme e a chave de cada um na página do describe_alarms
+ALARM_TYPES = (
+    ('MetricAlarm', 'MetricAlarms'),
+    ('CompositeAlarm', 'CompositeAlarms')
+)
+
+_DONE = object()
+
+
+class AlarmEnumerator:
+    """
+    Enumeração completa (sem limite de itens) dos alarmes de uma conta/região
+
+    ``process(alarm_type, alarm)`` recebe 'MetricAlarm' ou 'CompositeAlarm' e o alarme
+    bruto, e devolve o alarme processado (ou None para descartá-lo). A fila entre a
+    paginação e os workers é limitada, então a busca de páginas acompanha o ritmo
+    do enriquecimento.
+    """
+
+    def __init__(self, workers: Optional[int] = None, page_size: Optional[int] = None,
+                 queue_size: Optional[int] = None):
+        settings = getattr(CloudWatchConfig, 'ALARM_ENUMERATION', {})
+        self.workers = workers or settings.get('enrichment_workers', 16)
+        # describe_alarms aceita no máximo 100 registros por página
+        self.page_size = min(page_size or settings.get('page_size', 100), 100)
+        self.queue_size = queue_size or settings.get('queue_size', 500)
+        self._stats = {
+            'runs': 0,
+            'pages': 0,
+            'alarms': 0,
+            'errors': 0,
+            'last_run': None
+        }
+
+    async def run(self, cloudwatch, process: Callable[[str, Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]],
+                  alarm_types: Optional[List[str]] = None,
+                  on_page: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None
+                  ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Enumerar e processar todos os alarmes, na ordem em que a API os devolve
+
+        ``cloudwatch`` é um cliente envolvido por aws_async. ``on_page`` recebe os
+        alarmes de cada página antes de irem para os workers (ex.: busca de tags em lote).
+        Retorna ``(alarmes, completo)``; ``completo`` é False quando a paginação falhou
+        no meio e a lista está truncada.
+        """
+        alarm_types = alarm_types or [name for name, _ in ALARM_TYPES]
+        started = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        results: Dict[int, Dict[str, Any]] = {}
+        counters = {'pages': 0, 'alarms': 0, 'errors': 0}
+        complete = True
+
+        async def produce():
+            nonlocal complete
+            position = 0
+            try:
+                # Uma única paginação traz alarmes métricos e compostos
+                async for page in cloudwatch.iter_pages(
+                    'describe_alarms',
+                    AlarmTypes=alarm_types,
+                    PaginationConfig={'PageSize': self.page_size}
+                ):
+                    counters['pages'] += 1
+                    if on_page is not None:
+                        try:
+                            await on_page([alarm for _, page_key in ALARM_TYPES for alarm in page.get(page_key, [])])
+                        except Exception as e:
+                            logger.error(f"Erro no pré-processamento da página de alarmes: {e}")
+                    for alarm_type, page_key in ALARM_TYPES:
+                        for alarm in page.get(page_key, []):
+                            await queue.put((position, alarm_type, alarm))
+                            position += 1
+            except Exception as e:
+                # Falha no meio da paginação: os alarmes já enfileirados ainda são processados
+                complete = False
+                counters['errors'] += 1
+                logger.error(f"Erro paginando alarmes (após {position} alarmes): {e}")
+            finally:
+                for _ in range(self.workers):
+                    await queue.put(_DONE)
+
+        async def consume():
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    return
+                position, alarm_type, alarm = item
+                counters['alarms'] += 1
+                try:
+                    processed = await process(alarm_type, alarm)
+                except Exception as e:
+                    counters['errors'] += 1
+                    logger.error(f"Erro processando alarme {alarm.get('AlarmName')}: {e}")
+                    continue
+                if processed is not None:
+                    results[position] = processed
+
+        await asyncio.gather(produce(), *[consume() for _ in range(self.workers)])
+
+        duration = time.perf_counter() - started
+        self._stats['runs'] += 1
+        self._stats['pages'] += counters['pages']
+        self._stats['alarms'] += counters['alarms']
+        self._stats['errors'] += counters['errors']
+        self._stats['last_run'] = {
+            'pages': counters['pages'],
+            'alarms': counters['alarms'],
+            'errors': counters['errors'],
+            'complete': complete,
+            'duration_ms': round(duration * 1000, 1),
+            'alarms_per_second': round(counters['alarms'] / duration, 1) if duration > 0 else 0.0
+        }
+        logger.info(f"Enumeração de alarmes: {self._stats['last_run']}")
+        return [results[position] for position in sorted(results)], complete
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas da enumeração de alarmes"""
+        return dict(self._stats, workers=self.workers, page_size=self.page_size)
+
+
+# Instância global do enumerador de alarmes
+alarm_enumerator = AlarmEnumerator()
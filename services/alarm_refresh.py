@@ -0,0 +1,121 @@
+"""
+AWSNoc IA IA - Atualização Incremental de Alarmes
+Lembra o estado de cada alarme e decide quais precisam ser enriquecidos de novo
+(histórico, métricas, tags), seguindo CloudWatchConfig.ALARM_POLLING_BY_STATE
+"""
+
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from config.cloudwatch_config import CloudWatchConfig
+except ImportError:
+    class CloudWatchConfig:
+        ALARM_POLLING_BY_STATE = {'ALARM': 30, 'OK': 120, 'INSUFFICIENT_DATA': 60}
+
+        @classmethod
+        def get_alarm_polling_interval(cls, state):
+            return cls.ALARM_POLLING_BY_STATE.get(state, 60)
+
+logger = logging.getLogger(__name__)
+
+# Entradas não vistas por este tempo (alarmes removidos) são descartadas
+FORGET_AFTER_SECONDS = 3600
+
+
+class AlarmRefreshTracker:
+    """
+    Estado conhecido dos alarmes por escopo (conta/região)
+
+    Um alarme volta a ser enriquecido quando muda de estado (StateValue ou
+    StateUpdatedTimestamp), quando sua configuração muda ou quando o intervalo
+    do seu estado em ALARM_POLLING_BY_STATE vence; nos demais casos o resultado
+    anterior é reaproveitado.
+    """
+
+    def __init__(self):
+        # escopo -> {alarm_arn: entrada}
+        self._scopes: Dict[Any, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'checks': 0,
+            'reused': 0,
+            'enriched': 0,
+            'reasons': {'new': 0, 'state_changed': 0, 'config_changed': 0, 'interval_elapsed': 0}
+        }
+
+    def check(self, scope: Any, alarm: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Retorna (resultado anterior, None) se o alarme pode ser reaproveitado,
+        ou (None, motivo) se precisa ser enriquecido
+        """
+        now = time.time()
+        self._stats['checks'] += 1
+        with self._lock:
+            entry = self._scopes.get(scope, {}).get(alarm.get('AlarmArn'))
+            if entry is not None:
+                entry['seen_at'] = now
+
+        if entry is None:
+            reason = 'new'
+        elif (entry['state'] != alarm.get('StateValue')
+              or entry['state_updated'] != alarm.get('StateUpdatedTimestamp')):
+            reason = 'state_changed'
+        elif entry['config_updated'] != alarm.get('AlarmConfigurationUpdatedTimestamp'):
+            reason = 'config_changed'
+        elif now - entry['enriched_at'] >= CloudWatchConfig.get_alarm_polling_interval(entry['state']):
+            reason = 'interval_elapsed'
+        else:
+            self._stats['reused'] += 1
+            return entry['result'], None
+
+        self._stats['enriched'] += 1
+        self._stats['reasons'][reason] += 1
+        return None, reason
+
+    def remember(self, scope: Any, alarm: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Guardar o resultado enriquecido e o estado que o originou"""
+        now = time.time()
+        with self._lock:
+            entries = self._scopes.setdefault(scope, {})
+            entries[alarm.get('AlarmArn')] = {
+                'state': alarm.get('StateValue'),
+                'state_updated': alarm.get('StateUpdatedTimestamp'),
+                'config_updated': alarm.get('AlarmConfigurationUpdatedTimestamp'),
+                'enriched_at': now,
+                'seen_at': now,
+                'result': result
+            }
+
+    def prune(self, scope: Any) -> int:
+        """Descartar alarmes do escopo que deixaram de aparecer na enumeração"""
+        cutoff = time.time() - FORGET_AFTER_SECONDS
+        with self._lock:
+            entries = self._scopes.get(scope, {})
+            stale = [arn for arn, entry in entries.items() if entry['seen_at'] < cutoff]
+            for arn in stale:
+                del entries[arn]
+        return len(stale)
+
+    def forget(self, scope: Any) -> None:
+        """Esquecer o estado de um escopo (próxima descoberta enriquece tudo)"""
+        with self._lock:
+            self._scopes.pop(scope, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas da atualização incremental"""
+        checks = self._stats['checks'] or 1
+        with self._lock:
+            tracked = {str(scope): len(entries) for scope, entries in self._scopes.items()}
+        return dict(
+            self._stats,
+            reuse_rate=round(self._stats['reused'] / checks, 3),
+            polling_by_state=dict(getattr(CloudWatchConfig, 'ALARM_POLLING_BY_STATE', {})),
+            tracked_alarms=tracked
+        )
+
+
+# Instância global do controle de atualização incremental
+alarm_refresh_tracker = AlarmRefreshTracker()
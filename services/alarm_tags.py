@@ -0,0 +1,194 @@
+"""
+AWSNoc IA IA - Cache de Tags de Alarmes
+Tags de alarmes do CloudWatch por (ARN, AlarmConfigurationUpdatedTimestamp),
+persistidas no banco e buscadas em lote só para alarmes novos ou alterados
+"""
+
+import json
+import asyncio
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import psycopg2.extras
+
+from services.db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Limite de ARNs por chamada do get_resources (Resource Groups Tagging API)
+TAGGING_BATCH_SIZE = 100
+
+
+def _config_version(alarm: Dict[str, Any]) -> str:
+    """Versão da configuração do alarme (muda sempre que as tags mudam)"""
+    value = alarm.get('AlarmConfigurationUpdatedTimestamp')
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value or '')
+
+
+class AlarmTagCache:
+    """
+    Cache de tags de alarmes em memória com persistência em alarm_tag_cache
+
+    ``prefetch`` é chamado com os alarmes de cada página do describe_alarms e
+    busca, em lotes de 100, apenas os que não estão no cache para a versão atual
+    da configuração; ``lookup`` devolve as tags já conhecidas.
+    """
+
+    _schema_ready = False
+
+    def __init__(self, db_config: Dict[str, Any]):
+        self.db_config = db_config
+        # arn -> (versão da configuração, tags)
+        self._tags: Dict[str, Tuple[str, List[Dict[str, str]]]] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'lookups': 0,
+            'memory_hits': 0,
+            'db_hits': 0,
+            'fetched': 0,
+            'tagging_calls': 0,
+            'fallback_calls': 0,
+            'errors': 0
+        }
+
+    def _ensure_schema(self, cur) -> None:
+        if AlarmTagCache._schema_ready:
+            return
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS alarm_tag_cache (
+                alarm_arn VARCHAR(512) PRIMARY KEY,
+                config_version VARCHAR(64) NOT NULL,
+                tags JSONB NOT NULL DEFAULT '[]',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        AlarmTagCache._schema_ready = True
+
+    def _load(self, keys: Dict[str, str]) -> Dict[str, List[Dict[str, str]]]:
+        """Buscar no banco as tags salvas para as versões pedidas"""
+        with get_pool(self.db_config).connection() as conn:
+            cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            self._ensure_schema(cur)
+            cur.execute("""
+                SELECT alarm_arn, config_version, tags FROM alarm_tag_cache
+                WHERE alarm_arn = ANY(%s)
+            """, (list(keys),))
+            rows = cur.fetchall()
+            cur.close()
+
+        found = {}
+        for row in rows:
+            if keys.get(row['alarm_arn']) == row['config_version']:
+                tags = row['tags'] if isinstance(row['tags'], list) else json.loads(row['tags'] or '[]')
+                found[row['alarm_arn']] = tags
+        return found
+
+    def _save(self, entries: Dict[str, Tuple[str, List[Dict[str, str]]]]) -> None:
+        """Gravar (upsert) as tags buscadas na AWS"""
+        with get_pool(self.db_config).connection() as conn:
+            cur = conn.cursor()
+            self._ensure_schema(cur)
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO alarm_tag_cache (alarm_arn, config_version, tags)
+                VALUES %s
+                ON CONFLICT (alarm_arn) DO UPDATE SET
+                    config_version = EXCLUDED.config_version,
+                    tags = EXCLUDED.tags,
+                    updated_at = CURRENT_TIMESTAMP
+            """, [(arn, version, json.dumps(tags)) for arn, (version, tags) in entries.items()])
+            cur.close()
+
+    def lookup(self, alarm: Dict[str, Any]) -> Optional[List[Dict[str, str]]]:
+        """Tags do alarme para a configuração atual, ou None se ainda não conhecidas"""
+        self._stats['lookups'] += 1
+        with self._lock:
+            cached = self._tags.get(alarm.get('AlarmArn'))
+        if cached is not None and cached[0] == _config_version(alarm):
+            self._stats['memory_hits'] += 1
+            return cached[1]
+        return None
+
+    async def prefetch(self, alarms: List[Dict[str, Any]], tagging, cloudwatch) -> None:
+        """
+        Garantir no cache as tags dos alarmes (memória → banco → AWS em lote)
+
+        ``tagging`` (resourcegroupstaggingapi) e ``cloudwatch`` são clientes
+        envolvidos por aws_async; o cloudwatch só é usado se o get_resources falhar.
+        """
+        wanted = {}
+        with self._lock:
+            for alarm in alarms:
+                arn = alarm.get('AlarmArn')
+                if not arn:
+                    continue
+                version = _config_version(alarm)
+                cached = self._tags.get(arn)
+                if cached is None or cached[0] != version:
+                    wanted[arn] = version
+        if not wanted:
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            stored = await loop.run_in_executor(None, self._load, wanted)
+        except Exception as e:
+            self._stats['errors'] += 1
+            logger.error(f"Erro lendo cache de tags de alarmes: {e}")
+            stored = {}
+        self._stats['db_hits'] += len(stored)
+        with self._lock:
+            for arn, tags in stored.items():
+                self._tags[arn] = (wanted[arn], tags)
+
+        missing = [arn for arn in wanted if arn not in stored]
+        if not missing:
+            return
+
+        fetched = await self._fetch(missing, tagging, cloudwatch)
+        entries = {arn: (wanted[arn], tags) for arn, tags in fetched.items()}
+        self._stats['fetched'] += len(entries)
+        with self._lock:
+            self._tags.update(entries)
+        if entries:
+            try:
+                await loop.run_in_executor(None, self._save, entries)
+            except Exception as e:
+                self._stats['errors'] += 1
+                logger.error(f"Erro gravando cache de tags de alarmes: {e}")
+
+    async def _fetch(self, arns: List[str], tagging, cloudwatch) -> Dict[str, List[Dict[str, str]]]:
+        """Tags de até 100 alarmes por chamada; alarmes sem tags não aparecem na resposta"""
+        result: Dict[str, List[Dict[str, str]]] = {}
+        for offset in range(0, len(arns), TAGGING_BATCH_SIZE):
+            batch = arns[offset:offset + TAGGING_BATCH_SIZE]
+            try:
+                tagged = {}
+                for page in await tagging.paginate('get_resources', ResourceARNList=batch):
+                    self._stats['tagging_calls'] += 1
+                    for mapping in page.get('ResourceTagMappingList', []):
+                        tagged[mapping['ResourceARN']] = mapping.get('Tags', [])
+                for arn in batch:
+                    result[arn] = tagged.get(arn, [])
+            except Exception as e:
+                # Sem permissão para a Tagging API: uma chamada por alarme
+                logger.warning(f"get_resources indisponível para tags de alarmes, usando list_tags_for_resource: {e}")
+                for arn in batch:
+                    self._stats['fallback_calls'] += 1
+                    try:
+                        response = await cloudwatch.list_tags_for_resource(ResourceARN=arn)
+                        result[arn] = response.get('Tags', [])
+                    except Exception as tag_error:
+                        # Não cachear: tenta de novo no próximo ciclo
+                        self._stats['errors'] += 1
+                        logger.debug(f"Erro buscando tags de {arn}: {tag_error}")
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do cache de tags"""
+        with self._lock:
+            entries = len(self._tags)
+        return dict(self._stats, entries=entries)
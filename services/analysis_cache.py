@@ -0,0 +1,137 @@
+"""
+AWSNoc IA IA - Cache de Análises de IA
+Cache endereçado por conteúdo para respostas do Bedrock, compartilhado por
+AIAnalysisService, BedrockAnalyzer e AWSCollector e persistido em disco
+"""
+
+import re
+import json
+import hashlib
+import logging
+from typing import Dict, Any, Optional
+
+from services.cache_backends import CacheBackend, SQLiteCacheBackend
+from services.cloudwatch_cache import CloudWatchCache, cache_manager
+
+try:
+    from config.aws_config import AWSConfig
+except ImportError:
+    class AWSConfig:
+        ANALYSIS_CACHE = {'backend': 'sqlite', 'sqlite_path': '/tmp/awsnoc_analysis_cache.db',
+                          'ttl_seconds': 3600, 'max_entries': 20000, 'memory_entries': 2000,
+                          'cleanup_every_sets': 500}
+
+        @classmethod
+        def get_analysis_cache_setting(cls, setting, default=None):
+            return cls.ANALYSIS_CACHE.get(setting, default)
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text: Any) -> str:
+    """Texto normalizado para a chave (espaços colapsados, sem bordas)"""
+    return _WHITESPACE.sub(' ', str(text or '')).strip()
+
+
+class AnalysisCache:
+    """
+    Cache de análises em dois níveis: LRU em memória na frente de um backend persistente
+
+    A chave é um SHA-256 do modelo, do template de prompt (nome e versão) e da
+    entrada normalizada, estável entre processos e reinícios. Trocar a versão do
+    template invalida as análises antigas.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None, memory_entries: Optional[int] = None,
+                 ttl_seconds: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds or AWSConfig.get_analysis_cache_setting('ttl_seconds', 3600)
+        self.memory = CloudWatchCache(
+            max_entries=memory_entries or AWSConfig.get_analysis_cache_setting('memory_entries', 2000)
+        )
+        self.backend = backend if backend is not None else self._create_backend()
+        self.cleanup_every_sets = AWSConfig.get_analysis_cache_setting('cleanup_every_sets', 500)
+        self._sets_since_cleanup = 0
+
+    def _create_backend(self) -> Optional[CacheBackend]:
+        backend_type = AWSConfig.get_analysis_cache_setting('backend', 'sqlite')
+        try:
+            if backend_type == 'sqlite':
+                return SQLiteCacheBackend(
+                    AWSConfig.get_analysis_cache_setting('sqlite_path', '/tmp/awsnoc_analysis_cache.db'),
+                    max_entries=AWSConfig.get_analysis_cache_setting('max_entries', 20000)
+                )
+            if backend_type == 'shared':
+                # Mesmo backend do cache do CloudWatch (ex.: kv entre hosts)
+                return cache_manager.cache
+        except Exception as e:
+            logger.error(f"Erro criando backend do cache de análises, usando só memória: {e}")
+        return None
+
+    def key(self, model_id: str, template: str, version: str, **inputs) -> str:
+        """Chave estável para (modelo, template/versão, entrada normalizada)"""
+        payload = json.dumps({
+            'model': model_id,
+            'template': template,
+            'version': version,
+            'input': {name: normalize_text(value) for name, value in inputs.items()}
+        }, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return f"analysis_{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Análise em cache (memória, depois backend persistente)"""
+        value = self.memory.get(key)
+        if value is not None or self.backend is None:
+            return value
+        value = self.backend.get(key)
+        if value is not None:
+            self.memory.set(key, value, self.ttl_seconds)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        """Guardar uma análise (não usar para respostas de erro/fallback)"""
+        ttl = ttl_seconds or self.ttl_seconds
+        self.memory.set(key, value, ttl)
+        if self.backend is None:
+            return
+        self.backend.set(key, value, ttl)
+        self._sets_since_cleanup += 1
+        if self._sets_since_cleanup >= self.cleanup_every_sets:
+            # Aplica TTL e limite de entradas no backend persistente
+            self._sets_since_cleanup = 0
+            self.backend.cleanup_expired()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do cache de análises"""
+        memory = self.memory.get_cache_stats()
+        stats = {
+            'ttl_seconds': self.ttl_seconds,
+            'memory': {
+                'entries': memory['total_entries'],
+                'max_entries': memory['max_entries'],
+                'hits': memory['hits'],
+                'misses': memory['misses'],
+                'hit_rate': memory['hit_rate']
+            },
+            'backend': None
+        }
+        if self.backend is not None:
+            backend = self.backend.get_cache_stats()
+            analysis = backend.get('families', {}).get('analysis', {})
+            stats['backend'] = {
+                'type': backend.get('backend'),
+                'entries': backend.get('total_entries'),
+                'hits': analysis.get('hits', 0),
+                'misses': analysis.get('misses', 0),
+                'hit_rate': analysis.get('hit_rate', 0.0)
+            }
+        # Acertos em qualquer nível sobre o total de consultas
+        lookups = memory['hits'] + memory['misses']
+        total_hits = memory['hits'] + (stats['backend']['hits'] if stats['backend'] else 0)
+        stats['hit_rate'] = round(total_hits / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# Instância global do cache de análises
+analysis_cache = AnalysisCache()
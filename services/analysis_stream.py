@@ -0,0 +1,111 @@
+"""
+AWSNoc IA IA - Streaming de Análises (SSE)
+Eventos Server-Sent Events de uma análise de alerta em andamento: progresso
+da coleta de evidências por fonte, tokens do modelo e resultado final
+"""
+
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Intervalo de comentários keep-alive enquanto nada acontece (proxies fecham conexões ociosas)
+KEEPALIVE_SECONDS = 15
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'X-Accel-Buffering': 'no'     # nginx: não bufferizar o stream
+}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Evento no formato text/event-stream"""
+    payload = json.dumps(data, default=str, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class AnalysisStream:
+    """
+    Canal de eventos entre o analisador e a resposta SSE
+
+    Os analisadores recebem ``stream`` opcional e chamam ``progress`` ao concluir
+    cada fonte de evidência e ``token`` a cada trecho do modelo; ``run`` executa a
+    análise e entrega os eventos formatados conforme são produzidos.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._started = time.perf_counter()
+        self.sources = 0
+        self.tokens = 0
+
+    def _elapsed_ms(self) -> int:
+        return int((time.perf_counter() - self._started) * 1000)
+
+    def emit(self, event: str, data: Dict[str, Any]) -> None:
+        self._queue.put_nowait((event, data))
+
+    def progress(self, source: str, status: str = 'done', **details) -> None:
+        """Progresso da coleta de uma fonte de evidência (running, done ou error)"""
+        if status != 'running':
+            self.sources += 1
+        self.emit('progress', dict(source=source, status=status, elapsed_ms=self._elapsed_ms(), **details))
+
+    def token(self, text: str) -> None:
+        """Trecho de texto gerado pelo modelo"""
+        self.tokens += 1
+        self.emit('token', {'text': text})
+
+    async def run(self, analysis: Callable[[], Awaitable[Dict[str, Any]]],
+                  finalize: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                  started: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Executar a análise (``analysis()``) e produzir os eventos SSE
+
+        ``finalize`` recebe o resultado da análise (ex.: persiste no banco) e devolve
+        o payload do evento ``result``. Se o cliente desconectar, a análise é cancelada.
+        """
+        yield format_sse('started', dict(started or {}, elapsed_ms=self._elapsed_ms()))
+
+        task = asyncio.ensure_future(analysis())
+        try:
+            while True:
+                getter = asyncio.ensure_future(self._queue.get())
+                done, _ = await asyncio.wait({getter, task}, timeout=KEEPALIVE_SECONDS,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    event, data = getter.result()
+                    yield format_sse(event, data)
+                    continue
+                getter.cancel()
+                if task in done:
+                    break
+                yield ": keep-alive\n\n"
+
+            # Trechos enfileirados depois do último get
+            while not self._queue.empty():
+                event, data = self._queue.get_nowait()
+                yield format_sse(event, data)
+
+            result = await finalize(task.result())
+            yield format_sse('result', dict(result, elapsed_ms=self._elapsed_ms(),
+                                            sources=self.sources, token_events=self.tokens))
+        except Exception as e:
+            logger.error(f"Erro na análise em streaming: {e}")
+            yield format_sse('error', {'detail': f"Erro na análise: {str(e)}", 'elapsed_ms': self._elapsed_ms()})
+        finally:
+            if not task.done():
+                task.cancel()
+
+
+def _no_progress(source: str, status: str = 'done', **details) -> None:
+    return None
+
+
+def progress_callback(stream: Optional[AnalysisStream]) -> Callable[..., None]:
+    """``stream.progress`` ou uma função vazia quando a análise não é em streaming"""
+    return stream.progress if stream is not None else _no_progress
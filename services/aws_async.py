@@ -0,0 +1,173 @@
+"""
+AWSNoc IA IA - Camada Assíncrona para Chamadas AWS
+Executa chamadas boto3 em um pool de threads compartilhado, com limite de
+concorrência por conta, sem bloquear o event loop do FastAPI
+"""
+
+import asyncio
+import functools
+import threading
+import time
+import weakref
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, AsyncIterator
+
+try:
+    from config.aws_config import AWSConfig
+except ImportError:
+    class AWSConfig:
+        ASYNC_CALLS = {'max_workers': 32, 'per_account_concurrency': 8}
+
+        @classmethod
+        def get_async_setting(cls, setting, default=None):
+            return cls.ASYNC_CALLS.get(setting, default)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACCOUNT = 'default'
+
+
+class AsyncAWSClient:
+    """
+    Proxy assíncrono para um cliente boto3
+
+    Qualquer operação do cliente vira uma corrotina:
+    ``await ecs.describe_services(cluster=..., services=[...])``
+    """
+
+    def __init__(self, executor: 'AsyncAWSExecutor', client, account_key: str):
+        self._executor = executor
+        self._client = client
+        self._account_key = account_key
+
+    @property
+    def client(self):
+        """Cliente boto3 original (síncrono)"""
+        return self._client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await self._executor.run(attr, *args, account_key=self._account_key, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    async def paginate(self, operation: str, **kwargs) -> List[Dict[str, Any]]:
+        """Percorrer todas as páginas de uma operação e retornar a lista de páginas"""
+        def collect_pages():
+            paginator = self._client.get_paginator(operation)
+            return list(paginator.paginate(**kwargs))
+
+        return await self._executor.run(collect_pages, account_key=self._account_key)
+
+    async def iter_pages(self, operation: str, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Percorrer as páginas de uma operação uma a uma (cada página é buscada ao ser consumida)"""
+        pages = iter(self._client.get_paginator(operation).paginate(**kwargs))
+        while True:
+            page = await self._executor.run(next, pages, None, account_key=self._account_key)
+            if page is None:
+                return
+            yield page
+
+
+class AsyncAWSExecutor:
+    """
+    Executor compartilhado para chamadas boto3 com limite por conta
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, per_account_limit: Optional[int] = None):
+        self.max_workers = max_workers or AWSConfig.get_async_setting('max_workers', 32)
+        self.per_account_limit = per_account_limit or AWSConfig.get_async_setting('per_account_concurrency', 8)
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        # Semáforos são ligados ao event loop, então ficam separados por loop
+        self._semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]' = weakref.WeakKeyDictionary()
+        self._stats = {
+            'calls': 0,
+            'errors': 0,
+            'in_flight': 0,
+            'peak_in_flight': 0,
+            'queued_total': 0.0,
+            'call_total': 0.0
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='aws-call'
+                    )
+        return self._executor
+
+    def _get_semaphore(self, account_key: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphores = self._semaphores.get(loop)
+        if semaphores is None:
+            semaphores = {}
+            self._semaphores[loop] = semaphores
+        semaphore = semaphores.get(account_key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_account_limit)
+            semaphores[account_key] = semaphore
+        return semaphore
+
+    def wrap(self, client, account_key: Any = None) -> AsyncAWSClient:
+        """Envolver um cliente boto3 para uso com await"""
+        return AsyncAWSClient(self, client, str(account_key or DEFAULT_ACCOUNT))
+
+    async def run(self, func: Callable, *args, account_key: Any = None, **kwargs):
+        """Executar uma função síncrona (chamada boto3) fora do event loop"""
+        account_key = str(account_key or DEFAULT_ACCOUNT)
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(account_key)
+
+        queued_at = time.perf_counter()
+        async with semaphore:
+            started_at = time.perf_counter()
+            self._stats['calls'] += 1
+            self._stats['in_flight'] += 1
+            self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._stats['in_flight'])
+            self._stats['queued_total'] += started_at - queued_at
+            try:
+                return await loop.run_in_executor(
+                    self._get_executor(), functools.partial(func, *args, **kwargs)
+                )
+            except Exception:
+                self._stats['errors'] += 1
+                raise
+            finally:
+                self._stats['in_flight'] -= 1
+                self._stats['call_total'] += time.perf_counter() - started_at
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas da camada assíncrona"""
+        calls = self._stats['calls'] or 1
+        return {
+            'max_workers': self.max_workers,
+            'per_account_limit': self.per_account_limit,
+            'calls': self._stats['calls'],
+            'errors': self._stats['errors'],
+            'in_flight': self._stats['in_flight'],
+            'peak_in_flight': self._stats['peak_in_flight'],
+            'avg_queue_ms': round(self._stats['queued_total'] / calls * 1000, 3),
+            'avg_call_ms': round(self._stats['call_total'] / calls * 1000, 3)
+        }
+
+    def shutdown(self) -> None:
+        """Encerrar o pool de threads (shutdown da aplicação)"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+# Instância global da camada assíncrona
+aws_async = AsyncAWSExecutor()
@@ -0,0 +1,197 @@
+"""
+AWSNoc IA IA - Fábrica de Clientes AWS
+Sessões e clientes boto3 reutilizados por conta/região, com timeouts,
+pool de conexões e retry adaptativo configurados
+"""
+
+import hashlib
+import threading
+import time
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+try:
+    from config.cloudwatch_config import CloudWatchConfig
+except ImportError:
+    class CloudWatchConfig:
+        TIMEOUTS = {'connection_timeout': 30, 'read_timeout': 60, 'retry_attempts': 3, 'retry_delay': 5}
+
+try:
+    from config.aws_config import AWSConfig
+except ImportError:
+    class AWSConfig:
+        CLIENTS = {'max_pool_connections': 32, 'retry_mode': 'adaptive', 'read_timeout_overrides': {},
+                   'retry_attempts_overrides': {}}
+
+        @classmethod
+        def get_client_setting(cls, setting, default=None):
+            return cls.CLIENTS.get(setting, default)
+
+logger = logging.getLogger(__name__)
+
+
+def _credentials_fingerprint(access_key: str, secret_key: str) -> str:
+    return hashlib.sha256(f"{access_key}:{secret_key}".encode('utf-8')).hexdigest()
+
+
+class AccountSession:
+    """
+    Sessão de uma conta/região; client() devolve sempre o mesmo cliente por serviço
+
+    Pode ser usada no lugar de um boto3.Session nas funções que recebem ``session``.
+    """
+
+    def __init__(self, factory: 'AWSClientFactory', key: Tuple, session: boto3.Session, fingerprint: str):
+        self._factory = factory
+        self._key = key
+        self.session = session
+        self.fingerprint = fingerprint
+        self.region_name = session.region_name
+        self._clients: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._lock = threading.Lock()
+        self.created_at = time.time()
+
+    def client(self, service_name: str, region_name: Optional[str] = None, **kwargs):
+        """Cliente boto3 compartilhado para o serviço (e região, se diferente da sessão)"""
+        if kwargs:
+            # Parâmetros específicos: cliente dedicado, sem cache
+            return self.session.client(service_name, region_name=region_name,
+                                       config=self._factory.client_config(service_name), **kwargs)
+
+        cache_key = (service_name, region_name)
+        client = self._clients.get(cache_key)
+        if client is not None:
+            self._factory._stats['client_hits'] += 1
+            return client
+
+        with self._lock:
+            client = self._clients.get(cache_key)
+            if client is None:
+                # Criar clients na mesma Session não é thread-safe: sempre sob o lock
+                client = self.session.client(
+                    service_name,
+                    region_name=region_name,
+                    config=self._factory.client_config(service_name)
+                )
+                self._clients[cache_key] = client
+                self._factory._stats['clients_created'] += 1
+        return client
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class AWSClientFactory:
+    """
+    Cache de sessões boto3 por (conta, região), invalidado quando as credenciais mudam
+    """
+
+    def __init__(self):
+        self._sessions: Dict[Tuple, AccountSession] = {}
+        self._lock = threading.Lock()
+        self._configs: Dict[str, Config] = {}
+        self._stats = {
+            'session_hits': 0,
+            'sessions_created': 0,
+            'client_hits': 0,
+            'clients_created': 0,
+            'evictions': 0
+        }
+
+    def client_config(self, service_name: str) -> Config:
+        """botocore Config com timeouts, pool de conexões e retry adaptativo"""
+        config = self._configs.get(service_name)
+        if config is None:
+            timeouts = CloudWatchConfig.TIMEOUTS
+            overrides = AWSConfig.get_client_setting('read_timeout_overrides', {})
+            retry_overrides = AWSConfig.get_client_setting('retry_attempts_overrides', {})
+            config = Config(
+                connect_timeout=timeouts.get('connection_timeout', 30),
+                read_timeout=overrides.get(service_name, timeouts.get('read_timeout', 60)),
+                max_pool_connections=AWSConfig.get_client_setting('max_pool_connections', 32),
+                retries={
+                    'max_attempts': retry_overrides.get(service_name, timeouts.get('retry_attempts', 3)),
+                    'mode': AWSConfig.get_client_setting('retry_mode', 'adaptive')
+                }
+            )
+            self._configs[service_name] = config
+        return config
+
+    def session(self, access_key: str, secret_key: str, region: str,
+                account_id: Any = None) -> AccountSession:
+        """Sessão compartilhada da conta (identificada por account_id ou, sem ele, pela access key)"""
+        key = (str(account_id) if account_id is not None else access_key, region)
+        fingerprint = _credentials_fingerprint(access_key, secret_key)
+
+        account_session = self._sessions.get(key)
+        if account_session is not None and account_session.fingerprint == fingerprint:
+            self._stats['session_hits'] += 1
+            return account_session
+
+        with self._lock:
+            account_session = self._sessions.get(key)
+            if account_session is not None and account_session.fingerprint != fingerprint:
+                # Credenciais da conta mudaram: descartar sessão e clientes antigos
+                logger.info(f"Credenciais alteradas para {key[0]}/{region}, recriando sessão AWS")
+                del self._sessions[key]
+                self._stats['evictions'] += 1
+                account_session = None
+
+            if account_session is None:
+                session = boto3.Session(
+                    aws_access_key_id=access_key,
+                    aws_secret_access_key=secret_key,
+                    region_name=region
+                )
+                account_session = AccountSession(self, key, session, fingerprint)
+                self._sessions[key] = account_session
+                self._stats['sessions_created'] += 1
+            return account_session
+
+    def default_session(self, region: str) -> AccountSession:
+        """Sessão com as credenciais padrão do processo (role da instância/variáveis de ambiente)"""
+        key = ('default', region)
+        account_session = self._sessions.get(key)
+        if account_session is not None:
+            self._stats['session_hits'] += 1
+            return account_session
+
+        with self._lock:
+            account_session = self._sessions.get(key)
+            if account_session is None:
+                account_session = AccountSession(self, key, boto3.Session(region_name=region), 'default')
+                self._sessions[key] = account_session
+                self._stats['sessions_created'] += 1
+            return account_session
+
+    def default_client(self, service_name: str, region: str):
+        """Cliente compartilhado com as credenciais padrão (ex.: bedrock-runtime)"""
+        return self.default_session(region).client(service_name)
+
+    def for_account(self, account: Dict[str, Any]) -> AccountSession:
+        """Sessão a partir de uma linha de aws_accounts"""
+        return self.session(account['access_key'], account['secret_key'], account['region'], account.get('id'))
+
+    def evict(self, account_id: Any = None, access_key: Optional[str] = None) -> int:
+        """Descartar as sessões de uma conta (ex.: conta removida ou credenciais trocadas)"""
+        ids = {str(value) for value in (account_id, access_key) if value is not None}
+        with self._lock:
+            keys = [key for key in self._sessions if key[0] in ids]
+            for key in keys:
+                del self._sessions[key]
+            self._stats['evictions'] += len(keys)
+        return len(keys)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas da fábrica de clientes"""
+        with self._lock:
+            sessions = len(self._sessions)
+            clients = sum(len(s._clients) for s in self._sessions.values())
+        return dict(self._stats, sessions=sessions, clients=clients)
+
+
+# Instância global da fábrica de clientes
+aws_clients = AWSClientFactory()
@@ -0,0 +1,381 @@
+"""
+AWSNoc IA IA - Cliente Assíncrono do Bedrock
+invoke_model compartilhado pelos módulos de IA, com token bucket por modelo,
+limite de concorrência, retry com backoff exponencial (jitter) em throttling
+e histogramas de tempo de fila, latência e tempo até o primeiro token
+"""
+
+import json
+import time
+import random
+import asyncio
+import bisect
+import threading
+import weakref
+import logging
+from typing import Dict, Any, Optional, Sequence, Callable, Tuple
+
+from services.aws_async import aws_async
+from services.aws_clients import aws_clients
+
+try:
+    from config.aws_config import AWSConfig
+except ImportError:
+    class AWSConfig:
+        BEDROCK_CLIENT = {'region': 'us-east-2', 'max_concurrency': 8, 'requests_per_second': 2.0,
+                          'burst': 5, 'model_rates': {}, 'max_retries': 5,
+                          'base_backoff_seconds': 0.5, 'max_backoff_seconds': 20.0}
+
+        @classmethod
+        def get_bedrock_client_setting(cls, setting, default=None):
+            return cls.BEDROCK_CLIENT.get(setting, default)
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_VERSION = "bedrock-2023-05-31"
+
+# Erros do Bedrock que indicam excesso de carga (vale tentar de novo)
+RETRYABLE_ERRORS = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException'
+}
+
+# Limites superiores (ms) dos buckets dos histogramas
+HISTOGRAM_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+def error_code(error: Exception) -> Optional[str]:
+    """Código de erro AWS de uma exceção do botocore (None se não for ClientError)"""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+    return None
+
+
+def anthropic_body(prompt: str, max_tokens: int, temperature: Optional[float] = None) -> Dict[str, Any]:
+    """Corpo do invoke_model para os modelos Claude (Messages API)"""
+    body = {
+        "anthropic_version": ANTHROPIC_VERSION,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens
+    }
+    if temperature is not None:
+        body["temperature"] = temperature
+    return body
+
+
+class Histogram:
+    """Histograma de durações em buckets fixos (ms)"""
+
+    def __init__(self, buckets: Sequence[float] = HISTOGRAM_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        value = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total_ms += value
+        self.max_ms = max(self.max_ms, value)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        """Limite superior do bucket que contém o quantil (aproximado)"""
+        if not self.count:
+            return None
+        rank = quantile * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return float(self.buckets[index]) if index < len(self.buckets) else round(self.max_ms, 1)
+        return round(self.max_ms, 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}" for bound in self.buckets] + [f"gt_{self.buckets[-1]}"]
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 1) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 1),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'buckets': dict(zip(labels, self.counts))
+        }
+
+
+class TokenBucket:
+    """
+    Token bucket de requisições por segundo, compartilhado entre threads e event loops
+
+    Cada chamada reserva um token e recebe quanto tempo deve esperar por ele;
+    ``pause`` segura o bucket inteiro depois de um throttling. Quem desiste da
+    espera (cancelamento) devolve o token.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reservar um token; retorna os segundos de espera antes de usá-lo"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def refund(self) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.refund()
+                raise
+
+
+class AsyncBedrockClient:
+    """
+    Chamadas ao Bedrock com controle de taxa e retry
+
+    ``invoke`` recebe o corpo do invoke_model e devolve a resposta já decodificada;
+    ``invoke_text`` monta o prompt do Claude e devolve o texto (``invoke_stream``
+    entrega os trechos conforme chegam). Sem ``client``,
+    usa o cliente compartilhado da região padrão. O token bucket é global por
+    modelo; o limite de concorrência vale por event loop (como em aws_async).
+    """
+
+    def __init__(self, region: Optional[str] = None, max_concurrency: Optional[int] = None):
+        self.region = region or AWSConfig.get_bedrock_client_setting('region', 'us-east-2')
+        self.max_concurrency = max_concurrency or AWSConfig.get_bedrock_client_setting('max_concurrency', 8)
+        self.default_rate = AWSConfig.get_bedrock_client_setting('requests_per_second', 2.0)
+        self.burst = AWSConfig.get_bedrock_client_setting('burst', 5)
+        self.model_rates = AWSConfig.get_bedrock_client_setting('model_rates', {})
+        self.max_retries = AWSConfig.get_bedrock_client_setting('max_retries', 5)
+        self.base_backoff = AWSConfig.get_bedrock_client_setting('base_backoff_seconds', 0.5)
+        self.max_backoff = AWSConfig.get_bedrock_client_setting('max_backoff_seconds', 20.0)
+
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = weakref.WeakKeyDictionary()
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+    def _bucket(self, model_id: str) -> TokenBucket:
+        bucket = self._buckets.get(model_id)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(model_id)
+                if bucket is None:
+                    bucket = TokenBucket(self.model_rates.get(model_id, self.default_rate), self.burst)
+                    self._buckets[model_id] = bucket
+        return bucket
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _model_stats(self, model_id: str) -> Dict[str, Any]:
+        stats = self._models.get(model_id)
+        if stats is None:
+            with self._lock:
+                stats = self._models.setdefault(model_id, {
+                    'calls': 0,
+                    'attempts': 0,
+                    'retries': 0,
+                    'throttled': 0,
+                    'errors': 0,
+                    'backoff_seconds': 0.0,
+                    'queue': Histogram(),
+                    'latency': Histogram(),
+                    'first_token': Histogram()
+                })
+        return stats
+
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial com jitter completo"""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    @staticmethod
+    def _invoke_sync(client, model_id: str, payload: str) -> Dict[str, Any]:
+        # O corpo da resposta é um stream: a leitura também fica fora do event loop
+        response = client.invoke_model(modelId=model_id, body=payload)
+        return json.loads(response['body'].read())
+
+    @staticmethod
+    def _invoke_stream_sync(client, model_id: str, payload: str,
+                            emit: Callable[[str], None]) -> Tuple[str, Optional[float]]:
+        """Consumir invoke_model_with_response_stream; retorna (texto, segundos até o 1º token)"""
+        started = time.perf_counter()
+        first_token = None
+        parts = []
+        response = client.invoke_model_with_response_stream(modelId=model_id, body=payload)
+        # Erros no meio do stream (ex.: throttlingException) são levantados pelo botocore na iteração
+        for event in response['body']:
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            data = json.loads(chunk['bytes'])
+            if data.get('type') != 'content_block_delta':
+                continue
+            text = data.get('delta', {}).get('text', '')
+            if text:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                parts.append(text)
+                emit(text)
+        return ''.join(parts), first_token
+
+    @staticmethod
+    def _is_retryable(code: Optional[str]) -> bool:
+        # Eventos de erro do stream usam o nome com inicial minúscula (throttlingException)
+        return bool(code) and (code[:1].upper() + code[1:]) in RETRYABLE_ERRORS
+
+    async def _call(self, model_id: str, func: Callable, *args, account_key: Any = 'bedrock',
+                    can_retry: Optional[Callable[[], bool]] = None):
+        """Executar ``func`` com token bucket, limite de concorrência e retry em throttling"""
+        bucket = self._bucket(model_id)
+        stats = self._model_stats(model_id)
+        with self._lock:
+            stats['calls'] += 1
+
+        attempt = 0
+        while True:
+            queued_at = time.perf_counter()
+            # Vaga de concorrência antes do token: só quem vai chamar logo reserva o bucket
+            async with self._semaphore():
+                await bucket.acquire()
+                started_at = time.perf_counter()
+                with self._lock:
+                    stats['attempts'] += 1
+                    stats['queue'].observe(started_at - queued_at)
+                    self._in_flight += 1
+                    self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+                try:
+                    result = await aws_async.run(func, *args, account_key=account_key)
+                    with self._lock:
+                        stats['latency'].observe(time.perf_counter() - started_at)
+                    return result
+                except Exception as e:
+                    code = error_code(e)
+                    throttled = self._is_retryable(code)
+                    if (not throttled or attempt >= self.max_retries
+                            or (can_retry is not None and not can_retry())):
+                        with self._lock:
+                            stats['errors'] += 1
+                            if throttled:
+                                stats['throttled'] += 1
+                        raise
+                    delay = self._backoff(attempt)
+                    with self._lock:
+                        stats['throttled'] += 1
+                        stats['retries'] += 1
+                        stats['backoff_seconds'] += delay
+                    # Os demais chamadores do modelo também recuam
+                    bucket.pause(delay)
+                    logger.warning(f"Bedrock {code} em {model_id}, nova tentativa em {delay:.2f}s "
+                                   f"({attempt + 1}/{self.max_retries})")
+                finally:
+                    with self._lock:
+                        self._in_flight -= 1
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def invoke(self, model_id: str, body: Dict[str, Any], client=None,
+                     account_key: Any = 'bedrock') -> Dict[str, Any]:
+        """invoke_model com token bucket, limite de concorrência e retry em throttling"""
+        client = client or aws_clients.default_client('bedrock-runtime', self.region)
+        return await self._call(model_id, self._invoke_sync, client, model_id, json.dumps(body),
+                                account_key=account_key)
+
+    async def invoke_stream(self, model_id: str, body: Dict[str, Any], on_text: Callable[[str], None],
+                            client=None, account_key: Any = 'bedrock') -> str:
+        """
+        invoke_model_with_response_stream: ``on_text`` é chamado no event loop a cada
+        trecho de texto; retorna o texto completo. Só há retry antes do primeiro trecho.
+        """
+        client = client or aws_clients.default_client('bedrock-runtime', self.region)
+        loop = asyncio.get_running_loop()
+        emitted = []
+
+        def emit(text: str) -> None:
+            emitted.append(len(text))
+            loop.call_soon_threadsafe(on_text, text)
+
+        text, first_token = await self._call(
+            model_id, self._invoke_stream_sync, client, model_id, json.dumps(body), emit,
+            account_key=account_key, can_retry=lambda: not emitted
+        )
+        if first_token is not None:
+            stats = self._model_stats(model_id)
+            with self._lock:
+                stats['first_token'].observe(first_token)
+        return text
+
+    async def invoke_text(self, model_id: str, prompt: str, max_tokens: int = 4000,
+                          temperature: Optional[float] = None, client=None,
+                          account_key: Any = 'bedrock',
+                          on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Chamar um modelo Claude e devolver o texto da resposta (em streaming se houver ``on_token``)"""
+        body = anthropic_body(prompt, max_tokens, temperature)
+        if on_token is not None:
+            return await self.invoke_stream(model_id, body, on_token, client=client, account_key=account_key)
+        result = await self.invoke(model_id, body, client=client, account_key=account_key)
+        return result['content'][0]['text']
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do cliente Bedrock (por modelo)"""
+        with self._lock:
+            models = {}
+            for model_id, stats in self._models.items():
+                models[model_id] = {
+                    'calls': stats['calls'],
+                    'attempts': stats['attempts'],
+                    'retries': stats['retries'],
+                    'throttled': stats['throttled'],
+                    'errors': stats['errors'],
+                    'backoff_seconds': round(stats['backoff_seconds'], 3),
+                    'requests_per_second': self.model_rates.get(model_id, self.default_rate),
+                    'queue_time': stats['queue'].snapshot(),
+                    'latency': stats['latency'].snapshot(),
+                    'first_token': stats['first_token'].snapshot()
+                }
+            return {
+                'region': self.region,
+                'max_concurrency': self.max_concurrency,
+                'burst': self.burst,
+                'max_retries': self.max_retries,
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'models': models
+            }
+
+
+# Instância global do cliente Bedrock
+bedrock_async = AsyncBedrockClient()
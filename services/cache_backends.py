@@ -0,0 +1,397 @@
+"""
+AWSNoc IA IA - Backends de Cache
+Backends compartilháveis entre workers e hosts para o cache do CloudWatch:
+arquivo SQLite local e armazenamento chave-valor em rede (API do Redis),
+com serialização compacta e estatísticas de acerto por família de chave
+"""
+
+import json
+import math
+import time
+import zlib
+import sqlite3
+import fnmatch
+import threading
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, Optional, List, Tuple
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Famílias de chaves para as estatísticas (prefixo da chave -> família)
+KEY_FAMILIES = (
+    ('alarm_history_', 'history'),
+    ('alarms_', 'alarms'),
+    ('metrics_', 'metrics'),
+    ('latest_', 'metrics'),
+    ('analysis_', 'analysis')
+)
+
+# Cabeçalho de 1 byte do valor serializado
+_PLAIN = b'j'
+_COMPRESSED = b'z'
+_DATETIME_TAG = '__dt__'
+
+def _key_family(key: str) -> str:
+    for prefix, family in KEY_FAMILIES:
+        if key.startswith(prefix):
+            return family
+    return 'other'
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def _json_object_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and _DATETIME_TAG in obj:
+        return datetime.fromisoformat(obj[_DATETIME_TAG])
+    return obj
+
+def encode_value(data: Any, compress_min_bytes: int = 1024) -> bytes:
+    """
+    Serializar um valor do cache (JSON compacto, comprimido com zlib acima do limite)
+
+    Datetimes são preservados (o boto3 os devolve em alarmes e históricos).
+    """
+    payload = json.dumps(data, default=_json_default, separators=(',', ':'),
+                         ensure_ascii=False).encode('utf-8')
+    if len(payload) >= compress_min_bytes:
+        return _COMPRESSED + zlib.compress(payload, 6)
+    return _PLAIN + payload
+
+def decode_value(raw: bytes) -> Any:
+    """Desserializar um valor gravado por encode_value"""
+    raw = bytes(raw)
+    header, payload = raw[:1], raw[1:]
+    if header == _COMPRESSED:
+        payload = zlib.decompress(payload)
+    elif header != _PLAIN:
+        raise ValueError(f"Formato de valor de cache desconhecido: {header!r}")
+    return json.loads(payload.decode('utf-8'), object_hook=_json_object_hook)
+
+def _escape_glob(pattern: str) -> str:
+    """Escapar curingas para SCAN MATCH (mesma sintaxe aceita pelo fnmatch)"""
+    return ''.join(f"[{char}]" if char in '*?[' else char for char in pattern)
+
+
+class CacheBackend(ABC):
+    """
+    Interface dos backends do CloudWatchCacheManager
+
+    Implementações: CloudWatchCache (memória do processo), SQLiteCacheBackend
+    (arquivo compartilhado pelos workers do host) e KeyValueCacheBackend
+    (compartilhado entre hosts).
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        self._families: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, counter: str, amount: int = 1) -> None:
+        name = _key_family(key)
+        with self._stats_lock:
+            family = self._families.get(name)
+            if family is None:
+                family = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'expirations': 0, 'errors': 0}
+                self._families[name] = family
+            family[counter] += amount
+
+    def _family_stats(self) -> Dict[str, Any]:
+        """Contadores por família e taxa de acerto geral deste processo"""
+        with self._stats_lock:
+            families = {}
+            hits = misses = 0
+            for name, counters in self._families.items():
+                lookups = counters['hits'] + counters['misses']
+                families[name] = dict(counters, hit_rate=round(counters['hits'] / lookups, 3) if lookups else 0.0)
+                hits += counters['hits']
+                misses += counters['misses']
+        return {
+            'backend': self.name,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'families': families
+        }
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Valor da chave ou None (ausente ou expirado)"""
+
+    @abstractmethod
+    def set(self, key: str, data: Any, ttl_seconds: int = 300) -> None:
+        """Armazenar o valor com expiração em ``ttl_seconds``"""
+
+    @abstractmethod
+    def invalidate(self, pattern: str = None) -> None:
+        """Remover as chaves que casam com o padrão (todas, sem padrão)"""
+
+    def cleanup_expired(self) -> int:
+        return 0
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self._family_stats()
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache em arquivo SQLite (WAL), compartilhado pelos workers do mesmo host
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str, max_entries: int = 10000, compress_min_bytes: int = 1024):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.compress_min_bytes = compress_min_bytes
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Uma conexão por thread; autocommit, cada instrução é sua própria transação
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cloudwatch_cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cloudwatch_cache_expires ON cloudwatch_cache(expires_at)")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Recuperar dados do cache se ainda válidos"""
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM cloudwatch_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count(key, 'misses')
+                return None
+            if time.time() > row[1]:
+                # Removida pelo cleanup_expired
+                self._count(key, 'expirations')
+                self._count(key, 'misses')
+                return None
+            data = decode_value(row[0])
+            self._count(key, 'hits')
+            return data
+        except Exception as e:
+            self._count(key, 'errors')
+            logger.error(f"Erro ao recuperar do cache SQLite: {e}")
+            return None
+
+    def set(self, key: str, data: Any, ttl_seconds: int = 300) -> None:
+        """Armazenar dados no cache com TTL"""
+        try:
+            value = encode_value(data, self.compress_min_bytes)
+            self._connection().execute(
+                "INSERT OR REPLACE INTO cloudwatch_cache (key, value, expires_at, size) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), time.time() + ttl_seconds, len(value) + len(key))
+            )
+            self._count(key, 'sets')
+        except Exception as e:
+            self._count(key, 'errors')
+            logger.error(f"Erro ao salvar no cache SQLite: {e}")
+
+    def invalidate(self, pattern: str = None) -> None:
+        """Invalidar entradas do cache"""
+        try:
+            conn = self._connection()
+            if pattern:
+                cursor = conn.execute("DELETE FROM cloudwatch_cache WHERE instr(key, ?) > 0", (pattern,))
+                logger.debug(f"Cache invalidated: {cursor.rowcount} entries with pattern '{pattern}'")
+            else:
+                conn.execute("DELETE FROM cloudwatch_cache")
+                logger.debug("Cache cleared completely")
+        except Exception as e:
+            logger.error(f"Erro ao invalidar cache SQLite: {e}")
+
+    def cleanup_expired(self) -> int:
+        """Limpar entradas expiradas e aplicar o limite de entradas"""
+        try:
+            conn = self._connection()
+            removed = conn.execute("DELETE FROM cloudwatch_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            # Acima do limite: descartar as que expiram primeiro
+            excess = conn.execute("SELECT COUNT(*) FROM cloudwatch_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute("""
+                    DELETE FROM cloudwatch_cache WHERE key IN (
+                        SELECT key FROM cloudwatch_cache ORDER BY expires_at LIMIT ?
+                    )
+                """, (excess,))
+                self._count('', 'evictions', excess)
+            logger.debug(f"Cleaned up {removed} expired cache entries")
+            return removed
+        except Exception as e:
+            logger.error(f"Erro ao limpar cache SQLite: {e}")
+            return 0
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do cache"""
+        expired_entries = self.cleanup_expired()
+        stats = self._family_stats()
+        try:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cloudwatch_cache"
+            ).fetchone()
+        except Exception as e:
+            logger.error(f"Erro lendo estatísticas do cache SQLite: {e}")
+            entries, size = None, None
+        stats.update({
+            'path': self.path,
+            'total_entries': entries,
+            'expired_entries': expired_entries,
+            'max_entries': self.max_entries,
+            'bytes': size
+        })
+        return stats
+
+
+class LocalKVClient:
+    """
+    Substituto local de um cliente Redis (get/set com expiração, delete, scan_iter)
+
+    Usado em testes e em instalações de um único processo sem servidor de cache.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, name: str) -> Optional[bytes]:
+        item = self._data.get(name)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and time.time() >= expires_at:
+            del self._data[name]
+            return None
+        return value
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            return self._alive(name)
+
+    def set(self, name: str, value: bytes, ex: Optional[int] = None, px: Optional[int] = None) -> bool:
+        if px is not None:
+            expires_at = time.time() + px / 1000.0
+        elif ex is not None:
+            expires_at = time.time() + ex
+        else:
+            expires_at = None
+        with self._lock:
+            self._data[name] = (bytes(value), expires_at)
+        return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None):
+        with self._lock:
+            names = [name for name in list(self._data) if self._alive(name) is not None]
+        for name in names:
+            if match is None or fnmatch.fnmatchcase(name, match):
+                yield name
+
+
+class KeyValueCacheBackend(CacheBackend):
+    """
+    Cache em armazenamento chave-valor de rede (API do cliente Redis)
+
+    A expiração fica a cargo do servidor; ``client`` pode ser um LocalKVClient.
+    """
+
+    name = 'kv'
+
+    def __init__(self, client: Any, prefix: str = 'awsnoc:cw:', compress_min_bytes: int = 1024):
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self.compress_min_bytes = compress_min_bytes
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = 'awsnoc:cw:', compress_min_bytes: int = 1024,
+                 socket_timeout: float = 1.0) -> 'KeyValueCacheBackend':
+        """Conectar a um servidor Redis (requer o pacote redis)"""
+        if redis is None:
+            raise RuntimeError("Pacote 'redis' não instalado para o backend de cache kv")
+        client = redis.Redis.from_url(url, socket_timeout=socket_timeout, socket_connect_timeout=socket_timeout)
+        return cls(client, prefix, compress_min_bytes)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Recuperar dados do cache se ainda válidos"""
+        try:
+            raw = self.client.get(self.prefix + key)
+            if raw is None:
+                self._count(key, 'misses')
+                return None
+            data = decode_value(raw)
+            self._count(key, 'hits')
+            return data
+        except Exception as e:
+            # Servidor indisponível conta como miss: o chamador consulta a AWS
+            self._count(key, 'errors')
+            self._count(key, 'misses')
+            logger.error(f"Erro ao recuperar do cache kv: {e}")
+            return None
+
+    def set(self, key: str, data: Any, ttl_seconds: int = 300) -> None:
+        """Armazenar dados no cache com TTL"""
+        try:
+            value = encode_value(data, self.compress_min_bytes)
+            self.client.set(self.prefix + key, value, ex=max(1, int(math.ceil(ttl_seconds))))
+            self._count(key, 'sets')
+        except Exception as e:
+            self._count(key, 'errors')
+            logger.error(f"Erro ao salvar no cache kv: {e}")
+
+    def invalidate(self, pattern: str = None) -> None:
+        """Invalidar entradas do cache"""
+        try:
+            match = f"{_escape_glob(self.prefix)}*{_escape_glob(pattern)}*" if pattern else f"{_escape_glob(self.prefix)}*"
+            batch: List[str] = []
+            removed = 0
+            for name in self.client.scan_iter(match=match, count=500):
+                batch.append(name)
+                if len(batch) >= 500:
+                    removed += self.client.delete(*batch)
+                    batch = []
+            if batch:
+                removed += self.client.delete(*batch)
+            logger.debug(f"Cache invalidated: {removed} entries with pattern '{pattern}'")
+        except Exception as e:
+            logger.error(f"Erro ao invalidar cache kv: {e}")
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do cache"""
+        stats = self._family_stats()
+        stats.update({
+            'prefix': self.prefix,
+            'client': type(self.client).__name__
+        })
+        return stats
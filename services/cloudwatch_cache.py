@@ -4,36 +4,99 @@ Serviço de cache para otimizar consultas e reduzir custos do CloudWatch
 """
 
 import json
+import sys
 import time
+import heapq
+import threading
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import hashlib
 import logging
 
+from services.cache_backends import (
+    CacheBackend, SQLiteCacheBackend, KeyValueCacheBackend, LocalKVClient
+)
+
+try:
+    from config.cloudwatch_config import CloudWatchConfig
+except ImportError:
+    class CloudWatchConfig:
+        CACHE_LIMITS = {'max_entries': 10000, 'max_bytes': 64 * 1024 * 1024}
+        CACHE_BACKEND = {'type': 'memory'}
+
 logger = logging.getLogger(__name__)
 
-class CloudWatchCache:
+def _estimate_size(data: Any) -> int:
+    """Tamanho aproximado em bytes (calculado uma vez, no set)"""
+    try:
+        return len(json.dumps(data, default=str, separators=(',', ':')))
+    except (TypeError, ValueError):
+        return sys.getsizeof(data)
+
+class CloudWatchCache(CacheBackend):
     """
-    Sistema de cache em memória para dados do CloudWatch
+    Sistema de cache em memória para dados do CloudWatch (backend 'memory')
+    
+    LRU limitado por número de entradas e por bytes, com expiração por heap
+    (a limpeza custa O(expiradas)) e contadores por família de chave.
     """
     
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._ttl: Dict[str, float] = {}
+    name = 'memory'
+    
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        super().__init__()
+        limits = getattr(CloudWatchConfig, 'CACHE_LIMITS', {})
+        self.max_entries = max_entries or limits.get('max_entries', 10000)
+        self.max_bytes = max_bytes or limits.get('max_bytes', 64 * 1024 * 1024)
+        
+        # chave -> entrada; a ordem do OrderedDict é a ordem de uso (LRU primeiro)
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        # (expira_em, seq, chave); entradas sobrescritas ficam obsoletas no heap
+        self._expiry_heap: List[tuple] = []
+        self._seq = 0
+        self._bytes = 0
+        self._lock = threading.RLock()
     
     def _generate_key(self, *args, **kwargs) -> str:
         """Gerar chave única para o cache"""
         key_data = str(args) + str(sorted(kwargs.items()))
         return hashlib.md5(key_data.encode()).hexdigest()
     
+    def _remove(self, key: str) -> None:
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry['size']
+    
+    def _evict_to_limits(self) -> None:
+        while self._cache and (len(self._cache) > self.max_entries or self._bytes > self.max_bytes):
+            key, entry = self._cache.popitem(last=False)
+            self._bytes -= entry['size']
+            self._count(key, 'evictions')
+    
     def set(self, key: str, data: Any, ttl_seconds: int = 300) -> None:
         """Armazenar dados no cache com TTL"""
         try:
-            self._cache[key] = {
-                'data': data,
-                'stored_at': time.time(),
-                'ttl': ttl_seconds
-            }
+            size = _estimate_size(data) + len(key)
+            now = time.time()
+            with self._lock:
+                self._remove(key)
+                self._seq += 1
+                self._cache[key] = {
+                    'data': data,
+                    'stored_at': now,
+                    'ttl': ttl_seconds,
+                    'expires_at': now + ttl_seconds,
+                    'size': size,
+                    'seq': self._seq
+                }
+                self._bytes += size
+                heapq.heappush(self._expiry_heap, (now + ttl_seconds, self._seq, key))
+                self._count(key, 'sets')
+                self._evict_to_limits()
+                # Heap com muitas entradas obsoletas: reconstruir
+                if len(self._expiry_heap) > 2 * len(self._cache) + 1024:
+                    self._rebuild_heap()
             logger.debug(f"Cache set: {key} (TTL: {ttl_seconds}s)")
         except Exception as e:
             logger.error(f"Erro ao salvar no cache: {e}")
@@ -41,21 +104,24 @@ class CloudWatchCache:
     def get(self, key: str) -> Optional[Any]:
         """Recuperar dados do cache se ainda válidos"""
         try:
-            if key not in self._cache:
-                return None
-            
-            cache_entry = self._cache[key]
-            stored_at = cache_entry['stored_at']
-            ttl = cache_entry['ttl']
-            
-            # Verificar se ainda é válido
-            if time.time() - stored_at > ttl:
-                del self._cache[key]
-                logger.debug(f"Cache expired: {key}")
-                return None
-            
+            with self._lock:
+                entry = self._cache.get(key)
+                if entry is None:
+                    self._count(key, 'misses')
+                    return None
+                
+                # Verificar se ainda é válido
+                if time.time() > entry['expires_at']:
+                    self._remove(key)
+                    self._count(key, 'expirations')
+                    self._count(key, 'misses')
+                    logger.debug(f"Cache expired: {key}")
+                    return None
+                
+                self._cache.move_to_end(key)
+                self._count(key, 'hits')
             logger.debug(f"Cache hit: {key}")
-            return cache_entry['data']
+            return entry['data']
             
         except Exception as e:
             logger.error(f"Erro ao recuperar do cache: {e}")
@@ -64,58 +130,102 @@ class CloudWatchCache:
     def invalidate(self, pattern: str = None) -> None:
         """Invalidar entradas do cache"""
         try:
-            if pattern:
-                keys_to_remove = [k for k in self._cache.keys() if pattern in k]
-                for key in keys_to_remove:
-                    del self._cache[key]
-                logger.debug(f"Cache invalidated: {len(keys_to_remove)} entries with pattern '{pattern}'")
-            else:
-                self._cache.clear()
-                logger.debug("Cache cleared completely")
+            with self._lock:
+                if pattern:
+                    keys_to_remove = [k for k in self._cache.keys() if pattern in k]
+                    for key in keys_to_remove:
+                        self._remove(key)
+                    logger.debug(f"Cache invalidated: {len(keys_to_remove)} entries with pattern '{pattern}'")
+                else:
+                    self._cache.clear()
+                    self._expiry_heap = []
+                    self._bytes = 0
+                    logger.debug("Cache cleared completely")
         except Exception as e:
             logger.error(f"Erro ao invalidar cache: {e}")
     
+    def _rebuild_heap(self) -> None:
+        self._expiry_heap = [(entry['expires_at'], entry['seq'], key) for key, entry in self._cache.items()]
+        heapq.heapify(self._expiry_heap)
+    
     def get_cache_stats(self) -> Dict[str, Any]:
         """Obter estatísticas do cache"""
-        current_time = time.time()
-        valid_entries = 0
-        expired_entries = 0
-        
-        for key, entry in self._cache.items():
-            if current_time - entry['stored_at'] <= entry['ttl']:
-                valid_entries += 1
-            else:
-                expired_entries += 1
-        
-        return {
-            'total_entries': len(self._cache),
-            'valid_entries': valid_entries,
-            'expired_entries': expired_entries,
-            'memory_usage_mb': len(str(self._cache)) / (1024 * 1024)
-        }
+        expired_entries = self.cleanup_expired()
+        stats = self._family_stats()
+        with self._lock:
+            stats.update({
+                'total_entries': len(self._cache),
+                'valid_entries': len(self._cache),
+                'expired_entries': expired_entries,
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'memory_usage_mb': round(self._bytes / (1024 * 1024), 3)
+            })
+        return stats
     
     def cleanup_expired(self) -> int:
         """Limpar entradas expiradas"""
         current_time = time.time()
-        expired_keys = []
-        
-        for key, entry in self._cache.items():
-            if current_time - entry['stored_at'] > entry['ttl']:
-                expired_keys.append(key)
+        removed = 0
         
-        for key in expired_keys:
-            del self._cache[key]
+        with self._lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= current_time:
+                _, seq, key = heapq.heappop(heap)
+                entry = self._cache.get(key)
+                # Ignorar itens obsoletos (chave sobrescrita ou já removida)
+                if entry is not None and entry['seq'] == seq:
+                    self._remove(key)
+                    self._count(key, 'expirations')
+                    removed += 1
         
-        logger.debug(f"Cleaned up {len(expired_keys)} expired cache entries")
-        return len(expired_keys)
+        logger.debug(f"Cleaned up {removed} expired cache entries")
+        return removed
+
+def create_cache_backend(backend_type: Optional[str] = None) -> CacheBackend:
+    """
+    Criar o backend configurado em CloudWatchConfig.CACHE_BACKEND
+    
+    memory: dicionário do processo; sqlite: arquivo compartilhado pelos workers
+    do host; kv: servidor Redis compartilhado entre hosts; local_kv: substituto
+    local do kv. Em caso de erro, cai para o cache em memória.
+    """
+    settings = getattr(CloudWatchConfig, 'CACHE_BACKEND', {})
+    backend_type = backend_type or settings.get('type', 'memory')
+    limits = getattr(CloudWatchConfig, 'CACHE_LIMITS', {})
+    compress_min_bytes = settings.get('compress_min_bytes', 1024)
+    prefix = settings.get('kv_prefix', 'awsnoc:cw:')
+    
+    try:
+        if backend_type == 'sqlite':
+            return SQLiteCacheBackend(
+                settings.get('sqlite_path', '/tmp/awsnoc_cloudwatch_cache.db'),
+                max_entries=limits.get('max_entries', 10000),
+                compress_min_bytes=compress_min_bytes
+            )
+        if backend_type == 'kv':
+            return KeyValueCacheBackend.from_url(
+                settings.get('kv_url') or 'redis://localhost:6379/0',
+                prefix=prefix,
+                compress_min_bytes=compress_min_bytes,
+                socket_timeout=settings.get('kv_socket_timeout', 1.0)
+            )
+        if backend_type == 'local_kv':
+            return KeyValueCacheBackend(LocalKVClient(), prefix=prefix, compress_min_bytes=compress_min_bytes)
+        if backend_type != 'memory':
+            logger.warning(f"Backend de cache desconhecido '{backend_type}', usando memória")
+    except Exception as e:
+        logger.error(f"Erro criando backend de cache '{backend_type}', usando memória: {e}")
+    return CloudWatchCache()
 
 class CloudWatchCacheManager:
     """
     Gerenciador de cache específico para CloudWatch
     """
     
-    def __init__(self):
-        self.cache = CloudWatchCache()
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        self.cache = backend or create_cache_backend()
         self.last_cleanup = time.time()
         self.cleanup_interval = 300  # 5 minutos
     
@@ -0,0 +1,280 @@
+"""
+AWSNoc IA IA - Pool de Conexões PostgreSQL
+Pool compartilhado de conexões para os handlers da API, HealthChecker e serviços de alarmes
+"""
+
+import asyncio
+import functools
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import pool as pg_pool
+
+try:
+    from config.database_config import DatabaseConfig
+except ImportError:
+    class DatabaseConfig:
+        POOL = {'min_connections': 2, 'max_connections': 20, 'acquire_timeout': 10}
+
+        @classmethod
+        def get_pool_setting(cls, setting, default=None):
+            return cls.POOL.get(setting, default)
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo de espera"""
+
+
+class PooledConnection:
+    """
+    Conexão emprestada do pool
+
+    Repassa tudo para a conexão psycopg2 real, mas close() devolve a
+    conexão ao pool em vez de encerrá-la.
+    """
+
+    def __init__(self, pool: 'DatabasePool', conn, checked_out_at: float):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_checked_out_at', checked_out_at)
+        object.__setattr__(self, '_released', False)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    @property
+    def closed(self) -> int:
+        return 1 if self._released else self._conn.closed
+
+    def close(self):
+        """Devolver a conexão ao pool"""
+        if self._released:
+            return
+        object.__setattr__(self, '_released', True)
+        self._pool.putconn(self._conn, self._checked_out_at)
+
+    def __del__(self):
+        # Handlers que esquecem conn.close() não podem vazar slots do pool
+        if not getattr(self, '_released', True):
+            logger.warning("Conexão do pool coletada sem close(), devolvendo ao pool")
+            try:
+                self.close()
+            except Exception:
+                pass
+
+
+class DatabasePool:
+    """
+    Pool de conexões PostgreSQL thread-safe com estatísticas de uso
+    """
+
+    def __init__(self, db_config: Dict[str, Any], min_connections: Optional[int] = None,
+                 max_connections: Optional[int] = None, acquire_timeout: Optional[float] = None):
+        self.db_config = dict(db_config)
+        self.min_connections = min_connections or DatabaseConfig.get_pool_setting('min_connections', 2)
+        self.max_connections = max_connections or DatabaseConfig.get_pool_setting('max_connections', 20)
+        self.acquire_timeout = acquire_timeout or DatabaseConfig.get_pool_setting('acquire_timeout', 10)
+
+        self._pool: Optional[pg_pool.ThreadedConnectionPool] = None
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._lock = threading.Lock()
+        self._stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'wait_total': 0.0,
+            'wait_max': 0.0,
+            'checkout_total': 0.0,
+            'checkout_max': 0.0,
+            'hold_total': 0.0,
+            'returns': 0
+        }
+
+    @property
+    def is_open(self) -> bool:
+        return self._pool is not None
+
+    def open(self) -> None:
+        """Abrir o pool (idempotente)"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = pg_pool.ThreadedConnectionPool(
+                    self.min_connections, self.max_connections, **self.db_config
+                )
+                logger.info(f"Pool PostgreSQL aberto ({self.min_connections}-{self.max_connections} conexões)")
+
+    def close(self) -> None:
+        """Fechar todas as conexões do pool"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                logger.info("Pool PostgreSQL fechado")
+
+    def getconn(self, autocommit: bool = True) -> PooledConnection:
+        """Emprestar uma conexão, aguardando até acquire_timeout se o pool estiver cheio"""
+        if self._pool is None:
+            self.open()
+
+        requested_at = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeoutError(
+                f"Nenhuma conexão livre após {self.acquire_timeout}s ({self.max_connections} em uso)"
+            )
+        waited = time.perf_counter() - requested_at
+
+        try:
+            conn = self._pool.getconn()
+            if conn.closed:
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            if conn.autocommit != autocommit:
+                conn.autocommit = autocommit
+        except Exception:
+            self._slots.release()
+            raise
+
+        checked_out_at = time.perf_counter()
+        checkout_latency = checked_out_at - requested_at
+
+        with self._lock:
+            stats = self._stats
+            stats['checkouts'] += 1
+            stats['in_use'] += 1
+            stats['peak_in_use'] = max(stats['peak_in_use'], stats['in_use'])
+            stats['wait_total'] += waited
+            stats['wait_max'] = max(stats['wait_max'], waited)
+            stats['checkout_total'] += checkout_latency
+            stats['checkout_max'] = max(stats['checkout_max'], checkout_latency)
+
+        return PooledConnection(self, conn, checked_out_at)
+
+    async def agetconn(self, autocommit: bool = True) -> PooledConnection:
+        """
+        getconn para handlers async: a espera por um slot roda em thread, sem
+        travar o event loop quando o pool está cheio
+        """
+        future = asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.getconn, autocommit=autocommit)
+        )
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # Requisição cancelada: a conexão emprestada depois volta direto ao pool
+            future.add_done_callback(
+                lambda f: f.cancelled() or f.exception() is not None or f.result().close()
+            )
+            raise
+
+    def putconn(self, conn, checked_out_at: float) -> None:
+        """Devolver conexão ao pool, descartando-a se estiver quebrada"""
+        discard = bool(conn.closed)
+        if not discard:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        try:
+            if self._pool is not None:
+                self._pool.putconn(conn, close=discard)
+            elif not conn.closed:
+                conn.close()
+        except Exception as e:
+            logger.error(f"Erro devolvendo conexão ao pool: {e}")
+        finally:
+            with self._lock:
+                self._stats['in_use'] -= 1
+                self._stats['returns'] += 1
+                self._stats['hold_total'] += time.perf_counter() - checked_out_at
+                if discard:
+                    self._stats['discarded'] += 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, autocommit: bool = True):
+        """Context manager que devolve a conexão ao pool ao sair"""
+        conn = self.getconn(autocommit=autocommit)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do pool"""
+        with self._lock:
+            stats = dict(self._stats)
+
+        checkouts = stats['checkouts'] or 1
+        returns = stats['returns'] or 1
+        return {
+            'open': self.is_open,
+            'min_connections': self.min_connections,
+            'max_connections': self.max_connections,
+            'in_use': stats['in_use'],
+            'available': self.max_connections - stats['in_use'],
+            'peak_in_use': stats['peak_in_use'],
+            'checkouts': stats['checkouts'],
+            'timeouts': stats['timeouts'],
+            'discarded_connections': stats['discarded'],
+            'avg_wait_ms': round(stats['wait_total'] / checkouts * 1000, 3),
+            'max_wait_ms': round(stats['wait_max'] * 1000, 3),
+            'avg_checkout_latency_ms': round(stats['checkout_total'] / checkouts * 1000, 3),
+            'max_checkout_latency_ms': round(stats['checkout_max'] * 1000, 3),
+            'avg_hold_ms': round(stats['hold_total'] / returns * 1000, 3)
+        }
+
+
+# Pools compartilhados no processo, um por banco de destino
+_pools: Dict[tuple, DatabasePool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(db_config: Dict[str, Any]) -> tuple:
+    return (
+        db_config.get('host'),
+        db_config.get('port'),
+        db_config.get('database') or db_config.get('dbname'),
+        db_config.get('user')
+    )
+
+
+def get_pool(db_config: Dict[str, Any]) -> DatabasePool:
+    """Obter (ou criar) o pool compartilhado para uma configuração de banco"""
+    key = _pool_key(db_config)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = DatabasePool(db_config)
+            _pools[key] = pool
+    return pool
+
+
+def close_all_pools() -> None:
+    """Fechar todos os pools do processo (shutdown da aplicação)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
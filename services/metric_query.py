@@ -0,0 +1,171 @@
+"""
+AWSNoc IA IA - Motor de Consultas de Métricas
+Agrupa consultas de várias métricas em chamadas GetMetricData (até 500 por chamada),
+busca apenas a janela do datapoint mais recente e guarda o resultado por métrica
+"""
+
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from services.cloudwatch_cache import cache_manager
+
+try:
+    from config.cloudwatch_config import CloudWatchConfig
+except ImportError:
+    class CloudWatchConfig:
+        QUERY_LIMITS = {'max_queries_per_get_metric_data': 500, 'latest_period': 60, 'latest_window_minutes': 10}
+
+        @classmethod
+        def get_cache_ttl(cls, component):
+            return 55
+
+logger = logging.getLogger(__name__)
+
+
+class MetricQuery:
+    """
+    Uma métrica a consultar (namespace, nome, dimensões e estatística)
+    """
+
+    def __init__(self, namespace: str, metric_name: str, dimensions: Dict[str, str],
+                 stat: str = 'Average', period: Optional[int] = None):
+        self.namespace = namespace
+        self.metric_name = metric_name
+        self.dimensions = [{'Name': name, 'Value': value} for name, value in sorted(dimensions.items())]
+        self.stat = stat
+        self.period = period or CloudWatchConfig.QUERY_LIMITS.get('latest_period', 60)
+
+    def cache_key(self, account_key: Any) -> str:
+        metrics_key = cache_manager.get_metrics_key(
+            self.namespace, f"{self.metric_name}_{self.stat}", self.dimensions, self.period
+        )
+        return f"latest_{account_key}_{metrics_key}"
+
+    def to_query(self, query_id: str) -> Dict[str, Any]:
+        return {
+            'Id': query_id,
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': self.namespace,
+                    'MetricName': self.metric_name,
+                    'Dimensions': self.dimensions
+                },
+                'Period': self.period,
+                'Stat': self.stat
+            },
+            'ReturnData': True
+        }
+
+
+class MetricQueryEngine:
+    """
+    Busca o valor mais recente de muitas métricas com o mínimo de chamadas ao CloudWatch
+    """
+
+    def __init__(self):
+        self.batch_size = min(CloudWatchConfig.QUERY_LIMITS.get('max_queries_per_get_metric_data', 500), 500)
+        self.window_minutes = CloudWatchConfig.QUERY_LIMITS.get('latest_window_minutes', 10)
+        self._stats = {
+            'requests': 0,
+            'metrics_requested': 0,
+            'cache_hits': 0,
+            'api_calls': 0,
+            'queries_sent': 0,
+            'errors': 0,
+            'api_time_total': 0.0
+        }
+
+    async def get_latest(self, cloudwatch, queries: List[MetricQuery],
+                         account_key: Any = None) -> List[Optional[float]]:
+        """
+        Valor mais recente de cada métrica (None quando não há datapoint na janela)
+
+        ``cloudwatch`` é um cliente envolvido por aws_async; o resultado segue a ordem de ``queries``.
+        """
+        self._stats['requests'] += 1
+        self._stats['metrics_requested'] += len(queries)
+
+        ttl = CloudWatchConfig.get_cache_ttl('metrics')
+        results: List[Optional[float]] = [None] * len(queries)
+        pending: Dict[str, List[int]] = {}
+        unique: Dict[str, MetricQuery] = {}
+
+        for index, query in enumerate(queries):
+            key = query.cache_key(account_key)
+            cached = cache_manager.cache.get(key)
+            if cached is not None:
+                self._stats['cache_hits'] += 1
+                results[index] = cached['value']
+                continue
+            pending.setdefault(key, []).append(index)
+            unique[key] = query
+
+        keys = list(unique)
+        for offset in range(0, len(keys), self.batch_size):
+            batch_keys = keys[offset:offset + self.batch_size]
+            try:
+                values = await self._fetch_batch(cloudwatch, [unique[key] for key in batch_keys])
+            except Exception as e:
+                # Sem cache para falhas: a próxima requisição tenta de novo
+                self._stats['errors'] += 1
+                logger.error(f"Erro no GetMetricData ({len(batch_keys)} métricas): {e}")
+                continue
+
+            for position, key in enumerate(batch_keys):
+                value = values.get(f"m{position}")
+                cache_manager.cache.set(key, {'value': value}, ttl)
+                for index in pending[key]:
+                    results[index] = value
+
+        return results
+
+    async def _fetch_batch(self, cloudwatch, queries: List[MetricQuery]) -> Dict[str, Optional[float]]:
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(minutes=self.window_minutes)
+        request = {
+            'MetricDataQueries': [query.to_query(f"m{position}") for position, query in enumerate(queries)],
+            'StartTime': start_time,
+            'EndTime': end_time,
+            'ScanBy': 'TimestampDescending'
+        }
+
+        values: Dict[str, Optional[float]] = {}
+        while True:
+            started = time.perf_counter()
+            response = await cloudwatch.get_metric_data(**request)
+            self._stats['api_calls'] += 1
+            self._stats['queries_sent'] += len(request['MetricDataQueries'])
+            self._stats['api_time_total'] += time.perf_counter() - started
+
+            for result in response.get('MetricDataResults', []):
+                # TimestampDescending: o primeiro valor é o mais recente
+                if result.get('Values') and values.get(result['Id']) is None:
+                    values[result['Id']] = result['Values'][0]
+
+            next_token = response.get('NextToken')
+            if not next_token:
+                return values
+            request['NextToken'] = next_token
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do motor de métricas"""
+        api_calls = self._stats['api_calls'] or 1
+        requested = self._stats['metrics_requested'] or 1
+        return {
+            'batch_size': self.batch_size,
+            'window_minutes': self.window_minutes,
+            'requests': self._stats['requests'],
+            'metrics_requested': self._stats['metrics_requested'],
+            'cache_hits': self._stats['cache_hits'],
+            'cache_hit_rate': round(self._stats['cache_hits'] / requested, 3),
+            'api_calls': self._stats['api_calls'],
+            'queries_sent': self._stats['queries_sent'],
+            'errors': self._stats['errors'],
+            'avg_api_call_ms': round(self._stats['api_time_total'] / api_calls * 1000, 3)
+        }
+
+
+# Instância global do motor de métricas
+metric_engine = MetricQueryEngine()
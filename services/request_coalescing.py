@@ -0,0 +1,132 @@
+"""
+AWSNoc IA IA - Coalescência de Requisições
+Requisições GET idênticas e simultâneas compartilham uma única execução
+(single-flight), com micro-TTL opcional para o resultado
+"""
+
+import time
+import asyncio
+import functools
+import logging
+from typing import Dict, Any, Callable, Awaitable, Optional, Tuple
+
+try:
+    from config.aws_config import AWSConfig
+except ImportError:
+    class AWSConfig:
+        REQUEST_COALESCING = {'enabled': True, 'micro_ttl': {}}
+
+        @classmethod
+        def get_coalescing_setting(cls, setting, default=None):
+            return cls.REQUEST_COALESCING.get(setting, default)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCoalescer:
+    """
+    Single-flight por (rota, parâmetros)
+
+    A primeira requisição executa o handler numa task própria; as idênticas que
+    chegam enquanto ela roda aguardam a mesma task e recebem o mesmo resultado
+    (ou a mesma exceção). Com micro-TTL, o resultado ainda é reaproveitado por
+    alguns segundos após terminar.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        self._results: Dict[Tuple, Tuple[float, Any]] = {}
+        self._routes: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, route: str, counter: str) -> None:
+        stats = self._routes.get(route)
+        if stats is None:
+            stats = {'requests': 0, 'executions': 0, 'coalesced': 0, 'micro_ttl_hits': 0, 'errors': 0}
+            self._routes[route] = stats
+        stats[counter] += 1
+
+    def _prune_results(self, now: float) -> None:
+        expired = [key for key, (expires_at, _) in self._results.items() if expires_at <= now]
+        for key in expired:
+            del self._results[key]
+
+    async def run(self, route: str, params: Dict[str, Any],
+                  handler: Callable[[], Awaitable[Any]], ttl: float = 0) -> Any:
+        """Executar ``handler`` uma única vez para todas as requisições idênticas em andamento"""
+        key = (route, tuple(sorted(params.items())))
+        self._count(route, 'requests')
+
+        if ttl:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._count(route, 'micro_ttl_hits')
+                return cached[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count(route, 'coalesced')
+        else:
+            self._count(route, 'executions')
+            task = asyncio.ensure_future(handler())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._finish, key, route, ttl))
+
+        # shield: se o cliente que iniciou desconectar, os demais continuam esperando
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Tuple, route: str, ttl: float, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            # Erros não ficam no micro-TTL: a próxima requisição tenta de novo
+            self._count(route, 'errors')
+            return
+        if ttl:
+            now = time.monotonic()
+            self._prune_results(now)
+            self._results[key] = (now + ttl, task.result())
+
+    def coalesce(self, route: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        Decorador para endpoints GET (usar abaixo do @app.get)
+
+        A chave é o nome da rota mais os parâmetros do endpoint; ``ttl`` padrão vem de
+        AWSConfig.REQUEST_COALESCING['micro_ttl'][route].
+        """
+        def decorator(func):
+            route_name = route or func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not AWSConfig.get_coalescing_setting('enabled', True) or args:
+                    return await func(*args, **kwargs)
+                micro_ttl = ttl if ttl is not None else \
+                    AWSConfig.get_coalescing_setting('micro_ttl', {}).get(route_name, 0)
+                return await self.run(route_name, kwargs, lambda: func(**kwargs), micro_ttl)
+
+            return wrapper
+        return decorator
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas da coalescência por rota"""
+        routes = {}
+        total_requests = total_coalesced = 0
+        for name, stats in self._routes.items():
+            saved = stats['coalesced'] + stats['micro_ttl_hits']
+            routes[name] = dict(stats, saved_ratio=round(saved / stats['requests'], 3) if stats['requests'] else 0.0)
+            total_requests += stats['requests']
+            total_coalesced += saved
+        return {
+            'enabled': AWSConfig.get_coalescing_setting('enabled', True),
+            'inflight': len(self._inflight),
+            'cached_results': len(self._results),
+            'requests': total_requests,
+            'coalesced': total_coalesced,
+            'routes': routes
+        }
+
+
+# Instância global de coalescência de requisições
+request_coalescer = RequestCoalescer()
@@ -0,0 +1,165 @@
+"""
+AWSNoc IA IA - Ingestão em Massa de Recursos Descobertos
+Carrega o snapshot da descoberta via COPY em uma tabela temporária e faz o
+merge em aws_resources numa única transação
+"""
+
+import csv
+import io
+import json
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Namespace do advisory lock que serializa ingestões da mesma conta
+INGEST_LOCK_NAMESPACE = 7301
+
+SNAPSHOT_COLUMNS = ('resource_type', 'resource_id', 'name', 'status', 'region', 'metadata', 'created_at')
+
+
+class ResourceIngestor:
+    """
+    Substitui os recursos de uma conta pelo snapshot da descoberta sem
+    deixar a tabela vazia: leitores concorrentes veem o estado anterior até o commit
+    """
+
+    def __init__(self):
+        self._index_ready = False
+
+    def _ensure_index(self, cur) -> None:
+        """Índice usado no merge por (conta, tipo, id do recurso)"""
+        if self._index_ready:
+            return
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_aws_resources_account_resource
+            ON aws_resources (account_id, resource_type, resource_id)
+        """)
+        self._index_ready = True
+
+    @staticmethod
+    def _parse_timestamp(value) -> Optional[datetime]:
+        """Normalizar created_at (datetime, ISO string ou 'None' vindo do discovery)"""
+        if isinstance(value, datetime):
+            return value
+        if not value or value == 'None':
+            return None
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+
+    def _build_snapshot(self, resources: List[Dict[str, Any]]) -> io.StringIO:
+        """Serializar o snapshot em CSV para o COPY (um registro por recurso)"""
+        unique = {}
+        for resource in resources:
+            unique[(resource['resource_type'], str(resource['resource_id']))] = resource
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for (resource_type, resource_id), resource in unique.items():
+            created_at = self._parse_timestamp(resource.get('created_at'))
+            writer.writerow([
+                resource_type,
+                resource_id,
+                resource.get('name'),
+                resource.get('status'),
+                resource.get('region'),
+                json.dumps(resource.get('metadata', {}), default=str),
+                created_at.isoformat() if created_at else None
+            ])
+        buffer.seek(0)
+        return buffer
+
+    def ingest(self, conn, account_id: int, resources: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Fazer o merge do snapshot em aws_resources
+
+        Não faz commit: o chamador controla a transação (conn com autocommit desligado).
+        """
+        started_at = time.perf_counter()
+        cur = conn.cursor()
+        try:
+            self._ensure_index(cur)
+            cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (INGEST_LOCK_NAMESPACE, account_id))
+
+            cur.execute("""
+                CREATE TEMP TABLE discovery_snapshot (
+                    resource_type VARCHAR(100),
+                    resource_id VARCHAR(255),
+                    name VARCHAR(255),
+                    status VARCHAR(100),
+                    region VARCHAR(50),
+                    metadata JSONB,
+                    created_at TIMESTAMP
+                ) ON COMMIT DROP
+            """)
+            cur.copy_expert(
+                f"COPY discovery_snapshot ({', '.join(SNAPSHOT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                self._build_snapshot(resources)
+            )
+
+            # Atualizar apenas recursos que mudaram
+            cur.execute("""
+                UPDATE aws_resources r SET
+                    name = s.name,
+                    status = s.status,
+                    region = s.region,
+                    metadata = s.metadata,
+                    created_at = COALESCE(s.created_at, r.created_at),
+                    last_updated = NOW()
+                FROM discovery_snapshot s
+                WHERE r.account_id = %s
+                  AND r.resource_type = s.resource_type
+                  AND r.resource_id = s.resource_id
+                  AND (r.name, r.status, r.region, r.metadata)
+                      IS DISTINCT FROM (s.name, s.status, s.region, s.metadata)
+            """, (account_id,))
+            updated = cur.rowcount
+
+            # Inserir recursos novos
+            cur.execute("""
+                INSERT INTO aws_resources
+                (account_id, resource_type, resource_id, name, status, region, metadata, created_at)
+                SELECT %s, s.resource_type, s.resource_id, s.name, s.status, s.region, s.metadata, s.created_at
+                FROM discovery_snapshot s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM aws_resources r
+                    WHERE r.account_id = %s
+                      AND r.resource_type = s.resource_type
+                      AND r.resource_id = s.resource_id
+                )
+            """, (account_id, account_id))
+            inserted = cur.rowcount
+
+            # Remover recursos que não existem mais na conta
+            cur.execute("""
+                DELETE FROM aws_resources r
+                WHERE r.account_id = %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM discovery_snapshot s
+                      WHERE s.resource_type = r.resource_type
+                        AND s.resource_id = r.resource_id
+                  )
+            """, (account_id,))
+            removed = cur.rowcount
+
+            cur.execute("DROP TABLE discovery_snapshot")
+        finally:
+            cur.close()
+
+        result = {
+            'resources': len(resources),
+            'inserted': inserted,
+            'updated': updated,
+            'removed': removed,
+            'duration_ms': round((time.perf_counter() - started_at) * 1000, 1)
+        }
+        logger.info(f"Snapshot da conta {account_id} ingerido: {result}")
+        return result
+
+
+# Instância global da ingestão de recursos
+resource_ingestor = ResourceIngestor()
@@ -0,0 +1,162 @@
+"""
+AWSNoc IA IA - Diagnóstico via SSM
+Envia um único comando para várias instâncias e acompanha as execuções sem
+bloquear o event loop, com backoff e prazo máximo
+"""
+
+import asyncio
+import time
+import logging
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+
+try:
+    from config.aws_config import AWSConfig
+except ImportError:
+    class AWSConfig:
+        SSM_DIAGNOSTICS = {'deadline_seconds': 30, 'initial_poll_interval': 1.0,
+                           'max_poll_interval': 5.0, 'max_instances_per_command': 50}
+
+        @classmethod
+        def get_ssm_setting(cls, setting, default=None):
+            return cls.SSM_DIAGNOSTICS.get(setting, default)
+
+logger = logging.getLogger(__name__)
+
+# Status de invocação que ainda podem mudar
+PENDING_STATUSES = {'Pending', 'InProgress', 'Delayed', 'Cancelling'}
+
+
+class SSMDiagnostics:
+    """
+    Executa comandos AWS-RunShellScript em lote e devolve o resultado de cada instância
+
+    Instâncias que não terminam dentro do prazo voltam com ``partial=True`` e a
+    saída disponível até aquele momento.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline or AWSConfig.get_ssm_setting('deadline_seconds', 30)
+        self.initial_poll_interval = AWSConfig.get_ssm_setting('initial_poll_interval', 1.0)
+        self.max_poll_interval = AWSConfig.get_ssm_setting('max_poll_interval', 5.0)
+        self.max_instances_per_command = AWSConfig.get_ssm_setting('max_instances_per_command', 50)
+        self._stats = {
+            'commands_sent': 0,
+            'instances': 0,
+            'completed': 0,
+            'partial': 0,
+            'polls': 0
+        }
+
+    async def _send(self, ssm, instance_ids: List[str], commands: List[str]) -> List[str]:
+        """Enviar o comando em lotes de até max_instances_per_command instâncias"""
+        command_ids = []
+        for offset in range(0, len(instance_ids), self.max_instances_per_command):
+            response = await ssm.send_command(
+                InstanceIds=instance_ids[offset:offset + self.max_instances_per_command],
+                DocumentName="AWS-RunShellScript",
+                Parameters={'commands': commands},
+                TimeoutSeconds=max(30, int(self.deadline))
+            )
+            command_ids.append(response['Command']['CommandId'])
+            self._stats['commands_sent'] += 1
+        return command_ids
+
+    async def _list_statuses(self, ssm, command_id: str) -> Dict[str, str]:
+        statuses = {}
+        pages = await ssm.paginate('list_command_invocations', CommandId=command_id)
+        for page in pages:
+            for invocation in page.get('CommandInvocations', []):
+                statuses[invocation['InstanceId']] = invocation.get('Status', 'Pending')
+        return statuses
+
+    async def _get_result(self, ssm, command_id: str, instance_id: str, partial: bool) -> Dict[str, Any]:
+        try:
+            invocation = await ssm.get_command_invocation(CommandId=command_id, InstanceId=instance_id)
+            status = invocation.get('Status', 'Unknown')
+            stdout = invocation.get('StandardOutputContent', '')
+            stderr = invocation.get('StandardErrorContent', '')
+        except Exception as e:
+            status, stdout, stderr = 'Unknown', '', str(e)
+
+        return {
+            'instance_id': instance_id,
+            'status': status,
+            'success': status == 'Success',
+            'partial': partial,
+            'stdout': stdout,
+            'stderr': stderr
+        }
+
+    async def iter_results(self, ssm, instance_ids: List[str],
+                           commands: List[str]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Enviar o comando e produzir (instance_id, resultado) à medida que cada instância termina
+
+        ``ssm`` é um cliente envolvido por aws_async.
+        """
+        if not instance_ids:
+            return
+
+        started = time.monotonic()
+        self._stats['instances'] += len(instance_ids)
+        command_ids = await self._send(ssm, list(instance_ids), commands)
+        # Instância -> comando que a atende
+        pending = {
+            instance_id: command_ids[index // self.max_instances_per_command]
+            for index, instance_id in enumerate(instance_ids)
+        }
+
+        interval = self.initial_poll_interval
+        while pending:
+            remaining = self.deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 2, self.max_poll_interval)
+
+            # Uma chamada por comando informa o status de todas as instâncias
+            statuses = {}
+            for command_id in set(pending.values()):
+                self._stats['polls'] += 1
+                try:
+                    statuses.update(await self._list_statuses(ssm, command_id))
+                except Exception as e:
+                    logger.warning(f"Erro consultando invocações SSM {command_id}: {e}")
+
+            finished = [
+                instance_id for instance_id in pending
+                if statuses.get(instance_id, 'Pending') not in PENDING_STATUSES
+            ]
+            results = await asyncio.gather(*[
+                self._get_result(ssm, pending[instance_id], instance_id, partial=False)
+                for instance_id in finished
+            ])
+            for instance_id, result in zip(finished, results):
+                del pending[instance_id]
+                self._stats['completed'] += 1
+                yield instance_id, result
+
+        # Prazo esgotado: devolver o que já foi produzido
+        if pending:
+            results = await asyncio.gather(*[
+                self._get_result(ssm, command_id, instance_id, partial=True)
+                for instance_id, command_id in pending.items()
+            ])
+            for instance_id, result in zip(list(pending), results):
+                self._stats['partial'] += 1
+                yield instance_id, result
+
+    async def run(self, ssm, instance_ids: List[str], commands: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Executar o comando em todas as instâncias e retornar o resultado por instância"""
+        results = {}
+        async for instance_id, result in self.iter_results(ssm, instance_ids, commands):
+            results[instance_id] = result
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do diagnóstico SSM"""
+        return dict(self._stats, deadline_seconds=self.deadline)
+
+
+# Instância global do diagnóstico SSM
+ssm_diagnostics = SSMDiagnostics()
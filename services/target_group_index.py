@@ -0,0 +1,233 @@
+"""
+AWSNoc IA IA - Índice Target Group → Serviços ECS
+Mapa por conta de ARN do target group para (cluster, serviço, task definition),
+montado a partir dos dados da descoberta e atualizado incrementalmente
+"""
+
+import json
+import time
+import asyncio
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import psycopg2.extras
+
+from services.db_pool import get_pool
+
+try:
+    from config.cloudwatch_config import CloudWatchConfig
+except ImportError:
+    class CloudWatchConfig:
+        @classmethod
+        def get_cache_ttl(cls, component):
+            return 295
+
+logger = logging.getLogger(__name__)
+
+
+def service_entry(service: Dict[str, Any], cluster_name: str, cluster_arn: Optional[str] = None) -> Dict[str, Any]:
+    """Entrada do índice a partir de um serviço do describe_services"""
+    return {
+        'cluster_name': cluster_name,
+        'cluster_arn': cluster_arn or service.get('clusterArn'),
+        'service_name': service['serviceName'],
+        'service_arn': service['serviceArn'],
+        'task_definition': service.get('taskDefinition'),
+        'target_group_arns': [
+            lb['targetGroupArn'] for lb in service.get('loadBalancers', []) if lb.get('targetGroupArn')
+        ]
+    }
+
+
+class TargetGroupServiceIndex:
+    """
+    Índice reverso target group → serviços ECS, por conta
+    """
+
+    def __init__(self, db_config: Dict[str, Any], ttl: Optional[int] = None):
+        self.db_config = db_config
+        self.ttl = ttl or CloudWatchConfig.get_cache_ttl('discovery')
+        # conta -> {'services': {service_arn: entry}, 'by_tg': {tg_arn: [service_arn]}, 'loaded_at': float}
+        self._accounts: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'lookups': 0, 'hits': 0, 'misses': 0, 'db_loads': 0, 'scans': 0, 'service_updates': 0}
+
+    def _build(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        services = {entry['service_arn']: entry for entry in entries}
+        by_tg: Dict[str, List[str]] = {}
+        for entry in services.values():
+            for tg_arn in entry['target_group_arns']:
+                by_tg.setdefault(tg_arn, []).append(entry['service_arn'])
+        return {'services': services, 'by_tg': by_tg, 'loaded_at': time.monotonic()}
+
+    def _load_from_db(self, account_id: int) -> Optional[Dict[str, Any]]:
+        """Montar o índice da conta a partir dos serviços ECS salvos pela descoberta"""
+        self._stats['db_loads'] += 1
+        with get_pool(self.db_config).connection() as conn:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute("""
+                SELECT resource_id, name, metadata FROM aws_resources
+                WHERE account_id = %s AND resource_type = 'ECS_Service'
+            """, (account_id,))
+            rows = cursor.fetchall()
+            cursor.close()
+
+        entries = []
+        for row in rows:
+            metadata = row['metadata'] if isinstance(row['metadata'], dict) else json.loads(row['metadata'] or '{}')
+            # Recursos salvos antes do índice existir não trazem os target groups
+            if 'target_group_arns' not in metadata:
+                return None
+            entries.append({
+                'cluster_name': metadata.get('cluster_name'),
+                'cluster_arn': metadata.get('cluster_arn'),
+                'service_name': row['name'],
+                'service_arn': row['resource_id'],
+                'task_definition': metadata.get('task_definition'),
+                'target_group_arns': metadata.get('target_group_arns', [])
+            })
+        return self._build(entries) if entries else None
+
+    def lookup(self, account_id: int, tg_arn: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Serviços ECS atrás do target group
+
+        Retorna None quando a conta ainda não tem índice (o chamador deve varrer o ECS).
+        """
+        self._stats['lookups'] += 1
+        with self._lock:
+            index = self._accounts.get(account_id)
+        if index is None or time.monotonic() - index['loaded_at'] > self.ttl:
+            try:
+                loaded = self._load_from_db(account_id)
+            except Exception as e:
+                logger.error(f"Erro carregando índice de target groups da conta {account_id}: {e}")
+                loaded = None
+            if loaded is not None:
+                index = loaded
+                with self._lock:
+                    self._accounts[account_id] = index
+
+        if index is None:
+            self._stats['misses'] += 1
+            return None
+
+        self._stats['hits'] += 1
+        return [index['services'][arn] for arn in index['by_tg'].get(tg_arn, [])]
+
+    def update_account(self, account_id: int, resources: List[Dict[str, Any]]) -> None:
+        """Substituir o índice da conta com os recursos de uma descoberta"""
+        entries = []
+        for resource in resources:
+            if resource.get('resource_type') != 'ECS_Service':
+                continue
+            metadata = resource.get('metadata', {})
+            entries.append({
+                'cluster_name': metadata.get('cluster_name'),
+                'cluster_arn': metadata.get('cluster_arn'),
+                'service_name': resource.get('name'),
+                'service_arn': resource['resource_id'],
+                'task_definition': metadata.get('task_definition'),
+                'target_group_arns': metadata.get('target_group_arns', [])
+            })
+        with self._lock:
+            self._accounts[account_id] = self._build(entries)
+
+    def update_services(self, account_id: int, entries: List[Dict[str, Any]],
+                        replace: bool = False) -> None:
+        """
+        Atualizar serviços individuais (ex.: após um describe_services na análise)
+
+        Com replace=True a lista passa a ser o índice completo da conta.
+        """
+        self._stats['service_updates'] += len(entries)
+        with self._lock:
+            index = self._accounts.get(account_id)
+            if replace or index is None:
+                self._accounts[account_id] = self._build(entries)
+                return
+            services = dict(index['services'])
+            for entry in entries:
+                services[entry['service_arn']] = entry
+            rebuilt = self._build(list(services.values()))
+            rebuilt['loaded_at'] = index['loaded_at']
+            self._accounts[account_id] = rebuilt
+
+    def remove_service(self, account_id: int, service_arn: str) -> None:
+        """Retirar do índice um serviço que não existe mais"""
+        with self._lock:
+            index = self._accounts.get(account_id)
+            if index and service_arn in index['services']:
+                services = {arn: e for arn, e in index['services'].items() if arn != service_arn}
+                rebuilt = self._build(list(services.values()))
+                rebuilt['loaded_at'] = index['loaded_at']
+                self._accounts[account_id] = rebuilt
+
+    async def scan(self, ecs, account_id: int, tg_arn: str) -> List[Dict[str, Any]]:
+        """Varrer clusters/serviços ECS da conta e reconstruir o índice (fallback sem descoberta)"""
+        self._stats['scans'] += 1
+        entries = []
+        for page in await ecs.paginate('list_clusters'):
+            for cluster_arn in page['clusterArns']:
+                cluster_name = cluster_arn.split('/')[-1]
+                service_arns = []
+                for services_page in await ecs.paginate('list_services', cluster=cluster_arn):
+                    service_arns.extend(services_page['serviceArns'])
+
+                # describe_services aceita até 10 serviços por chamada
+                for i in range(0, len(service_arns), 10):
+                    details = await ecs.describe_services(cluster=cluster_arn, services=service_arns[i:i+10])
+                    for service in details['services']:
+                        entries.append(service_entry(service, cluster_name, cluster_arn))
+
+        self.update_services(account_id, entries, replace=True)
+        return [entry for entry in entries if tg_arn in entry['target_group_arns']]
+
+    async def resolve(self, ecs, account_id: int, tg_arn: str,
+                      target_type: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Serviços ECS atuais atrás do target group, como (cluster_name, serviço do describe_services)
+
+        ``ecs`` é um cliente envolvido por aws_async. Os serviços do índice são
+        confirmados com um describe_services por cluster (até 10 por chamada).
+        """
+        loop = asyncio.get_running_loop()
+        entries = await loop.run_in_executor(None, self.lookup, account_id, tg_arn)
+        if entries is None or (not entries and target_type == 'ip'):
+            # Conta sem índice, ou targets IP (Fargate) sem serviço indexado: varrer o ECS
+            entries = await self.scan(ecs, account_id, tg_arn)
+
+        by_cluster: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in entries:
+            by_cluster.setdefault(entry['cluster_arn'] or entry['cluster_name'], []).append(entry)
+
+        matched = []
+        for cluster, cluster_entries in by_cluster.items():
+            cluster_name = cluster_entries[0]['cluster_name']
+            arns = [entry['service_arn'] for entry in cluster_entries]
+            for i in range(0, len(arns), 10):
+                details = await ecs.describe_services(cluster=cluster, services=arns[i:i+10])
+
+                refreshed = [service_entry(service, cluster_name) for service in details['services']]
+                self.update_services(account_id, refreshed)
+                for failure in details.get('failures', []):
+                    self.remove_service(account_id, failure.get('arn'))
+
+                for service, entry in zip(details['services'], refreshed):
+                    if tg_arn in entry['target_group_arns']:
+                        matched.append((cluster_name, service))
+        return matched
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do índice"""
+        with self._lock:
+            accounts = {
+                account_id: {
+                    'services': len(index['services']),
+                    'target_groups': len(index['by_tg']),
+                    'age_seconds': round(time.monotonic() - index['loaded_at'], 1)
+                }
+                for account_id, index in self._accounts.items()
+            }
+        return dict(self._stats, ttl_seconds=self.ttl, accounts=accounts)
@@ -0,0 +1,166 @@
+"""
+AWSNoc IA IA - Scanner de Saúde de Target Groups
+Lista todos os target groups (paginado) e consulta a saúde de cada um em
+paralelo, com limite de concorrência e de chamadas por segundo
+"""
+
+import asyncio
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    from config.aws_config import AWSConfig
+except ImportError:
+    class AWSConfig:
+        TARGET_HEALTH = {'max_concurrency': 16, 'calls_per_second': 50}
+
+        @classmethod
+        def get_target_health_setting(cls, setting, default=None):
+            return cls.TARGET_HEALTH.get(setting, default)
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Espaça as chamadas para no máximo ``rate`` por segundo"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ThreadRateLimiter:
+    """Mesmo espaçamento do RateLimiter para chamadas feitas em threads"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class TargetHealthScanner:
+    """
+    Varredura de saúde dos target groups de uma conta
+
+    ``scan`` (async) e ``scan_sync`` (threads) retornam ``(target_group,
+    TargetHealthDescriptions)`` para cada grupo; grupos cuja consulta falhou vêm
+    com a exceção no lugar da lista.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, calls_per_second: Optional[float] = None):
+        self.max_concurrency = max_concurrency or AWSConfig.get_target_health_setting('max_concurrency', 16)
+        self.calls_per_second = calls_per_second or AWSConfig.get_target_health_setting('calls_per_second', 50)
+        self._stats = {
+            'scans': 0,
+            'target_groups': 0,
+            'api_calls': 0,
+            'errors': 0,
+            'last_scan': None
+        }
+
+    async def scan(self, elbv2) -> List[Tuple[Dict[str, Any], Any]]:
+        """Varrer todos os target groups (``elbv2`` é um cliente envolvido por aws_async)"""
+        started = time.perf_counter()
+        calls = 0
+        errors = 0
+
+        pages = await elbv2.paginate('describe_target_groups')
+        calls += len(pages)
+        target_groups = [tg for page in pages for tg in page['TargetGroups']]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = RateLimiter(self.calls_per_second)
+
+        async def check(tg):
+            nonlocal calls, errors
+            async with semaphore:
+                await limiter.acquire()
+                calls += 1
+                try:
+                    response = await elbv2.describe_target_health(TargetGroupArn=tg['TargetGroupArn'])
+                    return tg, response['TargetHealthDescriptions']
+                except Exception as e:
+                    errors += 1
+                    return tg, e
+
+        results = await asyncio.gather(*[check(tg) for tg in target_groups])
+        self._record(started, len(target_groups), calls, errors)
+        return results
+
+    def scan_sync(self, elbv2) -> List[Tuple[Dict[str, Any], Any]]:
+        """Varrer todos os target groups a partir de código síncrono (``elbv2`` é um cliente boto3)"""
+        started = time.perf_counter()
+
+        pages = list(elbv2.get_paginator('describe_target_groups').paginate())
+        target_groups = [tg for page in pages for tg in page['TargetGroups']]
+        if not target_groups:
+            self._record(started, 0, len(pages), 0)
+            return []
+
+        limiter = ThreadRateLimiter(self.calls_per_second)
+
+        def check(tg):
+            limiter.acquire()
+            try:
+                response = elbv2.describe_target_health(TargetGroupArn=tg['TargetGroupArn'])
+                return tg, response['TargetHealthDescriptions']
+            except Exception as e:
+                return tg, e
+
+        workers = min(self.max_concurrency, len(target_groups))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tg-health') as pool:
+            results = list(pool.map(check, target_groups))
+
+        errors = sum(1 for _, targets in results if isinstance(targets, Exception))
+        self._record(started, len(target_groups), len(pages) + len(target_groups), errors)
+        return results
+
+    def _record(self, started: float, target_groups: int, calls: int, errors: int):
+        duration = time.perf_counter() - started
+        self._stats['scans'] += 1
+        self._stats['target_groups'] += target_groups
+        self._stats['api_calls'] += calls
+        self._stats['errors'] += errors
+        self._stats['last_scan'] = {
+            'target_groups': target_groups,
+            'api_calls': calls,
+            'errors': errors,
+            'duration_ms': round(duration * 1000, 1)
+        }
+        logger.info(f"Varredura de target groups: {self._stats['last_scan']}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas das varreduras"""
+        return dict(
+            self._stats,
+            max_concurrency=self.max_concurrency,
+            calls_per_second=self.calls_per_second
+        )
+
+
+# Instância global do scanner de saúde
+target_health_scanner = TargetHealthScanner()
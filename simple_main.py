@@ -6,16 +6,30 @@ Sistema SaaS básico para monitoramento AWS
 """
 
 import json
+import asyncio
 import psycopg2
 import psycopg2.extras
 from fastapi import FastAPI, HTTPException
 from botocore.exceptions import NoCredentialsError, ClientError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 import uvicorn
 from datetime import datetime
+from services.db_pool import get_pool, close_all_pools
+from discovery_runner import DiscoveryRunner
+from services.aws_async import aws_async
+from services.aws_clients import aws_clients
+from services.request_coalescing import request_coalescer
+from services.bedrock_client import bedrock_async
+from services.analysis_stream import AnalysisStream, SSE_HEADERS, progress_callback
+from services.cloudwatch_cache import cache_manager
+from services.analysis_cache import analysis_cache
+from services.metric_query import MetricQuery, metric_engine
+from services.ssm_diagnostics import ssm_diagnostics
+from services.target_group_index import TargetGroupServiceIndex
+from services.target_health import target_health_scanner
 
 # Configuração do banco
 DB_CONFIG = {
@@ -51,12 +65,42 @@ class AWSAccount(BaseModel):
     services: List[str] = []
     status: str = "active"
 
+# Pool de conexões compartilhado (aberto no startup, fechado no shutdown)
+db_pool = get_pool(DB_CONFIG)
+tg_index = TargetGroupServiceIndex(DB_CONFIG)
+discovery_runner = DiscoveryRunner(DB_CONFIG, tg_index=tg_index)
+
+@app.on_event("startup")
+async def open_db_pool():
+    try:
+        db_pool.open()
+    except Exception as e:
+        print(f"Erro abrindo pool de conexões: {e}")
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    close_all_pools()
+
+@app.on_event("shutdown")
+async def shutdown_aws_executor():
+    aws_async.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_discovery_runner():
+    discovery_runner.shutdown()
+
 def get_db_connection():
-    """Conecta ao banco de dados"""
+    """Empresta uma conexão do pool (conn.close() devolve ao pool)"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        conn.autocommit = True
-        return conn
+        return db_pool.getconn(autocommit=True)
+    except Exception as e:
+        print(f"Erro de conexão: {e}")
+        return None
+
+async def get_db_connection_async():
+    """Empresta uma conexão do pool sem bloquear o event loop (para handlers async)"""
+    try:
+        return await db_pool.agetconn(autocommit=True)
     except Exception as e:
         print(f"Erro de conexão: {e}")
         return None
@@ -86,6 +130,61 @@ async def root():
 async def health():
     return {"status": "healthy", "service": "AWSNoc IA IA"}
 
+@app.get("/api/v1/stats/db-pool")
+async def get_db_pool_stats():
+    """Estatísticas do pool de conexões PostgreSQL"""
+    return db_pool.get_stats()
+
+@app.get("/api/v1/stats/aws-calls")
+async def get_aws_call_stats():
+    """Estatísticas da camada assíncrona de chamadas AWS"""
+    return aws_async.get_stats()
+
+@app.get("/api/v1/stats/metric-queries")
+async def get_metric_query_stats():
+    """Estatísticas do motor de consultas GetMetricData"""
+    return metric_engine.get_stats()
+
+@app.get("/api/v1/stats/ssm-diagnostics")
+async def get_ssm_diagnostics_stats():
+    """Estatísticas do diagnóstico de instâncias via SSM"""
+    return ssm_diagnostics.get_stats()
+
+@app.get("/api/v1/stats/target-group-index")
+async def get_target_group_index_stats():
+    """Estatísticas do índice target group -> serviços ECS"""
+    return tg_index.get_stats()
+
+@app.get("/api/v1/stats/target-health")
+async def get_target_health_stats():
+    """Estatísticas das varreduras de saúde dos target groups"""
+    return target_health_scanner.get_stats()
+
+@app.get("/api/v1/stats/aws-clients")
+async def get_aws_client_stats():
+    """Estatísticas da fábrica de sessões/clientes boto3"""
+    return aws_clients.get_stats()
+
+@app.get("/api/v1/stats/cloudwatch-cache")
+async def get_cloudwatch_cache_stats():
+    """Estatísticas do backend de cache do CloudWatch (taxa de acerto por família)"""
+    return cache_manager.get_stats()
+
+@app.get("/api/v1/stats/request-coalescing")
+async def get_request_coalescing_stats():
+    """Estatísticas da coalescência de GETs idênticos (requisições atendidas sem nova execução)"""
+    return request_coalescer.get_stats()
+
+@app.get("/api/v1/stats/analysis-cache")
+async def get_analysis_cache_stats():
+    """Estatísticas do cache de análises do Bedrock (memória e backend persistente)"""
+    return analysis_cache.get_stats()
+
+@app.get("/api/v1/stats/bedrock")
+async def get_bedrock_stats():
+    """Estatísticas do cliente Bedrock (taxa, retries e histogramas de fila/latência por modelo)"""
+    return bedrock_async.get_stats()
+
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard():
     """Dashboard principal"""
@@ -292,7 +391,7 @@ async def dashboard():
 @app.get("/api/v1/accounts")
 async def get_accounts():
     """Lista todas as contas AWS"""
-    conn = get_db_connection()
+    conn = await get_db_connection_async()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com banco")
     
@@ -320,7 +419,7 @@ async def get_accounts():
 @app.get("/api/v1/accounts/{account_id}")
 async def get_account(account_id: int):
     """Busca uma conta específica"""
-    conn = get_db_connection()
+    conn = await get_db_connection_async()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com banco")
     
@@ -347,8 +446,15 @@ async def get_account(account_id: int):
         raise HTTPException(status_code=500, detail=f"Erro: {str(e)}")
 
 @app.get("/api/v1/accounts/{account_id}/resources")
+@request_coalescer.coalesce("account_resources")
 async def get_account_resources(account_id: int):
     """Lista recursos de uma conta"""
+    # Consulta fora do event loop: requisições simultâneas aguardam a mesma execução
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, load_account_resources, account_id)
+
+def load_account_resources(account_id: int):
+    """Carregar recursos de uma conta do banco"""
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com banco")
@@ -373,13 +479,9 @@ async def get_account_resources(account_id: int):
 
 @app.get("/api/v1/alerts")
 async def get_alerts():
-    """Lista todos os alertas REAIS (executa health check primeiro)"""
+    """Lista todos os alertas REAIS (resultado do último health check em background)"""
     try:
-        # Executar verificação de saúde primeiro para obter alertas reais
-        if health_checker_available:
-            await run_health_check(DB_CONFIG)
-        
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -410,7 +512,7 @@ async def get_alerts():
         
         cursor.close()
         conn.close()
-        return {"alerts": alerts}
+        return {"alerts": alerts, "last_check": health_last_check()}
         
     except Exception as e:
         print(f"Erro ao buscar alertas: {e}")
@@ -419,7 +521,7 @@ async def get_alerts():
 @app.post("/api/v1/accounts")
 async def create_account(account: AWSAccount):
     """Cria uma nova conta AWS"""
-    conn = get_db_connection()
+    conn = await get_db_connection_async()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com banco")
     
@@ -448,7 +550,7 @@ async def create_account(account: AWSAccount):
 # Endpoint para métricas de RDS
 @app.get("/api/v1/rds/{account_id}/metrics")
 async def get_rds_metrics(account_id: int):
-    conn = get_db_connection()
+    conn = await get_db_connection_async()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com banco")
 
@@ -484,7 +586,7 @@ async def get_ecs_logs(account_id: int):
 
 async def get_account_from_db(account_id: int):
     """Buscar credenciais da conta no banco"""
-    conn = get_db_connection()
+    conn = await get_db_connection_async()
     if not conn:
         return None
     
@@ -507,6 +609,7 @@ async def get_account_from_db(account_id: int):
         conn.close()
 
 @app.get("/api/v1/ecs/{account_id}/services")
+@request_coalescer.coalesce("ecs_services")
 async def get_ecs_services(account_id: int):
     """Descobrir serviços ECS reais da conta AWS"""
     try:
@@ -515,20 +618,14 @@ async def get_ecs_services(account_id: int):
         if not account:
             raise HTTPException(status_code=404, detail=f"Conta {account_id} não encontrada")
         
-        import boto3
+        # Sessão AWS compartilhada da conta (clientes reutilizados)
+        session = aws_clients.for_account(account)
         
-        # Criar sessão AWS
-        session = boto3.Session(
-            aws_access_key_id=account['access_key'],
-            aws_secret_access_key=account['secret_key'],
-            region_name=account['region']
-        )
-        
-        ecs_client = session.client('ecs')
-        cloudwatch_client = session.client('cloudwatch')
+        ecs_client = aws_async.wrap(session.client('ecs'), account_id)
+        cloudwatch_client = aws_async.wrap(session.client('cloudwatch'), account_id)
         
         # Descobrir clusters
-        clusters_response = ecs_client.list_clusters()
+        clusters_response = await ecs_client.list_clusters()
         cluster_arns = clusters_response.get('clusterArns', [])
         
         if not cluster_arns:
@@ -548,6 +645,8 @@ async def get_ecs_services(account_id: int):
         all_services = []
         total_running = 0
         total_desired = 0
+        metric_queries = []
+        metric_targets = []
         
         # Para cada cluster, buscar serviços
         for cluster_arn in cluster_arns:
@@ -555,7 +654,7 @@ async def get_ecs_services(account_id: int):
             
             try:
                 # Listar serviços do cluster
-                services_response = ecs_client.list_services(cluster=cluster_arn)
+                services_response = await ecs_client.list_services(cluster=cluster_arn)
                 service_arns = services_response.get('serviceArns', [])
                 
                 if not service_arns:
@@ -565,7 +664,7 @@ async def get_ecs_services(account_id: int):
                 for i in range(0, len(service_arns), 10):
                     batch_arns = service_arns[i:i+10]
                     
-                    services_detail = ecs_client.describe_services(
+                    services_detail = await ecs_client.describe_services(
                         cluster=cluster_arn,
                         services=batch_arns
                     )
@@ -606,82 +705,20 @@ async def get_ecs_services(account_id: int):
                             "service_arn": service['serviceArn']
                         }
                         
-                                                                        # APENAS DADOS REAIS DO CLOUDWATCH - SEM SIMULAÇÃO
-                        try:
-                            from datetime import datetime, timedelta
-                            
-                            # Inicializar com N/A (padrão seguro)
-                            service_obj['cpu_utilization'] = "N/A"
-                            service_obj['memory_utilization'] = "N/A"
-                            
-                            # Apenas buscar métricas se o serviço estiver realmente rodando
-                            if running_count > 0:
-                                try:
-                                    end_time = datetime.now()
-                                    start_time = end_time - timedelta(hours=24)  # Últimas 24 horas
-                                    
-                                    # CPU utilization - apenas dados REAIS confirmados
-                                    cpu_response = cloudwatch_client.get_metric_statistics(
-                                        Namespace='AWS/ECS',
-                                        MetricName='CPUUtilization',
-                                        Dimensions=[
-                                            {'Name': 'ServiceName', 'Value': service_name},
-                                            {'Name': 'ClusterName', 'Value': cluster_name}
-                                        ],
-                                        StartTime=start_time,
-                                        EndTime=end_time,
-                                        Period=3600,
-                                        Statistics=['Average']
-                                    )
-                                    
-                                    cpu_datapoints = cpu_response.get('Datapoints', [])
-                                    if cpu_datapoints and len(cpu_datapoints) > 0:
-                                        # Apenas usar se temos dados reais confirmados
-                                        cpu_datapoints.sort(key=lambda x: x['Timestamp'])
-                                        latest_cpu = cpu_datapoints[-1]['Average']
-                                        # Validar se é um valor real (não zero artificial)
-                                        if latest_cpu >= 0:
-                                            service_obj['cpu_utilization'] = f"{latest_cpu:.1f}%"
-                                    
-                                    # Memory utilization - apenas dados REAIS confirmados  
-                                    memory_response = cloudwatch_client.get_metric_statistics(
-                                        Namespace='AWS/ECS',
-                                        MetricName='MemoryUtilization',
-                                        Dimensions=[
-                                            {'Name': 'ServiceName', 'Value': service_name},
-                                            {'Name': 'ClusterName', 'Value': cluster_name}
-                                        ],
-                                        StartTime=start_time,
-                                        EndTime=end_time,
-                                        Period=3600,
-                                        Statistics=['Average']
-                                    )
-                                    
-                                    memory_datapoints = memory_response.get('Datapoints', [])
-                                    if memory_datapoints and len(memory_datapoints) > 0:
-                                        # Apenas usar se temos dados reais confirmados
-                                        memory_datapoints.sort(key=lambda x: x['Timestamp'])
-                                        latest_memory = memory_datapoints[-1]['Average']
-                                        # Validar se é um valor real (não zero artificial)
-                                        if latest_memory >= 0:
-                                            service_obj['memory_utilization'] = f"{latest_memory:.1f}%"
-                                            
-                                except Exception as e:
-                                    # Qualquer erro = manter N/A (dados seguros)
-                                    pass
-                            else:
-                                # Serviço não rodando = 0% real
-                                service_obj['cpu_utilization'] = "0.0%"
-                                service_obj['memory_utilization'] = "0.0%"
-                                
-                        except Exception as e:
-                            # Fallback seguro - apenas N/A
-                            service_obj['cpu_utilization'] = "N/A"
-                            service_obj['memory_utilization'] = "N/A"
-                        except Exception as e:
-                            # Apenas dados reais ou N/A
+                        # APENAS DADOS REAIS DO CLOUDWATCH - SEM SIMULAÇÃO
+                        if running_count > 0:
+                            # Inicializar com N/A; valores vêm do GetMetricData em lote abaixo
                             service_obj['cpu_utilization'] = "N/A"
                             service_obj['memory_utilization'] = "N/A"
+                            dimensions = {'ServiceName': service_name, 'ClusterName': cluster_name}
+                            metric_targets.append((service_obj, 'cpu_utilization'))
+                            metric_queries.append(MetricQuery('AWS/ECS', 'CPUUtilization', dimensions))
+                            metric_targets.append((service_obj, 'memory_utilization'))
+                            metric_queries.append(MetricQuery('AWS/ECS', 'MemoryUtilization', dimensions))
+                        else:
+                            # Serviço não rodando = 0% real
+                            service_obj['cpu_utilization'] = "0.0%"
+                            service_obj['memory_utilization'] = "0.0%"
                         
                         all_services.append(service_obj)
                         
@@ -689,6 +726,14 @@ async def get_ecs_services(account_id: int):
                 print(f"Erro processando cluster {cluster_name}: {e}")
                 continue
         
+        # CPU/memória de todos os serviços em poucas chamadas GetMetricData
+        if metric_queries:
+            values = await metric_engine.get_latest(cloudwatch_client, metric_queries, account_id)
+            for (service_obj, field), value in zip(metric_targets, values):
+                # Validar se é um valor real (não zero artificial)
+                if value is not None and value >= 0:
+                    service_obj[field] = f"{value:.1f}%"
+        
         # Calcular estatísticas
         healthy_count = len([s for s in all_services if s['status'] == 'healthy'])
         degraded_count = len([s for s in all_services if s['status'] == 'degraded'])
@@ -739,7 +784,7 @@ async def get_ec2_logs(account_id: int):
 
 @app.get("/api/v1/rds/{account_id}/logs")
 async def get_rds_logs(account_id: int):
-    conn = get_db_connection()
+    conn = await get_db_connection_async()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com banco")
 
@@ -809,109 +854,26 @@ async def redirect_root():
 # === NOVOS ENDPOINTS PARA DESCOBERTA REAL DE RECURSOS AWS ===
 
 @app.post("/api/v1/discovery/trigger")
-async def trigger_discovery():
-    """Trigger manual para descoberta de recursos AWS"""
+async def trigger_discovery(wait: bool = True):
+    """Trigger manual para descoberta de recursos AWS (contas em paralelo)"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Erro de conexão com banco")
+        if not wait:
+            # Rodar em background; acompanhar por /api/v1/discovery/status
+            started = discovery_runner.start()
+            status = discovery_runner.get_status()
+            status["message"] = "Descoberta iniciada" if started else "Descoberta já em andamento"
+            return status
         
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("SELECT * FROM aws_accounts WHERE status = 'active'")
-        accounts = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        summary = await discovery_runner.wait()
         
-        if not accounts:
+        if not summary["accounts_total"]:
             return {"message": "Nenhuma conta ativa encontrada", "resources_found": 0, "alerts_generated": 0}
         
-        total_resources = 0
-        total_alerts = 0
-        
-        for account in accounts:
-            try:
-                # Importar sistema de descoberta
-                from aws_discovery import AWSResourceDiscovery
-                from ai_analysis import AIAnalysisService
-                
-                ai_service = AIAnalysisService()
-                
-                # Descobrir recursos reais da AWS
-                discovery = AWSResourceDiscovery(
-                    account['access_key'],
-                    account['secret_key'],
-                    account['region']
-                )
-                
-                resources = discovery.discover_all_resources()
-                total_resources += len(resources)
-                
-                # Salvar recursos no banco
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                
-                # Limpar recursos antigos desta conta
-                cursor.execute("DELETE FROM aws_resources WHERE account_id = %s", (account['id'],))
-                
-                # Inserir novos recursos
-                for resource in resources:
-                    cursor.execute("""
-                        INSERT INTO aws_resources 
-                        (account_id, resource_type, resource_id, name, status, region, metadata, created_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        account['id'],
-                        resource['resource_type'],
-                        resource['resource_id'],
-                        resource.get('name'),
-                        resource.get('status'),
-                        resource.get('region'),
-                        json.dumps(resource.get('metadata', {})),
-                        resource.get('created_at', datetime.now())
-                    ))
-                
-                # Analisar recursos para gerar alertas
-                for resource in resources:
-                    try:
-                        analysis = ai_service.analyze_resource_health(resource)
-                        
-                        if analysis.get('health_status') in ['warning', 'critical']:
-                            issues = analysis.get('issues', [])
-                            
-                            for issue in issues:
-                                if issue.get('severity') in ['high', 'critical']:
-                                    # Criar alerta
-                                    cursor.execute("""
-                                        INSERT INTO alerts 
-                                        (account_id, resource_id, resource_type, alert_type, severity, title, description, ai_analysis)
-                                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                                    """, (
-                                        account['id'],
-                                        resource['resource_id'],
-                                        resource['resource_type'],
-                                        issue.get('type', 'unknown'),
-                                        issue.get('severity'),
-                                        f"{issue.get('type', 'Issue').title()} - {resource.get('name', 'Unknown Resource')}",
-                                        issue.get('description', 'No description available'),
-                                        json.dumps(analysis)
-                                    ))
-                                    total_alerts += 1
-                    except Exception as e:
-                        print(f"Erro ao analisar recurso {resource.get('resource_id')}: {e}")
-                        continue
-                
-                conn.commit()
-                cursor.close()
-                conn.close()
-                
-            except Exception as e:
-                print(f"Erro ao descobrir recursos da conta {account['name']}: {e}")
-                continue
-        
         return {
-            "message": f"Descoberta executada para {len(accounts)} contas",
-            "resources_found": total_resources,
-            "alerts_generated": total_alerts,
+            "message": f"Descoberta executada para {summary['accounts_total']} contas",
+            "resources_found": summary["resources_found"],
+            "alerts_generated": summary["alerts_generated"],
+            "accounts": summary["accounts"],
             "status": "success"
         }
         
@@ -919,11 +881,16 @@ async def trigger_discovery():
         print(f"Erro na descoberta: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/discovery/status")
+async def get_discovery_status():
+    """Progresso da descoberta: resultado de cada conta assim que ela termina"""
+    return discovery_runner.get_status()
+
 @app.get("/api/v1/resources/discovered")
 async def get_discovered_resources():
     """Lista recursos descobertos pelo sistema real"""
     try:
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -961,7 +928,7 @@ async def get_discovered_resources():
 async def get_real_alerts():
     """Lista alertas reais gerados pelo sistema de descoberta"""
     try:
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1072,6 +1039,7 @@ async def get_real_cloudwatch_alarms():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/alarms/cloudwatch/{account_id}")
+@request_coalescer.coalesce("cloudwatch_alarms")
 async def get_real_cloudwatch_alarms_by_account(account_id: int):
     """Buscar alarmes reais do CloudWatch para uma conta específica"""
     if not real_alarms_service:
@@ -1320,12 +1288,35 @@ async def get_alarms_dashboard():
 
 # Importar health checker
 try:
-    from health_checker import run_health_check
+    from health_checker import HealthCheckScheduler
+    health_scheduler = HealthCheckScheduler(DB_CONFIG)
     health_checker_available = True
 except ImportError as e:
     print(f"Aviso: Health checker não disponível: {e}")
+    health_scheduler = None
     health_checker_available = False
 
+def health_last_check():
+    """Horário do último health check concluído em background"""
+    return health_scheduler.last_checked_at() if health_scheduler else None
+
+@app.on_event("startup")
+async def start_health_scheduler():
+    if health_scheduler:
+        health_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_health_scheduler():
+    if health_scheduler:
+        await health_scheduler.stop()
+
+@app.get("/api/v1/health/status")
+async def get_health_check_status():
+    """Estado do health check em background (intervalos e última execução)"""
+    if not health_checker_available:
+        raise HTTPException(status_code=503, detail="Health checker não disponível")
+    return health_scheduler.get_status()
+
 @app.post("/api/v1/health/check")
 async def run_health_check_endpoint():
     """Executar verificação de saúde em tempo real"""
@@ -1333,7 +1324,7 @@ async def run_health_check_endpoint():
         raise HTTPException(status_code=503, detail="Health checker não disponível")
     
     try:
-        alerts = await run_health_check(DB_CONFIG)
+        alerts = await health_scheduler.run_now()
         return {
             "alerts_found": len(alerts),
             "alerts": alerts,
@@ -1346,14 +1337,10 @@ async def run_health_check_endpoint():
 
 @app.get("/api/v1/alerts/live")
 async def get_live_alerts():
-    """Buscar alertas em tempo real (executa health check primeiro)"""
+    """Buscar alertas em tempo real (resultado do último health check em background)"""
     try:
-        # Executar verificação de saúde primeiro
-        if health_checker_available:
-            await run_health_check(DB_CONFIG)
-        
-        # Buscar alertas atualizados
-        conn = get_db_connection()
+        # Buscar alertas persistidos pelo scheduler
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1389,7 +1376,7 @@ async def get_live_alerts():
             "alerts": alerts,
             "total": len(alerts),
             "status": "success",
-            "last_check": datetime.now().isoformat()
+            "last_check": health_last_check()
         }
         
     except Exception as e:
@@ -1399,13 +1386,9 @@ async def get_live_alerts():
 # Atualizar endpoint de alertas para usar dados reais
 @app.get("/api/v1/alerts/dashboard")
 async def get_alerts_for_dashboard():
-    """Buscar alertas para dashboard (dados reais)"""
+    """Buscar alertas para dashboard (dados reais do último health check)"""
     try:
-        # Executar verificação de saúde se disponível
-        if health_checker_available:
-            await run_health_check(DB_CONFIG)
-        
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1446,7 +1429,8 @@ async def get_alerts_for_dashboard():
         
         return {
             "alerts": alerts,
-            "status": "success"
+            "status": "success",
+            "last_check": health_last_check()
         }
         
     except Exception as e:
@@ -1456,13 +1440,9 @@ async def get_alerts_for_dashboard():
 
 @app.get("/api/v1/accounts/{account_id}/alerts")
 async def get_account_alerts(account_id: int):
-    """Buscar alertas REAIS para uma conta específica"""
+    """Buscar alertas REAIS para uma conta específica (último health check)"""
     try:
-        # Executar verificação de saúde primeiro
-        if health_checker_available:
-            await run_health_check(DB_CONFIG)
-        
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1493,7 +1473,7 @@ async def get_account_alerts(account_id: int):
         
         cursor.close()
         conn.close()
-        return {"alerts": alerts}
+        return {"alerts": alerts, "last_check": health_last_check()}
         
     except Exception as e:
         print(f"Erro ao buscar alertas da conta {account_id}: {e}")
@@ -1504,22 +1484,13 @@ async def get_account_alerts(account_id: int):
 async def force_refresh_alerts():
     """FORÇA refresh dos alertas (sem cache)"""
     try:
-        # LIMPAR todos os alertas antigos primeiro
-        conn = get_db_connection()
-        if conn:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM alerts")
-            conn.commit()
-            conn.close()
-            print("🗑️ Alertas antigos removidos")
-        
-        # Executar verificação de saúde FORÇADA
+        # Executar verificação de saúde FORÇADA (a reconciliação resolve os alertas que sumiram)
         if health_checker_available:
-            alerts = await run_health_check(DB_CONFIG)
+            alerts = await health_scheduler.run_now()
             print(f"✅ {len(alerts)} novos alertas reais detectados")
         
         # Buscar alertas atualizados
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1567,7 +1538,7 @@ async def force_refresh_alerts():
 async def debug_alerts_raw():
     """DEBUG: Ver alertas direto do banco sem health check"""
     try:
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1597,7 +1568,7 @@ async def debug_alerts_raw():
 async def get_alert_details(alert_id: int):
     """Busca detalhes de um alerta específico"""
     try:
-        conn = get_db_connection()
+        conn = await get_db_connection_async()
         if not conn:
             raise HTTPException(status_code=500, detail="Erro de conexão com banco")
         
@@ -1638,68 +1609,75 @@ async def get_alert_details(alert_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar alerta: {str(e)}")
 
+async def load_alert_context(alert_id: int):
+    """Buscar o alerta e a conta AWS dele (404 se algum não existir)"""
+    conn = await get_db_connection_async()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Erro de conexão com banco")
+    
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    
+    # Buscar alerta específico
+    cursor.execute("SELECT * FROM alerts WHERE id = %s", (alert_id,))
+    alert = cursor.fetchone()
+    
+    if not alert:
+        cursor.close()
+        conn.close()
+        raise HTTPException(status_code=404, detail="Alerta não encontrado")
+    
+    # Buscar conta AWS
+    cursor.execute("SELECT * FROM accounts WHERE id = %s", (alert['account_id'],))
+    account = cursor.fetchone()
+    
+    cursor.close()
+    conn.close()
+    
+    if not account:
+        raise HTTPException(status_code=404, detail="Conta AWS não encontrada")
+    
+    return alert, account
+
+async def run_alert_analysis(session, alert, account, stream: Optional[AnalysisStream] = None):
+    """Análise específica por tipo de recurso (``stream`` recebe progresso e tokens)"""
+    if alert['resource_type'] == 'ECS_Service':
+        return await analyze_ecs_service_with_ai(session, alert, account, stream)
+    elif alert['resource_type'] == 'TargetGroup':
+        return await analyze_target_group_with_ai(session, alert, account, stream)
+    elif alert['resource_type'] == 'EC2':
+        return await analyze_ec2_with_ai(session, alert, account)
+    elif alert['resource_type'] == 'RDS':
+        return await analyze_rds_with_ai(session, alert, account)
+    else:
+        return await analyze_generic_with_ai(session, alert, account)
+
+async def save_alert_analysis(alert_id: int, analysis_result: Dict[str, Any]):
+    """Salvar a análise no alerta"""
+    conn = await get_db_connection_async()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        "UPDATE alerts SET ai_analysis = %s WHERE id = %s",
+        (json.dumps(analysis_result), alert_id)
+    )
+    
+    conn.commit()
+    cursor.close()
+    conn.close()
+
 @app.post("/api/v1/alerts/{alert_id}/analyze")
 async def analyze_alert_with_ai(alert_id: int):
     """Análise inteligente de alerta usando AWS Bedrock + CloudWatch Logs"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Erro de conexão com banco")
+        alert, account = await load_alert_context(alert_id)
         
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Buscar alerta específico
-        cursor.execute("SELECT * FROM alerts WHERE id = %s", (alert_id,))
-        alert = cursor.fetchone()
-        
-        if not alert:
-            raise HTTPException(status_code=404, detail="Alerta não encontrado")
-        
-        # Buscar conta AWS
-        cursor.execute("SELECT * FROM accounts WHERE id = %s", (alert['account_id'],))
-        account = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
-        if not account:
-            raise HTTPException(status_code=404, detail="Conta AWS não encontrada")
+        # Sessão AWS compartilhada da conta (clientes reutilizados)
+        session = aws_clients.for_account(account)
         
-        # Inicializar cliente AWS
-        import boto3
-        
-        session = boto3.Session(
-            aws_access_key_id=account['access_key'],
-            aws_secret_access_key=account['secret_key'],
-            region_name=account['region']
-        )
-        
-        # Análise específica por tipo de recurso
-        analysis_result = {}
-        
-        if alert['resource_type'] == 'ECS_Service':
-            analysis_result = await analyze_ecs_service_with_ai(session, alert, account)
-        elif alert['resource_type'] == 'TargetGroup':
-            analysis_result = await analyze_target_group_with_ai(session, alert, account)
-        elif alert['resource_type'] == 'EC2':
-            analysis_result = await analyze_ec2_with_ai(session, alert, account)
-        elif alert['resource_type'] == 'RDS':
-            analysis_result = await analyze_rds_with_ai(session, alert, account)
-        else:
-            analysis_result = await analyze_generic_with_ai(session, alert, account)
+        analysis_result = await run_alert_analysis(session, alert, account)
         
         # Salvar análise no banco
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE alerts SET ai_analysis = %s WHERE id = %s",
-            (json.dumps(analysis_result), alert_id)
-        )
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        await save_alert_analysis(alert_id, analysis_result)
         
         return {
             "alert_id": alert_id,
@@ -1710,11 +1688,53 @@ async def analyze_alert_with_ai(alert_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na análise: {str(e)}")
 
-async def analyze_ecs_service_with_ai(session, alert, account):
+@app.post("/api/v1/alerts/{alert_id}/analyze/stream")
+async def analyze_alert_with_ai_stream(alert_id: int):
+    """
+    Análise de alerta em streaming (Server-Sent Events)
+    
+    Eventos: started, progress (uma fonte de evidência concluída), token (trecho
+    gerado pelo Bedrock), result (análise persistida, mesmo payload do endpoint
+    /analyze) ou error.
+    """
+    try:
+        alert, account = await load_alert_context(alert_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na análise: {str(e)}")
+    
+    session = aws_clients.for_account(account)
+    stream = AnalysisStream()
+    
+    async def finalize(analysis_result):
+        await save_alert_analysis(alert_id, analysis_result)
+        return {
+            "alert_id": alert_id,
+            "analysis": analysis_result,
+            "status": "completed"
+        }
+    
+    return StreamingResponse(
+        stream.run(
+            lambda: run_alert_analysis(session, alert, account, stream),
+            finalize,
+            started={
+                "alert_id": alert_id,
+                "resource_type": alert['resource_type'],
+                "resource_id": alert['resource_id']
+            }
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+async def analyze_ecs_service_with_ai(session, alert, account, stream=None):
     """Análise específica para ECS Service"""
+    progress = progress_callback(stream)
     try:
-        ecs = session.client('ecs')
-        logs = session.client('logs')
+        ecs = aws_async.wrap(session.client('ecs'), account['id'])
+        logs = aws_async.wrap(session.client('logs'), account['id'])
         bedrock = session.client('bedrock-runtime', region_name='us-east-2')
         
         # Extrair informações do ARN
@@ -1723,21 +1743,24 @@ async def analyze_ecs_service_with_ai(session, alert, account):
         cluster_name = service_arn.split('/')[-2]
         
         # 1. Buscar detalhes do serviço
-        service_details = ecs.describe_services(
+        service_details = await ecs.describe_services(
             cluster=cluster_name,
             services=[service_name]
         )
         
         service = service_details['services'][0]
         task_definition_arn = service['taskDefinition']
+        progress('ecs_service', desired_count=service.get('desiredCount', 0),
+                 running_count=service.get('runningCount', 0))
         
         # 2. Buscar task definition
-        task_def = ecs.describe_task_definition(
+        task_def = await ecs.describe_task_definition(
             taskDefinition=task_definition_arn
         )
+        progress('task_definition', containers=len(task_def['taskDefinition']['containerDefinitions']))
         
         # 3. Buscar tasks que falharam
-        failed_tasks = ecs.list_tasks(
+        failed_tasks = await ecs.list_tasks(
             cluster=cluster_name,
             serviceName=service_name,
             desiredStatus='STOPPED'
@@ -1745,7 +1768,7 @@ async def analyze_ecs_service_with_ai(session, alert, account):
         
         task_failures = []
         if failed_tasks['taskArns']:
-            task_details = ecs.describe_tasks(
+            task_details = await ecs.describe_tasks(
                 cluster=cluster_name,
                 tasks=failed_tasks['taskArns'][:5]  # Últimas 5 tasks
             )
@@ -1767,6 +1790,8 @@ async def analyze_ecs_service_with_ai(session, alert, account):
                         ]
                     })
         
+        progress('stopped_tasks', failures=len(task_failures))
+        
         # 4. Buscar logs do CloudWatch
         log_group_name = None
         container_logs = []
@@ -1786,7 +1811,7 @@ async def analyze_ecs_service_with_ai(session, alert, account):
                             
                             # Primeiro listar streams disponíveis
                             try:
-                                streams_response = logs.describe_log_streams(
+                                streams_response = await logs.describe_log_streams(
                                     logGroupName=log_group_name,
                                     orderBy="LastEventTime",
                                     descending=True,
@@ -1795,18 +1820,18 @@ async def analyze_ecs_service_with_ai(session, alert, account):
                                 
                                 # Buscar logs dos streams mais recentes
                                 log_events = {"events": []}
-                                for stream in streams_response.get("logStreams", [])[:3]:  # Máximo 3 streams
+                                for log_stream in streams_response.get("logStreams", [])[:3]:  # Máximo 3 streams
                                     try:
-                                        stream_events = logs.get_log_events(
+                                        stream_events = await logs.get_log_events(
                                             logGroupName=log_group_name,
-                                            logStreamName=stream["logStreamName"],
+                                            logStreamName=log_stream["logStreamName"],
                                             startTime=start_time,
                                             endTime=end_time,
                                             limit=50
                                         )
                                         log_events["events"].extend(stream_events["events"])
                                     except Exception as e:
-                                        print(f"Erro ao buscar logs do stream {stream.get('logStreamName', 'unknown')}: {e}")
+                                        print(f"Erro ao buscar logs do stream {log_stream.get('logStreamName', 'unknown')}: {e}")
                                         continue
                             except Exception as e:
                                 print(f"Erro ao listar log streams para {log_group_name}: {e}")
@@ -1823,12 +1848,16 @@ async def analyze_ecs_service_with_ai(session, alert, account):
                                     for event in log_events['events'][-20:]  # Últimas 20 linhas
                                 ]
                             })
+                            progress('cloudwatch_logs', container=container_def['name'],
+                                     log_group=log_group_name, events=len(log_events['events']))
                         except Exception as log_error:
                             container_logs.append({
                                 'container': container_def['name'],
                                 'log_group': log_group_name,
                                 'error': str(log_error)
                             })
+                            progress('cloudwatch_logs', status='error', container=container_def['name'],
+                                     log_group=log_group_name, error=str(log_error))
         
         # 5. Preparar contexto para IA
         ai_context = f"""
@@ -1878,23 +1907,13 @@ async def analyze_ecs_service_with_ai(session, alert, account):
         """
         
         try:
-            response = bedrock.invoke_model(
-                modelId='us.anthropic.claude-3-5-haiku-20241022-v1:0',
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 2000,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ]
-                })
+            progress('bedrock', status='running')
+            ai_analysis = await bedrock_async.invoke_text(
+                'us.anthropic.claude-3-5-haiku-20241022-v1:0', prompt, max_tokens=2000,
+                client=bedrock, account_key=account['id'],
+                on_token=stream.token if stream else None
             )
             
-            response_body = json.loads(response['body'].read())
-            ai_analysis = response_body['content'][0]['text']
-            
         except Exception as bedrock_error:
             ai_analysis = f"Erro ao conectar com Bedrock: {str(bedrock_error)}"
         
@@ -1928,167 +1947,231 @@ async def analyze_ecs_service_with_ai(session, alert, account):
             "status": "failed"
         }
 
-async def analyze_target_group_with_ai(session, alert, account):
+async def analyze_target_group_with_ai(session, alert, account, stream=None):
     """Análise específica para Target Group"""
+    progress = progress_callback(stream)
     try:
-        elbv2 = session.client('elbv2')
-        ec2 = session.client('ec2')
+        elbv2 = aws_async.wrap(session.client('elbv2'), account['id'])
+        ec2 = aws_async.wrap(session.client('ec2'), account['id'])
         bedrock = session.client('bedrock-runtime', region_name='us-east-2')
         
         # Extrair ARN do target group
         tg_arn = alert['resource_id']
         
         # 1. Buscar detalhes do Target Group
-        tg_details = elbv2.describe_target_groups(
+        tg_details = await elbv2.describe_target_groups(
             TargetGroupArns=[tg_arn]
         )
         
         target_group = tg_details['TargetGroups'][0]
+        progress('target_group', target_type=target_group.get('TargetType'))
         
         # 2. Buscar targets e saúde
-        targets_health = elbv2.describe_target_health(
+        targets_health = await elbv2.describe_target_health(
             TargetGroupArn=tg_arn
         )
+        progress('target_health', targets=len(targets_health['TargetHealthDescriptions']),
+                 unhealthy=sum(1 for t in targets_health['TargetHealthDescriptions']
+                               if t['TargetHealth']['State'] != 'healthy'))
         
         # 3. DESCOBRIR SERVIÇOS ECS ASSOCIADOS
-        ecs = session.client('ecs')
-        logs = session.client('logs')
+        ecs = aws_async.wrap(session.client('ecs'), account['id'])
+        logs = aws_async.wrap(session.client('logs'), account['id'])
         ecs_services = []
         
         try:
+            # Serviços atrás do target group: uma consulta no índice reverso
+            tg_services = await tg_index.resolve(ecs, account['id'], tg_arn, target_group.get('TargetType'))
             
-            clusters_response = ecs.list_clusters()
-            
-            
-            for cluster_arn in clusters_response['clusterArns']:
-                cluster_name = cluster_arn.split('/')[-1]
-                services_response = ecs.list_services(cluster=cluster_name)
+            for cluster_name, service in tg_services:
+                service_name = service['serviceName']
+                service_arn = service['serviceArn']
+                
+                # Buscar tasks paradas
+                stopped_tasks = await ecs.list_tasks(
+                    cluster=cluster_name,
+                    serviceName=service_name,
+                    desiredStatus='STOPPED'
+                )
                 
-                for service_arn in services_response['serviceArns']:
-                    service_name = service_arn.split('/')[-1]
-                    service_details = ecs.describe_services(
+                task_failures = []
+                for task_arn in stopped_tasks['taskArns'][:3]:
+                    task_details = await ecs.describe_tasks(
                         cluster=cluster_name,
-                        services=[service_name]
+                        tasks=[task_arn]
                     )
                     
-                    service = service_details['services'][0]
+                    task = task_details['tasks'][0]
+                    failure_info = {
+                        'task_arn': task_arn,
+                        'stopped_reason': task.get('stoppedReason', 'Unknown'),
+                        'stopped_at': task.get('stoppedAt').isoformat() if task.get('stoppedAt') else None,
+                        'containers': []
+                    }
+                    
+                    for container in task.get('containers', []):
+                        failure_info['containers'].append({
+                            'name': container['name'],
+                            'exit_code': container.get('exitCode'),
+                            'reason': container.get('reason', '')
+                        })
                     
-                    for load_balancer in service.get('loadBalancers', []):
+                    task_failures.append(failure_info)
+                
+                # Capturar logs dos containers
+                task_def = await ecs.describe_task_definition(
+                    taskDefinition=service['taskDefinition']
+                )
+                
+                container_logs = []
+                for container_def in task_def['taskDefinition']['containerDefinitions']:
+                    log_config = container_def.get('logConfiguration', {})
+                    
+                    if log_config.get('logDriver') == 'awslogs':
+                        log_group_name = log_config['options']['awslogs-group']
                         
-                        if load_balancer.get('targetGroupArn') == tg_arn:
-                            
+                        try:
+                            import time
+                            end_time = int(time.time() * 1000)
+                            start_time = end_time - (2 * 60 * 60 * 1000)
                             
-                            # Buscar tasks paradas
-                            stopped_tasks = ecs.list_tasks(
-                                cluster=cluster_name,
-                                serviceName=service_name,
-                                desiredStatus='STOPPED'
+                            streams_response = await logs.describe_log_streams(
+                                logGroupName=log_group_name,
+                                orderBy="LastEventTime",
+                                descending=True,
+                                limit=3
                             )
                             
-                            task_failures = []
-                            for task_arn in stopped_tasks['taskArns'][:3]:
-                                task_details = ecs.describe_tasks(
-                                    cluster=cluster_name,
-                                    tasks=[task_arn]
-                                )
-                                
-                                task = task_details['tasks'][0]
-                                failure_info = {
-                                    'task_arn': task_arn,
-                                    'stopped_reason': task.get('stoppedReason', 'Unknown'),
-                                    'stopped_at': task.get('stoppedAt').isoformat() if task.get('stoppedAt') else None,
-                                    'containers': []
-                                }
-                                
-                                for container in task.get('containers', []):
-                                    failure_info['containers'].append({
-                                        'name': container['name'],
-                                        'exit_code': container.get('exitCode'),
-                                        'reason': container.get('reason', '')
-                                    })
-                                
-                                task_failures.append(failure_info)
-                            
-                            # Capturar logs dos containers
-                            task_def = ecs.describe_task_definition(
-                                taskDefinition=service['taskDefinition']
-                            )
+                            recent_logs = []
+                            for log_stream in streams_response.get("logStreams", []):
+                                try:
+                                    stream_events = await logs.get_log_events(
+                                        logGroupName=log_group_name,
+                                        logStreamName=log_stream["logStreamName"],
+                                        startTime=start_time,
+                                        endTime=end_time,
+                                        limit=20
+                                    )
+                                    recent_logs.extend(stream_events["events"])
+                                except:
+                                    continue
                             
-                            container_logs = []
-                            for container_def in task_def['taskDefinition']['containerDefinitions']:
-                                log_config = container_def.get('logConfiguration', {})
-                                
-                                if log_config.get('logDriver') == 'awslogs':
-                                    log_group_name = log_config['options']['awslogs-group']
-                                    
-                                    try:
-                                        import time
-                                        end_time = int(time.time() * 1000)
-                                        start_time = end_time - (2 * 60 * 60 * 1000)
-                                        
-                                        streams_response = logs.describe_log_streams(
-                                            logGroupName=log_group_name,
-                                            orderBy="LastEventTime",
-                                            descending=True,
-                                            limit=3
-                                        )
-                                        
-                                        recent_logs = []
-                                        for stream in streams_response.get("logStreams", []):
-                                            try:
-                                                stream_events = logs.get_log_events(
-                                                    logGroupName=log_group_name,
-                                                    logStreamName=stream["logStreamName"],
-                                                    startTime=start_time,
-                                                    endTime=end_time,
-                                                    limit=20
-                                                )
-                                                recent_logs.extend(stream_events["events"])
-                                            except:
-                                                continue
-                                        
-                                        recent_logs.sort(key=lambda x: x['timestamp'], reverse=True)
-                                        
-                                        container_logs.append({
-                                            'container': container_def['name'],
-                                            'log_group': log_group_name,
-                                            'recent_logs': recent_logs[:15]
-                                        })
-                                        
-                                    except Exception as e:
-                                        print(f"Erro ao capturar logs: {e}")
+                            recent_logs.sort(key=lambda x: x['timestamp'], reverse=True)
                             
-                            ecs_services.append({
-                                'cluster_name': cluster_name,
-                                'service_name': service_name,
-                                'service_arn': service_arn,
-                                'desired_count': service['desiredCount'],
-                                'running_count': service['runningCount'],
-                                'pending_count': service['pendingCount'],
-                                'task_failures': task_failures,
-                                'container_logs': container_logs
+                            container_logs.append({
+                                'container': container_def['name'],
+                                'log_group': log_group_name,
+                                'recent_logs': recent_logs[:15]
                             })
                             
+                        except Exception as e:
+                            print(f"Erro ao capturar logs: {e}")
+                
+                ecs_services.append({
+                    'cluster_name': cluster_name,
+                    'service_name': service_name,
+                    'service_arn': service_arn,
+                    'desired_count': service['desiredCount'],
+                    'running_count': service['runningCount'],
+                    'pending_count': service['pendingCount'],
+                    'task_failures': task_failures,
+                    'container_logs': container_logs
+                })
+                
         except Exception as e:
             print(f"Erro ao descobrir serviços ECS: {e}")
+        progress('ecs_services', services=len(ecs_services))
         
         # 3.5. DESCOBRIR E ANALISAR INSTÂNCIAS EC2 NO TARGET GROUP
-        ec2 = session.client('ec2')
-        ssm = session.client('ssm')
+        ec2 = aws_async.wrap(session.client('ec2'), account['id'])
+        ssm = aws_async.wrap(session.client('ssm'), account['id'])
         ec2_instances = []
         
         try:
-            # Verificar se há targets EC2 no Target Group
-            for target_health in targets_health['TargetHealthDescriptions']:
-                target = target_health['Target']
+            # Verificar se há targets EC2 no Target Group (não IPs)
+            ec2_targets = [
+                target_health for target_health in targets_health['TargetHealthDescriptions']
+                if target_health['Target']['Id'].startswith('i-')
+            ]
+            instance_ids = list(dict.fromkeys(t['Target']['Id'] for t in ec2_targets))
+            
+            if instance_ids:
+                # Buscar detalhes de todas as instâncias de uma vez
+                ec2_response = await ec2.describe_instances(InstanceIds=instance_ids)
+                instances = {
+                    instance['InstanceId']: instance
+                    for reservation in ec2_response['Reservations']
+                    for instance in reservation['Instances']
+                }
+                
+                # Verificar quais instâncias estão disponíveis para SSM
+                ssm_available = set()
+                try:
+                    ssm_pages = await ssm.paginate(
+                        'describe_instance_information',
+                        Filters=[{'Key': 'InstanceIds', 'Values': instance_ids}]
+                    )
+                    for page in ssm_pages:
+                        for info in page['InstanceInformationList']:
+                            ssm_available.add(info['InstanceId'])
+                except Exception as ssm_error:
+                    print(f"Erro SSM ao listar instâncias: {ssm_error}")
                 
-                # Se o target é uma instância EC2 (não um IP)
-                if target['Id'].startswith('i-'):
-                    instance_id = target['Id']
+                # CONECTAR VIA SSM E CAPTURAR DADOS: um comando para todas as instâncias
+                ssm_ids = [instance_id for instance_id in instance_ids if instance_id in ssm_available]
+                # Targets podem usar portas diferentes: um comando de verificação por porta
+                ports = {}
+                for target_health in ec2_targets:
+                    if target_health['Target']['Id'] in ssm_available:
+                        ports.setdefault(target_health['Target']['Port'], []).append(target_health['Target']['Id'])
+                
+                # Resultados da verificação de porta por (instância, porta): uma instância
+                # pode atender a mais de uma porta do Target Group
+                port_results, logs_results = {}, {}
+                if ssm_ids:
+                    print(f"🔗 Conectando em {len(ssm_ids)} instâncias via SSM...")
+                    results = await asyncio.gather(
+                        # 2. Capturar logs da aplicação (tentar várias localizações comuns)
+                        ssm_diagnostics.run(ssm, ssm_ids, [
+                            'sudo tail -n 50 /var/log/application.log 2>/dev/null || echo "No application.log"',
+                            'sudo tail -n 50 /var/log/nginx/error.log 2>/dev/null || echo "No nginx error.log"',
+                            'sudo tail -n 50 /var/log/apache2/error.log 2>/dev/null || echo "No apache error.log"',
+                            'sudo journalctl -u nginx -n 20 --no-pager 2>/dev/null || echo "No nginx service logs"',
+                            'sudo find /var/log -name "*.log" -mtime -1 -exec tail -n 10 {} \\; 2>/dev/null | head -n 100',
+                            'sudo dmesg | tail -n 20'
+                        ]),
+                        # 1. Verificar serviço na porta do Target Group
+                        *[
+                            ssm_diagnostics.run(ssm, list(dict.fromkeys(port_ids)), [
+                                f'sudo netstat -tulpn | grep :{port}',
+                                f'curl -s -m 5 http://localhost:{port}/health || echo "Health endpoint failed"',
+                                'ps aux | grep -E "(node|python|java|nginx)" | grep -v grep',
+                                'systemctl status nginx || systemctl status apache2 || echo "No web server"',
+                                'df -h /',
+                                'free -m',
+                                'uptime'
+                            ])
+                            for port, port_ids in ports.items()
+                        ],
+                        return_exceptions=True
+                    )
                     
-                    # Buscar detalhes da instância
-                    ec2_response = ec2.describe_instances(InstanceIds=[instance_id])
-                    instance = ec2_response['Reservations'][0]['Instances'][0]
+                    if isinstance(results[0], Exception):
+                        print(f"Erro SSM ao capturar logs: {results[0]}")
+                    else:
+                        logs_results = results[0]
+                    for (port, port_ids), result in zip(ports.items(), results[1:]):
+                        if isinstance(result, Exception):
+                            print(f"Erro SSM na porta {port}: {result}")
+                            result = {instance_id: {'error': f'Erro SSM: {result}'} for instance_id in port_ids}
+                        for instance_id, instance_result in result.items():
+                            port_results[(instance_id, port)] = instance_result
+                
+                for target_health in ec2_targets:
+                    instance_id = target_health['Target']['Id']
+                    instance = instances.get(instance_id)
+                    if not instance:
+                        continue
                     
                     # Preparar dados da instância
                     instance_data = {
@@ -2097,137 +2180,79 @@ async def analyze_target_group_with_ai(session, alert, account):
                         'private_ip': instance.get('PrivateIpAddress'),
                         'public_ip': instance.get('PublicIpAddress'),
                         'instance_type': instance['InstanceType'],
+                        'port': target_health['Target'].get('Port'),
                         'target_health': target_health['TargetHealth']['State'],
                         'health_description': target_health['TargetHealth'].get('Description', ''),
                         'application_logs': [],
                         'system_status': {}
                     }
                     
-                    # CONECTAR VIA SSM E CAPTURAR DADOS
-                    try:
-                        # Verificar se a instância está disponível para SSM
-                        ssm_instances = ssm.describe_instance_information(
-                            Filters=[{'Key': 'InstanceIds', 'Values': [instance_id]}]
-                        )
+                    if instance_id not in ssm_available:
+                        instance_data['system_status'] = {'error': 'Instância não disponível via SSM'}
+                        ec2_instances.append(instance_data)
+                        continue
+                    
+                    command_result = port_results.get((instance_id, target_health['Target']['Port']), {})
+                    if 'error' in command_result:
+                        instance_data['system_status'] = {'error': command_result['error']}
+                    elif command_result.get('success'):
+                        instance_data['system_status'] = {
+                            'port_check': command_result.get('stdout') or 'No output',
+                            'error_output': command_result.get('stderr', ''),
+                            'command_success': True,
+                            'ssm_status': 'success'
+                        }
+                    else:
+                        instance_data['system_status'] = {
+                            'port_check': command_result.get('stdout', ''),
+                            'error': command_result.get('stderr') or 'Command failed',
+                            'status': command_result.get('status', 'Unknown'),
+                            'command_success': False,
+                            'ssm_status': 'partial' if command_result.get('partial') else 'failed'
+                        }
+                    
+                    logs_result = logs_results.get(instance_id, {})
+                    logs_output = logs_result.get('stdout', '')
+                    if logs_result.get('success') or (logs_result.get('partial') and logs_output):
+                        # Dividir em linhas e filtrar logs relevantes
+                        log_lines = logs_output.split('\n')
                         
-                        if ssm_instances['InstanceInformationList']:
-                            print(f"🔗 Conectando na instância {instance_id} via SSM...")
-                            
-                            # 1. Verificar serviço na porta do Target Group
-                            port_check_command = ssm.send_command(
-                                InstanceIds=[instance_id],
-                                DocumentName="AWS-RunShellScript",
-                                Parameters={
-                                    'commands': [
-                                        f'sudo netstat -tulpn | grep :{target["Port"]}',
-                                        f'curl -s -m 5 http://localhost:{target["Port"]}/health || echo "Health endpoint failed"',
-                                        'ps aux | grep -E "(node|python|java|nginx)" | grep -v grep',
-                                        'systemctl status nginx || systemctl status apache2 || echo "No web server"',
-                                        'df -h /',
-                                        'free -m',
-                                        'uptime'
-                                    ]
-                                }
-                            )
-                            
-                            # Aguardar comando e buscar resultado
-                            command_id = port_check_command['Command']['CommandId']
-                            import time
-                            time.sleep(3)
-                            
-                            command_result = ssm.get_command_invocation(
-                                CommandId=command_id,
-                                InstanceId=instance_id
-                            )
-                            
-                            if command_result.get('Status') == 'Success':
-                                system_output = command_result.get('StandardOutput', 'No output')
-                                error_output = command_result.get('StandardErrorContent', '')
-                                instance_data['system_status'] = {
-                                    'port_check': system_output,
-                                    'error_output': error_output,
-                                    'command_success': True,
-                                    'ssm_status': 'success'
-                                }
-                            else:
-                                instance_data['system_status'] = {
-                                    'error': command_result.get('StandardErrorContent', 'Command failed'),
-                                    'status': command_result.get('Status', 'Unknown'),
-                                    'command_success': False,
-                                    'ssm_status': 'failed'
-                                }
-                            
-                            # 2. Capturar logs da aplicação (tentar várias localizações comuns)
-                            logs_command = ssm.send_command(
-                                InstanceIds=[instance_id],
-                                DocumentName="AWS-RunShellScript",
-                                Parameters={
-                                    'commands': [
-                                        'sudo tail -n 50 /var/log/application.log 2>/dev/null || echo "No application.log"',
-                                        'sudo tail -n 50 /var/log/nginx/error.log 2>/dev/null || echo "No nginx error.log"',
-                                        'sudo tail -n 50 /var/log/apache2/error.log 2>/dev/null || echo "No apache error.log"',
-                                        'sudo journalctl -u nginx -n 20 --no-pager 2>/dev/null || echo "No nginx service logs"',
-                                        'sudo find /var/log -name "*.log" -mtime -1 -exec tail -n 10 {} \; 2>/dev/null | head -n 100',
-                                        'sudo dmesg | tail -n 20'
-                                    ]
-                                }
-                            )
-                            
-                            # Aguardar e buscar logs
-                            logs_command_id = logs_command['Command']['CommandId']
-                            time.sleep(3)
-                            
-                            logs_result = ssm.get_command_invocation(
-                                CommandId=logs_command_id,
-                                InstanceId=instance_id
-                            )
-                            
-                            if logs_result.get('Status') == 'Success':
-                                logs_output = logs_result.get('StandardOutput', '')
-                                # Dividir em linhas e filtrar logs relevantes
-                                log_lines = logs_output.split('\n')
-                                
-                                # Filtrar logs de erro e informativos
-                                error_logs = [line for line in log_lines if line.strip() and 
-                                            any(keyword in line.lower() for keyword in ['error', 'fail', 'exception', 'critical'])]
-                                
-                                # Se não há logs de erro, pegar logs gerais
-                                if not error_logs:
-                                    general_logs = [line for line in log_lines if line.strip() and len(line) > 10][:10]
-                                    instance_data['application_logs'] = general_logs
-                                else:
-                                    instance_data['application_logs'] = error_logs[:15]
-                                
-                                # Adicionar resumo dos logs
-                                instance_data['logs_summary'] = {
-                                    'total_lines': len(log_lines),
-                                    'error_lines': len(error_logs),
-                                    'logs_captured': len(instance_data['application_logs'])
-                                }
-                            else:
-                                instance_data['application_logs'] = [f"Erro ao capturar logs: {logs_result.get('StandardErrorContent', 'Command failed')}"]
-                                instance_data['logs_summary'] = {'error': True}
+                        # Filtrar logs de erro e informativos
+                        error_logs = [line for line in log_lines if line.strip() and 
+                                    any(keyword in line.lower() for keyword in ['error', 'fail', 'exception', 'critical'])]
                         
+                        # Se não há logs de erro, pegar logs gerais
+                        if not error_logs:
+                            general_logs = [line for line in log_lines if line.strip() and len(line) > 10][:10]
+                            instance_data['application_logs'] = general_logs
                         else:
-                            instance_data['system_status'] = {'error': 'Instância não disponível via SSM'}
-                            
-                    except Exception as ssm_error:
-                        print(f"Erro SSM na instância {instance_id}: {ssm_error}")
-                        instance_data['system_status'] = {'error': f'Erro SSM: {str(ssm_error)}'}
+                            instance_data['application_logs'] = error_logs[:15]
+                        
+                        # Adicionar resumo dos logs
+                        instance_data['logs_summary'] = {
+                            'total_lines': len(log_lines),
+                            'error_lines': len(error_logs),
+                            'logs_captured': len(instance_data['application_logs']),
+                            'partial': bool(logs_result.get('partial'))
+                        }
+                    else:
+                        instance_data['application_logs'] = [f"Erro ao capturar logs: {logs_result.get('stderr') or 'Command failed'}"]
+                        instance_data['logs_summary'] = {'error': True}
                     
                     ec2_instances.append(instance_data)
                     
         except Exception as e:
             print(f"Erro ao descobrir instâncias EC2: {e}")
+        progress('ec2_instances', instances=len(ec2_instances))
         
         # 4. Buscar Load Balancers associados
-        lbs = elbv2.describe_load_balancers()
+        lbs = await elbv2.describe_load_balancers()
         associated_lbs = []
         
         for lb in lbs['LoadBalancers']:
-            listeners = elbv2.describe_listeners(LoadBalancerArn=lb['LoadBalancerArn'])
+            listeners = await elbv2.describe_listeners(LoadBalancerArn=lb['LoadBalancerArn'])
             for listener in listeners['Listeners']:
-                rules = elbv2.describe_rules(ListenerArn=listener['ListenerArn'])
+                rules = await elbv2.describe_rules(ListenerArn=listener['ListenerArn'])
                 for rule in rules['Rules']:
                     for action in rule['Actions']:
                         if action.get('TargetGroupArn') == tg_arn:
@@ -2239,6 +2264,8 @@ async def analyze_target_group_with_ai(session, alert, account):
                                 'listener_protocol': listener['Protocol']
                             })
         
+        progress('load_balancers', associated=len(associated_lbs))
+        
         # 4. Análise das targets
         target_analysis = []
         for target_health in targets_health['TargetHealthDescriptions']:
@@ -2256,7 +2283,7 @@ async def analyze_target_group_with_ai(session, alert, account):
             # Se for EC2, buscar mais detalhes
             if target['Id'].startswith('i-'):
                 try:
-                    ec2_details = ec2.describe_instances(InstanceIds=[target['Id']])
+                    ec2_details = await ec2.describe_instances(InstanceIds=[target['Id']])
                     if ec2_details['Reservations']:
                         instance = ec2_details['Reservations'][0]['Instances'][0]
                         target_info['instance_state'] = instance['State']['Name']
@@ -2267,6 +2294,7 @@ async def analyze_target_group_with_ai(session, alert, account):
                     pass
             
             target_analysis.append(target_info)
+        progress('targets', targets=len(target_analysis))
         
         # 5. Preparar contexto para IA
         ai_context = f"""
@@ -2325,23 +2353,13 @@ async def analyze_target_group_with_ai(session, alert, account):
         """
         
         try:
-            response = bedrock.invoke_model(
-                modelId='us.anthropic.claude-3-5-haiku-20241022-v1:0',
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 2000,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ]
-                })
+            progress('bedrock', status='running')
+            ai_analysis = await bedrock_async.invoke_text(
+                'us.anthropic.claude-3-5-haiku-20241022-v1:0', prompt, max_tokens=2000,
+                client=bedrock, account_key=account['id'],
+                on_token=stream.token if stream else None
             )
             
-            response_body = json.loads(response['body'].read())
-            ai_analysis = response_body['content'][0]['text']
-            
         except Exception as bedrock_error:
             ai_analysis = f"Erro ao conectar com Bedrock: {str(bedrock_error)}"
         
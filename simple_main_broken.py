@@ -544,7 +544,7 @@ async def trigger_discovery():
                 # Analisar recursos para gerar alertas
                 for resource in resources:
                     try:
-                        analysis = ai_service.analyze_resource_health(resource)
+                        analysis = await ai_service.analyze_resource_health(resource)
                         
                         if analysis.get('health_status') in ['warning', 'critical']:
                             issues = analysis.get('issues', [])
@@ -0,0 +1,84 @@
+"""
+AWSNoc IA IA - Testes da análise de alertas
+Análise de ECS Service com log streams e streaming de tokens (sem AWS real)
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('boto3')
+pytest.importorskip('psycopg2')
+
+import simple_main
+from services.analysis_stream import AnalysisStream
+
+
+class FakeECS:
+    def describe_services(self, cluster, services):
+        return {'services': [{'taskDefinition': 'arn:aws:ecs:us-east-1:1:task-definition/api:1',
+                              'desiredCount': 2, 'runningCount': 1, 'pendingCount': 0}]}
+
+    def describe_task_definition(self, taskDefinition):
+        return {'taskDefinition': {'containerDefinitions': [{
+            'name': 'api',
+            'image': 'api:latest',
+            'logConfiguration': {'logDriver': 'awslogs', 'options': {'awslogs-group': '/ecs/api'}}
+        }]}}
+
+    def list_tasks(self, cluster, serviceName, desiredStatus):
+        return {'taskArns': []}
+
+
+class FakeLogs:
+    def describe_log_streams(self, **kwargs):
+        return {'logStreams': [{'logStreamName': 'ecs/api/1'}, {'logStreamName': 'ecs/api/2'}]}
+
+    def get_log_events(self, logGroupName, logStreamName, **kwargs):
+        return {'events': [{'timestamp': 1, 'message': f'ERROR em {logStreamName}'}]}
+
+
+class FakeSession:
+    def client(self, service_name, **kwargs):
+        return {'ecs': FakeECS(), 'logs': FakeLogs()}.get(service_name, object())
+
+
+def _alert():
+    return {
+        'title': 'ECS Service com tasks paradas',
+        'description': 'runningCount abaixo do desiredCount',
+        'resource_id': 'arn:aws:ecs:us-east-1:1:service/cluster-a/api'
+    }
+
+
+async def _fake_invoke_text(model_id, prompt, max_tokens=None, client=None,
+                            account_key=None, on_token=None):
+    for text in ('Causa ', 'raiz'):
+        if on_token is not None:
+            on_token(text)
+    return 'Causa raiz'
+
+
+def test_ecs_analysis_with_log_streams_streams_tokens(monkeypatch):
+    monkeypatch.setattr(simple_main.bedrock_async, 'invoke_text', _fake_invoke_text)
+
+    async def run():
+        stream = AnalysisStream()
+        result = await simple_main.analyze_ecs_service_with_ai(FakeSession(), _alert(), {'id': 1}, stream)
+        return result, stream
+
+    result, stream = asyncio.run(run())
+
+    assert result['status'] == 'completed'
+    assert result['ai_analysis'] == 'Causa raiz'
+    assert len(result['container_logs'][0]['recent_logs']) == 2
+    assert stream.tokens == 2
+
+
+def test_ecs_analysis_with_log_streams_without_stream(monkeypatch):
+    monkeypatch.setattr(simple_main.bedrock_async, 'invoke_text', _fake_invoke_text)
+
+    result = asyncio.run(simple_main.analyze_ecs_service_with_ai(FakeSession(), _alert(), {'id': 1}))
+
+    assert result['ai_analysis'] == 'Causa raiz'